@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""批量对比命令行入口：无需 Qt，按清单或目录对多组 (原文件, 修订文件) 并行对比
+
+用法示例：
+    python batch_compare.py pairs.csv -o compare_output -j 8
+    python batch_compare.py contracts_dir -o compare_output
+    python batch_compare.py --original 原合同.docx 修订1.docx 修订2.docx redlines_dir -o matrix_output
+
+清单文件（.csv/.txt）每行一组 "原文件路径,修订文件路径"；.json 清单为 [[原文件, 修订文件], ...]。
+目录模式下要求目录内有 original/ 与 revised/ 两个子目录，按同名 .docx 配对。
+指定 --original 时为一对多模式：原文件只转换一次，与其余参数中的全部修订文件（或目录内的 .docx）并行对比，
+输出每份修订的标红结果及条款 × 修订的变化矩阵（matrix.csv / matrix.json）。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from engine.compare_engine import MATCH_STRATEGIES, compare_documents
+from engine.conversion_cache import ConversionCache
+from engine.diff_backends import DIFF_BACKENDS, MyersBackend, get_diff_backend
+from engine.multi_compare import compare_many, write_matrix
+from engine.normalize import DEFAULT_NORMALIZATION, NormalizationOptions
+from engine.watchlist import DEFAULT_KEYWORDS, Watchlist
+
+
+def load_pairs(source):
+    """从清单文件或目录读取待对比的文件对"""
+    if os.path.isdir(source):
+        original_dir = os.path.join(source, "original")
+        revised_dir = os.path.join(source, "revised")
+        if not os.path.isdir(original_dir) or not os.path.isdir(revised_dir):
+            raise ValueError(f"目录 {source} 下缺少 original/ 或 revised/ 子目录")
+        pairs = []
+        for name in sorted(os.listdir(original_dir)):
+            if not name.endswith(".docx"):
+                continue
+            revised_path = os.path.join(revised_dir, name)
+            if os.path.exists(revised_path):
+                pairs.append((os.path.join(original_dir, name), revised_path))
+        return pairs
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    if source.endswith(".json"):
+        with open(source, encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        with open(source, encoding="utf-8", newline="") as f:
+            rows = [row for row in csv.reader(f) if row and not row[0].startswith("#")]
+    # 清单中的相对路径以清单文件所在目录为基准
+    return [(os.path.join(base_dir, row[0].strip()), os.path.join(base_dir, row[1].strip())) for row in rows]
+
+
+def load_revisions(sources):
+    """一对多模式：收集修订文件（目录按文件名顺序取其中的 .docx）"""
+    revisions = []
+    for source in sources:
+        if os.path.isdir(source):
+            revisions.extend(os.path.join(source, name) for name in sorted(os.listdir(source))
+                             if name.endswith(".docx"))
+        else:
+            revisions.append(source)
+    return revisions
+
+
+def _split_list(value):
+    """逗号分隔的命令行参数（兼容中文逗号）"""
+    return [item.strip() for item in (value or "").replace("，", ",").split(",") if item.strip()]
+
+
+def _output_name(pair, index, used_names):
+    """以修订文件名生成输出文件名，重名时追加序号"""
+    name = os.path.splitext(os.path.basename(pair[1]))[0]
+    if name in used_names:
+        name = f"{name}_{index}"
+    used_names.add(name)
+    return name
+
+
+def compare_pair(original_path, compare_path, output_base, formats, cache_dir=None, diff_backend=None,
+                 match_strategy='anchored', normalization=DEFAULT_NORMALIZATION, watchlist=None, diff_workers=None):
+    """在子进程中对比一组文件并写出结果（异常不会中断整个批次）"""
+    start = time.perf_counter()
+    record = {'original': original_path, 'compare': compare_path}
+    try:
+        cache = ConversionCache(cache_dir) if cache_dir else None
+        # 不输出 HTML 时跳过 mammoth 转换，直接流式提取文本块
+        result = compare_documents(original_path, compare_path, cache=cache, diff_backend=diff_backend,
+                                   match_strategy=match_strategy, normalization=normalization,
+                                   render='html' in formats, watchlist=watchlist, diff_workers=diff_workers)
+        record.update({
+            'status': 'ok',
+            'diff_count': result['diff_count'],
+            'fallback': result['fallback'],
+            'original_block_count': result['original_block_count'],
+            'compare_block_count': result['compare_block_count'],
+            'matched_pairs': result['matched_pairs'],
+            'extra_indices': result['extra_indices'],
+            'missing_indices': result['missing_indices'],
+            'ops': [op.to_dict() for op in result['ops']],
+            'image_changes': result['image_changes'],
+            'table_changes': result['table_changes'],
+            'watchlist': result['watchlist'],
+        })
+        if 'html' in formats:
+            with open(output_base + ".html", "w", encoding="utf-8") as f:
+                f.write(result['html'])
+    except Exception as e:
+        record.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+    record['elapsed'] = round(time.perf_counter() - start, 4)
+    if 'json' in formats:
+        with open(output_base + ".json", "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+    return record
+
+
+def run_batch(pairs, output_dir, jobs=None, formats=('html', 'json'), cache_dir=None, diff_backend=None,
+              match_strategy='anchored', normalization=DEFAULT_NORMALIZATION, watchlist=None, diff_workers=None):
+    """使用进程池并行对比所有文件对，返回吞吐量汇总
+
+    diff_workers 为每组文件内部字符级差异的并行进程数；文件对较多时各组之间已经并行，通常无需设置。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    used_names = set()
+    start = time.perf_counter()
+    records = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(compare_pair, orig, comp,
+                        os.path.join(output_dir, _output_name((orig, comp), i, used_names)), formats, cache_dir,
+                        diff_backend, match_strategy, normalization, watchlist, diff_workers)
+            for i, (orig, comp) in enumerate(pairs)
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            status = "完成" if record['status'] == 'ok' else f"失败（{record['error']}）"
+            print(f"[{len(records)}/{len(pairs)}] {os.path.basename(record['compare'])} {status}", flush=True)
+
+    elapsed = time.perf_counter() - start
+    ok = [r for r in records if r['status'] == 'ok']
+    total_blocks = sum(r['original_block_count'] + r['compare_block_count'] for r in ok)
+    summary = {
+        'pairs': len(pairs),
+        'succeeded': len(ok),
+        'failed': len(records) - len(ok),
+        'jobs': jobs or os.cpu_count(),
+        'elapsed': round(elapsed, 3),
+        'pairs_per_second': round(len(records) / elapsed, 3) if elapsed else None,
+        'blocks_per_second': round(total_blocks / elapsed, 1) if elapsed else None,
+        'total_diff_count': sum(r['diff_count'] for r in ok),
+        'total_image_changes': sum(len(r['image_changes']) for r in ok),
+        'total_table_row_changes': sum(r['table_changes']['modified_rows'] + r['table_changes']['inserted_rows']
+                                       + r['table_changes']['deleted_rows'] for r in ok),
+        'total_watchlist_findings': sum(len(r['watchlist']) for r in ok),
+        'failures': [{'original': r['original'], 'compare': r['compare'], 'error': r['error']}
+                     for r in records if r['status'] != 'ok'],
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合同文件批量对比（无界面）")
+    parser.add_argument("source", nargs="+",
+                        help="清单文件（.csv/.txt/.json）或包含 original/ 与 revised/ 的目录；"
+                             "一对多模式下为修订文件或目录（可多个）")
+    parser.add_argument("--original", default=None, help="一对多模式：与所有修订文件对比的原文件")
+    parser.add_argument("-o", "--output-dir", default="compare_output", help="结果输出目录")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--format", default="html,json", help="输出格式，逗号分隔：html,json")
+    parser.add_argument("--cache-dir", default=None, help="转换缓存目录（同一文件重复出现时跳过 mammoth 转换）")
+    parser.add_argument("--diff-backend", default=None, choices=sorted(DIFF_BACKENDS),
+                        help="字符级差异算法（默认 myers）")
+    parser.add_argument("--max-edit-distance", type=int, default=None,
+                        help="myers 算法的编辑距离上限，超过后整段按替换标记")
+    parser.add_argument("--match-strategy", default="anchored", choices=MATCH_STRATEGIES,
+                        help="无编号条款的匹配方式：anchored 锚点对齐 / greedy 逐条贪心 / vector 向量全局分配")
+    parser.add_argument("--ignore-width", action="store_true", help="忽略全角/半角差异")
+    parser.add_argument("--ignore-punctuation", action="store_true", help="忽略中英文标点变体差异")
+    parser.add_argument("--watch-keywords", default=None,
+                        help="额外关注词，逗号分隔（与默认关注词合并，变化时在结果的 watchlist 中列出）")
+    parser.add_argument("--watch-parties", default=None, help="需要识别的当事方名称，逗号分隔")
+    parser.add_argument("--diff-workers", type=int, default=None,
+                        help="单组文件内部字符级差异的并行进程数（文件对较少而合同很长、修订很多时使用）")
+    args = parser.parse_args(argv)
+
+    backend_options = {}
+    if args.max_edit_distance is not None and (args.diff_backend or MyersBackend.name) == MyersBackend.name:
+        backend_options['max_edit_distance'] = args.max_edit_distance
+    diff_backend = get_diff_backend(args.diff_backend, **backend_options)
+    normalization = NormalizationOptions(width=args.ignore_width, punctuation=args.ignore_punctuation)
+    watchlist = None
+    if args.watch_keywords or args.watch_parties:
+        watchlist = Watchlist(DEFAULT_KEYWORDS + tuple(_split_list(args.watch_keywords)),
+                              _split_list(args.watch_parties))
+
+    if args.original:
+        return run_one_to_many(args, diff_backend, normalization, watchlist)
+    if len(args.source) != 1:
+        parser.error("批量模式只接受一个清单文件或目录")
+
+    try:
+        pairs = load_pairs(args.source[0])
+    except (OSError, ValueError, IndexError) as e:
+        print(f"读取对比清单失败：{e}", file=sys.stderr)
+        return 2
+    if not pairs:
+        print("没有找到需要对比的文件对", file=sys.stderr)
+        return 2
+
+    formats = {f.strip() for f in args.format.split(",") if f.strip()}
+    summary = run_batch(pairs, args.output_dir, args.jobs, formats, args.cache_dir, diff_backend,
+                        args.match_strategy, normalization, watchlist, args.diff_workers)
+    print(f"共 {summary['pairs']} 组，成功 {summary['succeeded']} 组，失败 {summary['failed']} 组；"
+          f"耗时 {summary['elapsed']} 秒，吞吐 {summary['pairs_per_second']} 组/秒")
+    return 0 if summary['failed'] == 0 else 1
+
+
+def run_one_to_many(args, diff_backend, normalization, watchlist=None):
+    """一对多模式：输出每份修订的标红 HTML 与变化矩阵"""
+    revisions = load_revisions(args.source)
+    if not revisions:
+        print("没有找到需要对比的修订文件", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    output_dir = args.output_dir if 'html' in args.format else None
+    matrix = compare_many(args.original, revisions, args.jobs, output_dir, args.cache_dir, diff_backend,
+                          args.match_strategy, normalization, watchlist=watchlist)
+    write_matrix(matrix, args.output_dir)
+    failed = [r for r in matrix['records'] if r['status'] != 'ok']
+    changed = sum(1 for clause in matrix['clauses'] if any(clause['statuses']))
+    print(f"共 {len(revisions)} 份修订，失败 {len(failed)} 份；{len(matrix['clauses'])} 个条款中 {changed} 个被修改或删除，"
+          f"新增条款 {len(matrix['insertions'])} 个；耗时 {time.perf_counter() - start:.3f} 秒")
+    for record in failed:
+        print(f"  {record['revision']}：{record['error']}", file=sys.stderr)
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
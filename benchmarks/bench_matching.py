@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""条款匹配扩展性基准：对比旧版嵌套循环匹配、哈希索引贪心匹配、锚点对齐与向量分配在不同条款数量下的耗时
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.bench_matching --sizes 250,500,1000,2000,4000
+"""
+import argparse
+import random
+import time
+from difflib import SequenceMatcher
+
+from engine.compare_engine import TextBlock, match_blocks_by_structure
+
+
+def make_blocks(clause_count, edit_rate=0.05, seed=0, numbered=True):
+    """生成合成条款：每条一级标题下两条二级子项，修订版随机改写/删除/插入部分条款
+
+    numbered=False 时去掉条款标识，全部文本块都交给相似度匹配/锚点对齐处理。
+    """
+    rng = random.Random(seed)
+    original, revised = [], []
+    for i in range(1, clause_count + 1):
+        items = [(f"第{i}条", 1, f"第{i}条 服务内容与范围（{i}）"),
+                 (f"{i}.1", 2, f"{i}.1 乙方应于每月{i % 28 + 1}日前向甲方提交第{i}期服务报告。"),
+                 (f"{i}.2", 2, f"{i}.2 甲方应在收到发票后{i % 30 + 5}日内支付第{i}期服务费。")]
+        for identifier, level, text in items:
+            if not numbered:
+                identifier = None
+            original.append(TextBlock(text, 'p', level, identifier))
+            roll = rng.random()
+            if roll < edit_rate / 3:
+                continue  # 删除
+            if roll < edit_rate * 2 / 3:
+                text = text.replace("服务", "技术服务")  # 改写
+            revised.append(TextBlock(text, 'p', level, identifier))
+            if roll > 1 - edit_rate / 3:
+                revised.append(TextBlock(f"补充：{text}", 'p', level))  # 插入无编号条款
+    return original, revised
+
+
+def legacy_match(original_blocks, compare_blocks):
+    """旧版实现（嵌套循环 + 每次重建已匹配列表），仅用于对照"""
+    matched = []
+    comp_matched = set()
+    for orig_idx, orig_block in enumerate(original_blocks):
+        if not orig_block.identifier:
+            continue
+        for comp_idx, comp_block in enumerate(compare_blocks):
+            if comp_idx in comp_matched:
+                continue
+            if comp_block.identifier == orig_block.identifier and abs(comp_block.level - orig_block.level) <= 1:
+                matched.append((orig_idx, comp_idx))
+                comp_matched.add(comp_idx)
+                break
+    for orig_idx, orig_block in enumerate(original_blocks):
+        if orig_idx in [p[0] for p in matched]:
+            continue
+        for comp_idx, comp_block in enumerate(compare_blocks):
+            if comp_idx in comp_matched or comp_block.level != orig_block.level:
+                continue
+            if SequenceMatcher(None, orig_block.text, comp_block.text).ratio() > 0.7:
+                matched.append((orig_idx, comp_idx))
+                comp_matched.add(comp_idx)
+                break
+    return matched
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="条款匹配扩展性基准")
+    parser.add_argument("--sizes", default="250,500,1000,2000,4000", help="一级条款数量列表（每条含3个文本块）")
+    parser.add_argument("--edit-rate", type=float, default=0.05, help="修订比例")
+    parser.add_argument("--unnumbered", action="store_true", help="生成无条款编号的文档（考察相似度匹配）")
+    parser.add_argument("--legacy-limit", type=int, default=2000, help="超过该条款数量时跳过旧版实现（耗时过长）")
+    args = parser.parse_args(argv)
+
+    print(f"{'条款数':>8} {'文本块':>8} {'旧版(秒)':>10} {'贪心(秒)':>10} {'锚点(秒)':>10} {'向量(秒)':>10}"
+          f" {'加速比':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        original, revised = make_blocks(size, args.edit_rate, numbered=not args.unnumbered)
+        greedy_time, greedy_result = timed(match_blocks_by_structure, original, revised, None, 'greedy')
+        anchored_time, _ = timed(match_blocks_by_structure, original, revised, None, 'anchored')
+        vector_time, _ = timed(match_blocks_by_structure, original, revised, None, 'vector')
+        times = f"{greedy_time:>10.3f} {anchored_time:>10.3f} {vector_time:>10.3f}"
+        if size <= args.legacy_limit:
+            old_time, old_result = timed(legacy_match, original, revised)
+            assert old_result == greedy_result, "旧版与贪心实现匹配结果不一致"
+            print(f"{size:>8} {len(original):>8} {old_time:>10.3f} {times} {old_time / anchored_time:>7.1f}x")
+        else:
+            print(f"{size:>8} {len(original):>8} {'-':>10} {times} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""启动耗时基准：反复启动主程序，测量启动到可操作的时间、第一次创建网页视图的耗时与进程总耗时，
+启动到可操作超过目标时返回非零退出码
+
+用法（在仓库根目录执行；无显示器时加 --offscreen）：
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from ui.startup import STARTUP_PROBE_ENV, STARTUP_TARGET_SECONDS
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test.py")
+
+
+def measure_once(offscreen=False):
+    """启动一次主程序，返回 (启动到可操作秒数, 创建网页视图秒数, 进程总耗时秒数)；未报告视图耗时时为 None"""
+    env = dict(os.environ, **{STARTUP_PROBE_ENV: "1"})
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, APP_SCRIPT], env=env, capture_output=True, text=True,
+                               cwd=os.path.dirname(APP_SCRIPT), timeout=120)
+    total = time.perf_counter() - start
+    values = dict(line.split("=", 1) for line in completed.stdout.splitlines() if "=" in line)
+    if "time_to_interactive" in values:
+        first_view = float(values["first_view_seconds"]) if "first_view_seconds" in values else None
+        return float(values["time_to_interactive"]), first_view, total
+    raise RuntimeError(f"主程序未报告启动耗时（退出码 {completed.returncode}）：\n{completed.stderr[-2000:]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="主程序启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数（第一次用于预热磁盘缓存，不计入）")
+    parser.add_argument("--target", type=float, default=STARTUP_TARGET_SECONDS, help="启动到可操作的目标秒数")
+    parser.add_argument("--offscreen", action="store_true", help="使用 offscreen 平台插件（无显示器环境）")
+    args = parser.parse_args(argv)
+
+    measure_once(args.offscreen)
+    samples = [measure_once(args.offscreen) for _ in range(args.runs)]
+    interactive = statistics.median(sample[0] for sample in samples)
+    total = statistics.median(sample[2] for sample in samples)
+    print(f"启动到可操作（中位数）：{interactive:.3f} 秒；进程总耗时（含解释器启动与退出）：{total:.3f} 秒")
+    first_views = [sample[1] for sample in samples if sample[1] is not None]
+    if first_views:
+        print(f"第一次显示文档时创建网页视图（中位数）：{statistics.median(first_views):.3f} 秒")
+    if interactive > args.target:
+        print(f"超过目标 {args.target} 秒", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""流式提取一致性检查：对比 engine.docx_stream 与 mammoth 转换 + extract_text_blocks 得到的文本块
+
+升级 mammoth 或修改 engine/docx_stream.py 后运行。内置样例覆盖条款样式、编号/项目符号列表、
+含合并单元格的表格、段内换行、超链接与图片；也可以在参数中追加需要检查的 .docx 文件。
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.check_stream_parity
+    python -m benchmarks.check_stream_parity 合同1.docx 合同2.docx
+两条路径的结果不一致时输出第一处差异并以状态码 1 退出。
+"""
+import argparse
+import io
+import os
+import struct
+import sys
+import tempfile
+import zlib
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from benchmarks.generate_contracts import CONTRACT_STYLES
+from engine.compare_engine import STYLE_MAP, convert_docx_bytes, extract_text_blocks
+from engine.docx_stream import MAMMOTH_VERSION, extract_docx_blocks, stream_supported
+
+# 两条路径应一致的文本块字段（流式路径没有 HTML 源码偏移）
+COMPARED_FIELDS = ('text', 'tag', 'level', 'identifier', 'cell', 'fingerprint')
+
+
+def _png_bytes(width=2, height=2):
+    """生成一张纯色 PNG（样例中的图片）"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\x00" + b"\xc0\x20\x20" * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def _add_hyperlink(paragraph, text, url):
+    """python-docx 没有超链接接口，直接写 w:hyperlink"""
+    rel_id = paragraph.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement('w:hyperlink')
+    hyperlink.set(qn('r:id'), rel_id)
+    run = OxmlElement('w:r')
+    text_element = OxmlElement('w:t')
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+
+def write_fixture(path):
+    """写出覆盖常见结构的样例合同"""
+    doc = Document()
+    existing = {style.name for style in doc.styles}
+    for name in CONTRACT_STYLES:
+        if name not in existing:
+            doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+
+    doc.add_paragraph("技术服务合同", style='标题 1')
+    doc.add_paragraph("第一条 服务内容", style='标题 2')
+    doc.add_paragraph("1.1 乙方按附件要求提供技术服务。", style='标题 3')
+    doc.add_paragraph("1.2 服务期限自2025年1月1日起。", style='标题 3')
+    paragraph = doc.add_paragraph("乙方应提交：", style='正文')
+    paragraph.add_run().add_break()
+    paragraph.add_run("月度报告及验收文件。")
+    for text in ("需求分析", "系统部署", "运维支持"):
+        doc.add_paragraph(text, style='List Number')
+    for text in ("甲方负责提供场地", "乙方负责提供设备"):
+        doc.add_paragraph(text, style='List Bullet')
+
+    doc.add_paragraph("第二条 价款与支付", style='标题 2')
+    table = doc.add_table(rows=4, cols=3)
+    for r, row in enumerate((("期数", "金额", "支付时间"), ("第一期", "人民币10000元", "2025年3月1日"),
+                             ("第二期", "人民币20000元", "2025年6月1日"), ("合计", "", ""))):
+        for c, text in enumerate(row):
+            table.cell(r, c).text = text
+    table.cell(3, 1).merge(table.cell(3, 2)).text = "人民币30000元"
+    table.cell(1, 2).merge(table.cell(2, 2))
+
+    paragraph = doc.add_paragraph("付款信息详见 ", style='正文')
+    _add_hyperlink(paragraph, "付款说明", "https://example.com/payment")
+    paragraph.add_run("。")
+    doc.add_paragraph("第三条 签署", style='标题 2')
+    doc.add_paragraph("甲方盖章：", style='签名项')
+    doc.add_picture(io.BytesIO(_png_bytes()))
+    doc.add_paragraph("乙方盖章：", style='签名项')
+    doc.add_paragraph("2025年1月1日", style='日期')
+    doc.save(path)
+
+
+def compare_paths(docx_path, style_map=STYLE_MAP):
+    """返回两条路径的第一处差异描述，一致时返回 None"""
+    with open(docx_path, "rb") as docx_file:
+        docx_bytes = docx_file.read()
+    expected = extract_text_blocks(convert_docx_bytes(docx_bytes, style_map))
+    actual = extract_docx_blocks(io.BytesIO(docx_bytes), style_map)
+    for index, (want, got) in enumerate(zip(expected, actual)):
+        for field in COMPARED_FIELDS:
+            if getattr(want, field) != getattr(got, field):
+                return (f"第 {index} 个文本块的 {field} 不一致：mammoth {getattr(want, field)!r}，"
+                        f"流式 {getattr(got, field)!r}")
+    if len(expected) != len(actual):
+        return f"文本块数量不一致：mammoth {len(expected)} 个，流式 {len(actual)} 个"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="流式提取与 mammoth 转换路径的一致性检查")
+    parser.add_argument("paths", nargs="*", help="额外检查的 .docx 文件")
+    args = parser.parse_args(argv)
+
+    if not stream_supported():
+        print(f"注意：安装的 mammoth 不是 {MAMMOTH_VERSION}，load_blocks 当前会改走 mammoth 转换路径")
+    failed = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        fixture = os.path.join(work_dir, "fixture.docx")
+        write_fixture(fixture)
+        for path in [fixture] + args.paths:
+            problem = compare_paths(path)
+            name = "内置样例" if path == fixture else path
+            print(f"{name}：{'一致' if problem is None else problem}")
+            failed += problem is not None
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""合成合同生成器：按 STYLE_MAP 中的样式写出 .docx 原文件与修订版，用于基准测试
+
+生成内容：标题、当事人信息、前言，若干"第N条"一级条款（标题 2）及其子项（标题 3）和正文段落，
+每隔若干条插入一张付款计划表，末尾为签名区。修订版按 edit_rate 随机改写、删除、插入段落，
+并以同样的比例删除、插入付款计划表的数据行和改写单元格。
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.generate_contracts --sizes 10,100,1000 --edit-rate 0.05 -o bench_data
+"""
+import argparse
+import os
+import random
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+
+# 与 engine.compare_engine.STYLE_MAP 对应的 Word 段落样式
+CONTRACT_STYLES = ('标题 1', '标题 2', '标题 3', '正文', '普通段落', '签名区', '签名项', '日期')
+
+# 每隔多少条一级条款插入一张付款计划表
+TABLE_EVERY = 25
+
+_TOPICS = ('服务内容与范围', '交付与验收', '价款与支付', '知识产权', '保密义务', '违约责任',
+           '不可抗力', '合同解除', '争议解决', '通知与送达', '数据保护', '责任限制')
+_SUBJECTS = ('乙方', '甲方', '双方')
+_ACTIONS = ('应于每月{day}日前向{other}提交第{n}期工作报告',
+            '应在收到发票后{day}个工作日内支付第{n}期服务费人民币{amount}元',
+            '不得向任何第三方披露因履行本合同获知的{other}商业秘密',
+            '违约的，应按合同总额的{rate}%向{other}支付违约金',
+            '对因其过错造成的损失承担赔偿责任，赔偿总额以人民币{amount}元为上限')
+_REWRITES = (('应于', '须于'), ('支付', '付清'), ('第三方', '任何第三人'), ('承担', '负责承担'),
+             ('工作日', '自然日'), ('违约金', '违约赔偿金'))
+
+
+def _clause_sentence(rng, n):
+    subject = rng.choice(_SUBJECTS)
+    other = '乙方' if subject == '甲方' else '甲方'
+    action = rng.choice(_ACTIONS).format(day=rng.randint(1, 28), other=other, n=n,
+                                         amount=rng.randint(1, 500) * 1000, rate=rng.randint(1, 30))
+    return f"{subject}{action}。"
+
+
+def contract_spec(clause_count, seed=0):
+    """生成合同结构：[(样式, 文本)] 段落与 ('table', 行列表) 表格组成的列表"""
+    rng = random.Random(seed)
+    spec = [('标题 1', '技术服务合同'),
+            ('普通段落', '甲方：北京某某科技有限公司'),
+            ('普通段落', '乙方：上海某某信息技术有限公司'),
+            ('正文', '甲乙双方经友好协商，根据《中华人民共和国民法典》及相关法律法规，就技术服务事宜达成如下协议。')]
+    for i in range(1, clause_count + 1):
+        spec.append(('标题 2', f"第{i}条 {_TOPICS[i % len(_TOPICS)]}"))
+        for j in range(1, rng.randint(1, 3) + 1):
+            spec.append(('标题 3', f"{i}.{j} {_clause_sentence(rng, i)}"))
+        if rng.random() < 0.5:
+            spec.append(('正文', _clause_sentence(rng, i) + _clause_sentence(rng, i)))
+        if i % TABLE_EVERY == 0:
+            rows = [['期数', '付款条件', '金额（元）']]
+            rows += [[f"第{k}期", f"第{i}条约定的第{k}阶段成果验收合格", str(rng.randint(1, 90) * 10000)]
+                     for k in range(1, 4)]
+            spec.append(('table', rows))
+    spec += [('签名区', '（以下无正文）'),
+             ('签名项', '甲方（盖章）：            乙方（盖章）：'),
+             ('签名项', '法定代表人或授权代表：    法定代表人或授权代表：'),
+             ('日期', '签订日期：    年  月  日')]
+    return spec
+
+
+def _revise_table(rows, edit_rate, rng):
+    """按修订比例删除/插入数据行、改写单元格（表头行保持不变）"""
+    revised = [list(rows[0])]
+    for row in rows[1:]:
+        roll = rng.random()
+        if roll < edit_rate / 3:
+            continue  # 删除行
+        row = list(row)
+        if roll < edit_rate * 2 / 3:
+            column = rng.randrange(len(row))
+            row[column] = str(rng.randint(1, 90) * 10000) if row[column].isdigit() else row[column] + "（调整）"
+        revised.append(row)
+        if roll > 1 - edit_rate / 3:
+            revised.append(["补充期", "双方书面确认的补充阶段成果验收合格", str(rng.randint(1, 90) * 10000)])
+    return revised
+
+
+def revise_spec(spec, edit_rate=0.05, seed=1):
+    """按修订比例改写/删除/插入段落，删除/插入表格行并改写单元格（标题 1 保持不变）"""
+    rng = random.Random(seed)
+    # 表格使用独立的随机序列：段落的修订与不修订表格时一致
+    table_rng = random.Random(f"{seed}-table")
+    revised = []
+    for style, content in spec:
+        if style == 'table':
+            revised.append((style, _revise_table(content, edit_rate, table_rng)))
+            continue
+        if style == '标题 1':
+            revised.append((style, content))
+            continue
+        roll = rng.random()
+        if roll < edit_rate / 3:
+            continue  # 删除
+        if roll < edit_rate * 2 / 3:
+            old, new = rng.choice(_REWRITES)
+            content = content.replace(old, new, 1) if old in content else content + "（本款经双方协商修订）"
+        revised.append((style, content))
+        if roll > 1 - edit_rate / 3:
+            revised.append(('正文', "补充约定：" + _clause_sentence(rng, 0)))
+    return revised
+
+
+def write_docx(spec, path):
+    """把合同结构写为 .docx"""
+    doc = Document()
+    existing = {style.name for style in doc.styles}
+    for name in CONTRACT_STYLES:
+        if name not in existing:
+            doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+    for style, content in spec:
+        if style == 'table':
+            table = doc.add_table(rows=len(content), cols=len(content[0]))
+            for r, row in enumerate(content):
+                for c, text in enumerate(row):
+                    table.cell(r, c).text = text
+        else:
+            doc.add_paragraph(content, style=style)
+    doc.save(path)
+
+
+def generate_pair(output_dir, clause_count, edit_rate=0.05, seed=0):
+    """生成一组 (原文件, 修订文件)，已存在时直接复用，返回两个路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    stem = f"contract_{clause_count}_s{seed}"
+    original_path = os.path.join(output_dir, f"{stem}_original.docx")
+    revised_path = os.path.join(output_dir, f"{stem}_revised_{edit_rate:g}.docx")
+    spec = None
+    if not os.path.exists(original_path):
+        spec = contract_spec(clause_count, seed)
+        write_docx(spec, original_path)
+    if not os.path.exists(revised_path):
+        spec = spec or contract_spec(clause_count, seed)
+        write_docx(revise_spec(spec, edit_rate, seed + 1), revised_path)
+    return original_path, revised_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成基准测试用的合成合同")
+    parser.add_argument("--sizes", default="10,100,1000", help="一级条款数量列表（10 ~ 20000）")
+    parser.add_argument("--edit-rate", type=float, default=0.05, help="修订比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("-o", "--output-dir", default="bench_data", help="输出目录")
+    args = parser.parse_args(argv)
+    for size in (int(s) for s in args.sizes.split(",")):
+        original_path, revised_path = generate_pair(args.output_dir, size, args.edit_rate, args.seed)
+        print(f"{size:>6} 条：{original_path}  {revised_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""对比流水线分阶段基准：记录各阶段耗时（墙钟/CPU）与内存峰值，按版本保存结果以便发现性能回退
+
+阶段：mammoth 转换、extract_text_blocks、match_blocks_by_structure、highlight_differences（逐对字符级差异）、
+HTML 渲染，以及两种导出（按差异中间表示重建 docx、在修订文件上打补丁）；另测直接流式提取文本块
+（stream_extract，对应不输出 HTML 时的转换 + 提取两个阶段），以及按 CPU 核数并行计算字符级差异
+（highlight_parallel，文本总量低于 engine.parallel_diff.PARALLEL_MIN_CHARS 时与串行相同）。
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.run_benchmarks --sizes 10,100,1000 --label baseline
+    python -m benchmarks.run_benchmarks --sizes 10,100,1000 --compare baseline
+结果保存在 benchmarks/results/<标签>.json，标签默认取当前 git 提交号。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.generate_contracts import generate_pair
+from engine.compare_engine import (RESULT_CSS, STYLE_MAP, build_diff_ops, build_full_html, convert_docx_bytes,
+                                   extract_text_blocks, highlight_differences, match_blocks_by_structure)
+from engine.diff_backends import get_diff_backend
+from engine.docx_export import export_diff_docx
+from engine.docx_stream import extract_docx_blocks
+from engine.docx_patch import patch_docx
+from engine.parallel_diff import iter_text_opcodes
+from engine.renderer import render_diff_document
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# 相对基线变慢超过该比例时标记为回退
+REGRESSION_THRESHOLD = 0.2
+
+# 基线耗时低于该值的阶段受计时抖动影响大，不参与回退判断
+MIN_COMPARED_SECONDS = 0.05
+
+
+def _measure(fn, trace_memory):
+    """执行 fn，返回 (结果, 墙钟秒, CPU 秒, 内存峰值字节)；不跟踪内存时峰值为 None"""
+    if trace_memory:
+        tracemalloc.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        result = fn()
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, wall, cpu, peak
+
+
+def _pipeline(original_path, revised_path, work_dir):
+    """按顺序返回 (阶段名, 无参函数) 列表；后一阶段使用前一阶段的结果"""
+    state = {}
+
+    def read_and_convert():
+        for side, path in (('original', original_path), ('revised', revised_path)):
+            with open(path, "rb") as f:
+                state[f'{side}_html'] = convert_docx_bytes(f.read(), STYLE_MAP)
+
+    def extract():
+        state['original_blocks'] = extract_text_blocks(state['original_html'])
+        state['revised_blocks'] = extract_text_blocks(state['revised_html'])
+
+    def stream_extract():
+        for path in (original_path, revised_path):
+            extract_docx_blocks(path, STYLE_MAP)
+
+    def match():
+        state['pairs'] = match_blocks_by_structure(state['original_blocks'], state['revised_blocks'])
+        matched = {j for _, j in state['pairs']}
+        state['extra'] = [j for j in range(len(state['revised_blocks'])) if j not in matched]
+
+    def highlight():
+        # 与对比流程一致：指纹相同的条款不做字符级对比
+        for i, j in state['pairs']:
+            orig, comp = state['original_blocks'][i], state['revised_blocks'][j]
+            if orig.fingerprint != comp.fingerprint:
+                highlight_differences(orig.text, comp.text)
+
+    def highlight_parallel():
+        pairs = [(state['original_blocks'][i].text, state['revised_blocks'][j].text) for i, j in state['pairs']
+                 if state['original_blocks'][i].fingerprint != state['revised_blocks'][j].fingerprint]
+        for _ in iter_text_opcodes(pairs, get_diff_backend(), 'auto'):
+            pass
+
+    def render():
+        state['ops'], _ = build_diff_ops(state['original_blocks'], state['revised_blocks'], state['pairs'],
+                                         state['extra'])
+        body = render_diff_document(state['revised_html'], state['ops'], state['original_blocks'],
+                                    state['revised_blocks'])
+        state['html'] = build_full_html(body, RESULT_CSS)
+
+    def export_rebuild():
+        export_diff_docx(os.path.join(work_dir, "rebuild.docx"), state['ops'], state['original_blocks'],
+                         state['revised_blocks'])
+
+    def export_patch():
+        patch_docx(revised_path, os.path.join(work_dir, "patched.docx"), state['ops'], state['original_blocks'],
+                   state['revised_blocks'])
+
+    return [('convert', read_and_convert), ('extract', extract), ('stream_extract', stream_extract), ('match', match),
+            ('highlight', highlight), ('highlight_parallel', highlight_parallel), ('render', render),
+            ('export_rebuild', export_rebuild), ('export_patch', export_patch)], state
+
+
+def run_size(original_path, revised_path, trace_memory=True, repeat=3):
+    """对一组文件执行全部阶段，返回 {阶段: {'wall', 'cpu', 'peak_bytes'}} 与文本块数
+
+    计时轮重复 repeat 次，每个阶段取最短耗时，减少计时抖动。
+    """
+    stages = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 计时轮：不开启 tracemalloc（其开销会显著放大耗时）
+        for _ in range(repeat):
+            steps, state = _pipeline(original_path, revised_path, work_dir)
+            for name, fn in steps:
+                _, wall, cpu, _ = _measure(fn, False)
+                best = stages.get(name)
+                if best is None or wall < best['wall']:
+                    stages[name] = {'wall': round(wall, 4), 'cpu': round(cpu, 4), 'peak_bytes': None}
+        block_count = len(state['original_blocks']) + len(state['revised_blocks'])
+        # 内存轮：逐阶段单独统计峰值
+        if trace_memory:
+            steps, _ = _pipeline(original_path, revised_path, work_dir)
+            for name, fn in steps:
+                _, _, _, peak = _measure(fn, True)
+                stages[name]['peak_bytes'] = peak
+    return stages, block_count
+
+
+def _git_label():
+    """当前 git 提交号（有未提交修改时追加 -dirty）"""
+    try:
+        root = os.path.dirname(RESULTS_DIR)
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return time.strftime("%Y%m%d_%H%M%S")
+
+
+def compare_with_baseline(results, baseline):
+    """与基线逐阶段比较墙钟耗时，返回回退列表 [(条款数, 阶段, 基线秒, 当前秒)]"""
+    regressions = []
+    for size, current in results['sizes'].items():
+        base = baseline['sizes'].get(size)
+        if base is None:
+            continue
+        for stage, record in current['stages'].items():
+            base_record = base['stages'].get(stage)
+            if base_record is None or base_record['wall'] < MIN_COMPARED_SECONDS:
+                continue
+            if record['wall'] > base_record['wall'] * (1 + REGRESSION_THRESHOLD):
+                regressions.append((size, stage, base_record['wall'], record['wall']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比流水线分阶段基准")
+    parser.add_argument("--sizes", default="10,100,1000", help="一级条款数量列表（10 ~ 20000）")
+    parser.add_argument("--edit-rate", type=float, default=0.05, help="修订比例")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "contract_bench_data"),
+                        help="合成合同存放目录（已生成的文件会复用）")
+    parser.add_argument("--label", default=None, help="结果标签（默认当前 git 提交号）")
+    parser.add_argument("--compare", default=None, help="与指定标签的历史结果比较")
+    parser.add_argument("--repeat", type=int, default=3, help="计时轮重复次数（取最短耗时）")
+    parser.add_argument("--no-memory", action="store_true", help="跳过 tracemalloc 内存峰值统计")
+    args = parser.parse_args(argv)
+
+    label = args.label or _git_label()
+    results = {'label': label, 'python': platform.python_version(), 'platform': platform.platform(),
+               'edit_rate': args.edit_rate, 'repeat': args.repeat, 'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"), 'sizes': {}}
+    print(f"{'条款数':>8} {'文本块':>8} " + " ".join(f"{name:>14}" for name, _ in _pipeline('', '', '')[0]))
+    for size in (int(s) for s in args.sizes.split(",")):
+        original_path, revised_path = generate_pair(args.data_dir, size, args.edit_rate)
+        stages, block_count = run_size(original_path, revised_path, not args.no_memory, args.repeat)
+        results['sizes'][str(size)] = {'blocks': block_count, 'stages': stages}
+        cells = []
+        for record in stages.values():
+            peak = f"/{record['peak_bytes'] / 1048576:.0f}M" if record['peak_bytes'] is not None else ""
+            cells.append(f"{record['wall']:.3f}s{peak}".rjust(14))
+        print(f"{size:>8} {block_count:>8} " + " ".join(cells), flush=True)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存：{result_path}")
+
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline)
+        for size, stage, before, after in regressions:
+            print(f"回退：{size} 条 {stage} {before:.3f}s → {after:.3f}s（+{(after / before - 1) * 100:.0f}%）")
+        if regressions:
+            return 1
+        print(f"与 {args.compare} 相比没有超过 {REGRESSION_THRESHOLD:.0%} 的回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+# 合同对比核心引擎（不依赖 Qt，可在命令行/多进程中直接使用）
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""文档级对齐：以两侧唯一且完全相同的文本块为锚点（patience 风格），仅在锚点间隙内做模糊匹配"""
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def block_key(block):
+    """文本块的对齐键：层级 + 归一化指纹（未计算指纹时退化为空白归一化后的文本）"""
+    if block.fingerprint is not None:
+        return block.level, block.fingerprint
+    return block.level, _WHITESPACE.sub(' ', block.text).strip()
+
+
+def _longest_increasing(pairs):
+    """patience 排序求最长递增子序列：pairs 已按原文件索引升序，取对比文件索引递增的最长子序列"""
+    tails = []  # tails[i] 为长度 i+1 的递增子序列末尾在 pairs 中的位置
+    tail_values = []
+    previous = [-1] * len(pairs)
+    for pos, (_, comp_idx) in enumerate(pairs):
+        i = bisect_left(tail_values, comp_idx)
+        if i > 0:
+            previous[pos] = tails[i - 1]
+        if i == len(tails):
+            tails.append(pos)
+            tail_values.append(comp_idx)
+        else:
+            tails[i] = pos
+            tail_values[i] = comp_idx
+    result = []
+    pos = tails[-1] if tails else -1
+    while pos != -1:
+        result.append(pairs[pos])
+        pos = previous[pos]
+    result.reverse()
+    return result
+
+
+def _unique_anchors(orig_indices, comp_indices, orig_keys, comp_keys):
+    """两侧各只出现一次的相同块，按文档顺序取不交叉的最长锚点序列"""
+    orig_counts = Counter(orig_keys[i] for i in orig_indices)
+    comp_counts = Counter(comp_keys[j] for j in comp_indices)
+    comp_position = {comp_keys[j]: j for j in comp_indices if comp_counts[comp_keys[j]] == 1}
+    candidates = [(i, comp_position[orig_keys[i]]) for i in orig_indices
+                  if orig_counts[orig_keys[i]] == 1 and orig_keys[i] in comp_position]
+    return _longest_increasing(candidates)
+
+
+def _split_by_anchors(indices, anchors):
+    """线性扫描，把升序索引按升序锚点切成 len(anchors)+1 段（锚点本身不计入）"""
+    gaps = [[]]
+    pos = 0
+    for i in indices:
+        while pos < len(anchors) and i > anchors[pos]:
+            gaps.append([])
+            pos += 1
+        if pos < len(anchors) and i == anchors[pos]:
+            continue
+        gaps[-1].append(i)
+    while len(gaps) < len(anchors) + 1:
+        gaps.append([])
+    return gaps
+
+
+def _fuzzy_in_gap(original_blocks, compare_blocks, orig_indices, comp_indices, is_similar):
+    """间隙内按文档顺序逐条寻找同层级的相似块"""
+    pairs = []
+    used = set()
+    for orig_idx in orig_indices:
+        orig_block = original_blocks[orig_idx]
+        for comp_idx in comp_indices:
+            if comp_idx in used or compare_blocks[comp_idx].level != orig_block.level:
+                continue
+            if is_similar(orig_block, compare_blocks[comp_idx]):
+                pairs.append((orig_idx, comp_idx))
+                used.add(comp_idx)
+                break
+    return pairs
+
+
+def anchored_alignment(original_blocks, compare_blocks, orig_indices, comp_indices, is_similar, progress=None):
+    """对齐尚未匹配的文本块，返回按原文件索引排序的 (原文件索引, 对比文件索引) 列表
+
+    1. 以唯一相同块为锚点切分文档，在每个间隙内递归寻找新的唯一锚点；
+    2. 间隙内不再有锚点时才调用 is_similar 做模糊匹配；
+    3. 最后把位置发生移动、但文本完全相同的剩余块按哈希配对。
+    """
+    orig_keys = {i: block_key(original_blocks[i]) for i in orig_indices}
+    comp_keys = {j: block_key(compare_blocks[j]) for j in comp_indices}
+    pairs = []
+    stack = [(list(orig_indices), list(comp_indices))]
+    processed = 0
+    while stack:
+        gap_orig, gap_comp = stack.pop()
+        if not gap_orig or not gap_comp:
+            continue
+        anchors = _unique_anchors(gap_orig, gap_comp, orig_keys, comp_keys)
+        if not anchors:
+            pairs.extend(_fuzzy_in_gap(original_blocks, compare_blocks, gap_orig, gap_comp, is_similar))
+            processed += len(gap_orig)
+            if progress is not None:
+                progress(processed, len(orig_indices))
+            continue
+        pairs.extend(anchors)
+        # 按锚点切分出若干间隙（含首尾），分别继续对齐
+        orig_gaps = _split_by_anchors(gap_orig, [a[0] for a in anchors])
+        comp_gaps = _split_by_anchors(gap_comp, [a[1] for a in anchors])
+        stack.extend(zip(orig_gaps, comp_gaps))
+        processed += len(anchors)
+
+    # 移动过位置的相同块：按对齐键哈希配对
+    matched_orig = {p[0] for p in pairs}
+    matched_comp = {p[1] for p in pairs}
+    pairs.extend(pair_identical(original_blocks, compare_blocks,
+                                [i for i in orig_indices if i not in matched_orig],
+                                [j for j in comp_indices if j not in matched_comp]))
+    pairs.sort()
+    return pairs
+
+
+def pair_identical(original_blocks, compare_blocks, orig_indices, comp_indices):
+    """按对齐键哈希配对完全相同的块（不考虑位置），同键多块时按文档顺序依次配对"""
+    candidates = defaultdict(deque)
+    for j in comp_indices:
+        candidates[block_key(compare_blocks[j])].append(j)
+    pairs = []
+    for i in orig_indices:
+        bucket = candidates.get(block_key(original_blocks[i]))
+        if bucket:
+            pairs.append((i, bucket.popleft()))
+    return pairs
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""历史合同条款全文检索：以字符二元组（bigram）为词项的倒排索引，保存在 SQLite 中并随导入增量更新
+
+中文没有天然分词边界，按相邻两个字符建立倒排表即可支持任意短语查询：
+查询时取短语的全部二元组求交集得到候选条款，再在候选条款文本中确认短语确实连续出现。
+"""
+import os
+import sqlite3
+from collections import Counter
+
+from engine.history_index import DATABASE_NAME, HistoryIndex
+from engine.normalize import NormalizationOptions, normalize_text
+
+# 检索用归一化：合并空白并统一全角/半角
+SEARCH_NORMALIZATION = NormalizationOptions(whitespace=True, width=True)
+
+DEFAULT_LIMIT = 200
+
+# 参与求交集的低频二元组个数上限（更多二元组很少能继续缩小候选集，交给短语确认处理）
+MAX_INTERSECT_GRAMS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clause (
+    id           INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    block_index  INTEGER NOT NULL,
+    identifier   TEXT,
+    text         TEXT NOT NULL,
+    normalized   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clause_content_hash ON clause (content_hash);
+CREATE TABLE IF NOT EXISTS clause_posting (
+    gram      TEXT NOT NULL,
+    clause_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, clause_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS clause_gram_count (
+    gram  TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS clause_indexed_file (
+    content_hash TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+def search_text(text):
+    """检索用的规范化文本（大小写不敏感）"""
+    return normalize_text(text, SEARCH_NORMALIZATION).lower()
+
+
+def bigrams(text):
+    """文本的字符二元组集合（单字文本返回该字本身）"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class ClauseSearchIndex:
+    """条款倒排索引（每个线程使用各自的实例；WAL 模式下检索不会被后台写入阻塞）"""
+
+    def __init__(self, db_path):
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def is_indexed(self, content_hash):
+        return self.connection.execute("SELECT 1 FROM clause_indexed_file WHERE content_hash = ?",
+                                       (content_hash,)).fetchone() is not None
+
+    def unindexed(self, history_db_path):
+        """历史目录数据库中尚未建立索引的文件内容哈希（按导入时间倒序，见 engine.history_index）"""
+        self.connection.execute("ATTACH DATABASE ? AS history_db", (history_db_path,))
+        try:
+            rows = self.connection.execute(
+                "SELECT content_hash FROM history_db.history WHERE content_hash NOT IN "
+                "(SELECT content_hash FROM clause_indexed_file) ORDER BY imported_at DESC").fetchall()
+        finally:
+            self.connection.execute("DETACH DATABASE history_db")
+        return [content_hash for content_hash, in rows]
+
+    def add_document(self, content_hash, text_blocks):
+        """把一个文件的条款加入索引（同一内容只索引一次），返回新增条款数"""
+        if self.is_indexed(content_hash):
+            return 0
+        gram_counts = Counter()
+        with self.connection:
+            for block_index, block in enumerate(text_blocks):
+                # 表格单元格的文本与其内部段落重复，只索引叶子段落
+                if block.tag in ('td', 'th'):
+                    continue
+                normalized = search_text(block.text)
+                if not normalized:
+                    continue
+                clause_id = self.connection.execute(
+                    "INSERT INTO clause (content_hash, block_index, identifier, text, normalized) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (content_hash, block_index, block.identifier, block.text, normalized)).lastrowid
+                grams = bigrams(normalized)
+                self.connection.executemany("INSERT OR IGNORE INTO clause_posting (gram, clause_id) VALUES (?, ?)",
+                                            ((gram, clause_id) for gram in grams))
+                gram_counts.update(grams)
+            self.connection.executemany(
+                "INSERT INTO clause_gram_count (gram, count) VALUES (?, ?) "
+                "ON CONFLICT (gram) DO UPDATE SET count = count + excluded.count",
+                gram_counts.items())
+            self.connection.execute("INSERT INTO clause_indexed_file (content_hash) VALUES (?)", (content_hash,))
+        return sum(1 for block in text_blocks if block.tag not in ('td', 'th'))
+
+    def search(self, phrase, limit=DEFAULT_LIMIT):
+        """短语检索，返回 [{'content_hash', 'block_index', 'identifier', 'text'}]（按文件、条款顺序）"""
+        query = search_text(phrase)
+        if not query:
+            return []
+        grams = bigrams(query)
+        if len(query) == 1:
+            # 单字查询：按前缀扫描以该字开头的二元组
+            candidate_sql = ("SELECT DISTINCT clause_id FROM clause_posting WHERE gram >= ? AND gram < ?")
+            candidate_params = [query, query + '\U0010ffff']
+        else:
+            # 文档频率低的二元组放在前面，交集尽快收敛
+            counts = dict(self.connection.execute(
+                f"SELECT gram, count FROM clause_gram_count WHERE gram IN ({', '.join('?' * len(grams))})",
+                list(grams)).fetchall())
+            if len(counts) < len(grams):
+                return []  # 有二元组从未出现过
+            ordered = sorted(grams, key=counts.get)[:MAX_INTERSECT_GRAMS]
+            candidate_sql = " INTERSECT ".join(["SELECT clause_id FROM clause_posting WHERE gram = ?"] * len(ordered))
+            candidate_params = ordered
+
+        hits = []
+        rows = self.connection.execute(
+            f"SELECT content_hash, block_index, identifier, text, normalized FROM clause "
+            f"WHERE id IN ({candidate_sql}) ORDER BY id", candidate_params)
+        for content_hash, block_index, identifier, text, normalized in rows:
+            # 二元组全部出现不代表短语连续出现，逐条确认
+            if query in normalized:
+                hits.append({'content_hash': content_hash, 'block_index': block_index,
+                             'identifier': identifier, 'text': text})
+                if len(hits) >= limit:
+                    break
+        return hits
+
+
+def index_history(db_path, history_dir, load_fn, progress=None):
+    """后台为历史目录中尚未索引的文件补建索引（在工作线程中查询与读取），load_fn(路径) 返回文本块列表"""
+    history = HistoryIndex(history_dir)
+    index = ClauseSearchIndex(db_path)
+    try:
+        pending = index.unindexed(os.path.join(history_dir, DATABASE_NAME))
+        for done, content_hash in enumerate(pending):
+            if progress is not None:
+                progress("建立条款索引", done, len(pending))
+            index.add_document(content_hash, load_fn(history.object_path(content_hash)))
+        return len(pending)
+    finally:
+        index.close()
+        history.close()
+
+
+def index_document(db_path, content_hash, text_blocks, progress=None):
+    """后台把刚导入文件的条款加入索引（在工作线程中打开独立连接）"""
+    index = ClauseSearchIndex(db_path)
+    try:
+        return index.add_document(content_hash, text_blocks)
+    finally:
+        index.close()
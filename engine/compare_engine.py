@@ -0,0 +1,713 @@
+# -*- coding: utf-8 -*-
+"""合同对比流水线：docx 转 HTML、提取文本块、结构化匹配、差异标红与结果渲染（不依赖 Qt）"""
+import io
+import os
+import re
+from collections import defaultdict, deque
+from difflib import SequenceMatcher
+from html.parser import HTMLParser
+
+from engine.alignment import anchored_alignment, pair_identical
+from engine.diff_backends import get_diff_backend
+from engine.diff_ir import OP_DELETE, OP_INSERT, OP_MODIFY, DiffOp, text_opcodes
+from engine.normalize import DEFAULT_NORMALIZATION, fingerprint_blocks
+from engine.parallel_diff import iter_text_opcodes
+from engine.renderer import render_diff_document, render_text_diff
+from engine.similarity import vector_assignment
+from engine.table_diff import diff_table_blocks
+from engine.tracing import tracer
+from engine.watchlist import default_watchlist
+
+# Word 样式 → HTML 类名映射（原文件与对比文件共用）
+STYLE_MAP = """
+p[style-name='标题 1'] => p.contract-main-title
+p[style-name='正文'] => p.contract-preface
+p[style-name='标题 2'] => p.clause-level1
+p[style-name='标题 3'] => p.clause-level2
+p[style-name='普通段落'] => p.party-info
+p[style-name='签名区'] => p.signature-area
+p[style-name='签名项'] => p.signature-item
+p[style-name='日期'] => p.sign-date
+"""
+
+# 需要提取的标签类型（覆盖合同常见元素：段落、列表、标题、表格单元格）
+TARGET_TAGS = ['p', 'li', 'h1', 'h2', 'h3', 'td', 'th']
+
+# 模拟 Word 样式
+WORD_CSS = """
+<style>
+    body {
+        font-family: 'SimSun', '宋体', serif;
+        font-size: 12pt;
+        line-height: 1.8;
+        color: #000000;
+        background-color: #ffffff;
+        max-width: 21cm;
+        margin: 0 auto;
+        padding: 2.5cm 2cm;
+    }
+    .contract-main-title {
+        text-align: center;
+        font-size: 16pt;
+        font-weight: bold;
+        margin: 0 0 40pt 0;
+        text-indent: 0;
+    }
+    .party-info {
+        text-align: left;
+        margin: 15pt 0;
+        text-indent: 0;
+    }
+    .contract-preface {
+        text-align: justify;
+        text-indent: 2em;
+        margin: 20pt 0;
+    }
+    .clause-level1 {
+        font-weight: bold;
+        font-size: 13pt;
+        margin: 25pt 0 10pt 0;
+        text-indent: 0;
+    }
+    .clause-level2 {
+        font-weight: bold;
+        text-indent: 2em;
+        margin: 15pt 0 5pt 0;
+    }
+    p {
+        text-align: justify;
+        text-indent: 2em;
+        margin: 8pt 0;
+    }
+    ul, ol {
+        margin: 5pt 0 5pt 4em;
+        padding-left: 0;
+    }
+    li {
+        text-align: justify;
+        margin: 6pt 0;
+        text-indent: 0;
+    }
+    .signature-area {
+        margin-top: 60pt;
+        text-indent: 0;
+    }
+    .signature-item {
+        margin: 20pt 0;
+        text-indent: 0;
+    }
+    .sign-date {
+        margin-top: 30pt;
+        text-indent: 0;
+    }
+    .diff-highlight {
+        background-color: #ffcccc;
+        color: #ff0000;
+        font-weight: bold;
+        padding: 0 2px;
+    }
+    .diff-delete {
+        color: #ff0000;
+        text-decoration: line-through;
+        font-weight: bold;
+        padding: 0 2px;
+    }
+    /* 在word_css中增加样式 */
+    .level-change-only {
+        color: #ff9900;
+        background-color: #fff8e1;  /* 浅黄背景区分纯层级变化 */
+    }
+</style>
+"""
+
+# 对比结果页额外样式
+RESULT_CSS = """
+<style>
+    .level-change { color: #ff9900; }  /* 层级变化标记为橙色 */
+    .missing-clauses { margin-top: 20pt; padding: 10pt; border: 1px solid #ff0000; }
+</style>
+"""
+
+
+class ComparisonCancelled(Exception):
+    """对比任务被用户取消（由进度回调抛出，中断当前阶段）"""
+
+
+def _report(progress, stage, done, total):
+    """调用进度回调 progress(阶段, 已完成, 总数)；回调可抛出 ComparisonCancelled 以取消任务"""
+    if progress is not None:
+        progress(stage, done, total)
+
+
+def convert_docx_to_html(docx_path, style_map=STYLE_MAP):
+    """读取 docx 并按样式映射转为 HTML 片段"""
+    with open(docx_path, "rb") as docx_file:
+        return convert_docx_bytes(docx_file.read(), style_map)
+
+
+def convert_docx_bytes(docx_bytes, style_map=STYLE_MAP, image_store=None):
+    """将内存中的 docx 内容按样式映射转为 HTML 片段
+
+    传入 image_store（engine.image_store.ImageStore）时图片写入该目录，HTML 中只引用 URL；
+    否则按 mammoth 默认以 base64 内嵌。
+    """
+    import mammoth  # 首次转换时才导入（界面启动时不需要）
+    options = {'style_map': style_map}
+    if image_store is not None:
+        options['convert_image'] = image_store.image_converter()
+    result = mammoth.convert_to_html(io.BytesIO(docx_bytes), **options)
+    return result.value
+
+
+def build_full_html(body_html, extra_css=""):
+    """组合CSS和HTML内容，使样式生效"""
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        {WORD_CSS}{extra_css}
+    </head>
+    <body>
+        {body_html}
+    </body>
+    </html>
+    """
+
+
+# 匹配条款号（如"第1条"、"1.1"、"一、"等）
+CLAUSE_PATTERN = re.compile(r'^(第?\d+[条款项]|[\d.]+|[\u4e00-\u9fa5]+、)')
+
+_TARGET_TAG_SET = frozenset(TARGET_TAGS)
+LEVEL_CLASS_PREFIX = 'clause-level'
+
+
+# 文本块的持久化字段（缓存按此顺序序列化）
+BLOCK_FIELDS = ('text', 'tag', 'level', 'identifier', 'node_index', 'start', 'end', 'cell')
+
+_CELL_TAGS = frozenset(('td', 'th'))
+
+
+class TextBlock:
+    """文本块记录（__slots__ 紧凑存储，不持有解析树引用）
+
+    node_index 为该元素在全部目标标签中的文档顺序序号（含空文本元素），
+    start/end 为元素内部 HTML 在源字符串中的起止偏移，
+    cell 为所在最外层表格单元格的 (表格序号, 行, 列)，不在表格中时为 None，
+    fingerprint 为归一化文本的 64 位指纹（见 engine.normalize，不写入缓存）。
+    """
+    __slots__ = BLOCK_FIELDS + ('fingerprint',)
+
+    def __init__(self, text, tag, level=0, identifier=None, node_index=-1, start=-1, end=-1, cell=None,
+                 fingerprint=None):
+        self.text = text
+        self.tag = tag
+        self.level = level  # 用于结构化匹配
+        self.identifier = identifier  # 用于锚点定位（如"第3条"）
+        self.node_index = node_index
+        self.start = start
+        self.end = end
+        self.cell = cell  # 表格单元格按行/列对齐单独对比（见 engine.table_diff）
+        self.fingerprint = fingerprint
+
+    def __repr__(self):
+        return f"TextBlock({self.tag}, level={self.level}, identifier={self.identifier!r}, text={self.text[:20]!r})"
+
+
+class CellTracker:
+    """跟踪当前所在的最外层表格单元格（HTML 解析与 docx 流式解析共用）
+
+    表格按起始顺序编号，行、列为单元格在表格中的位置（不在 <tr> 中的单元格视为单独一行）；
+    嵌套表格整体视为外层单元格的内容（见 engine.table_diff.tables_from_blocks）。
+    """
+
+    def _init_cells(self):
+        self.cell = None  # 当前单元格 (表格序号, 行, 列)
+        self._table_count = 0
+        self._table_depth = 0
+        self._table = None  # [表格序号, 当前行, 当前列, 是否在行内]
+
+    def _track_start(self, tag):
+        if tag == 'table':
+            self._table_depth += 1
+            if self._table_depth == 1:
+                self._table = [self._table_count, -1, -1, False]
+                self._table_count += 1
+        elif self._table_depth == 1:
+            table = self._table
+            if tag == 'tr' or (tag in _CELL_TAGS and not table[3]):
+                # 单元格不在 <tr> 中（不规范的 HTML）：视为单独一行
+                table[1] += 1
+                table[2] = -1
+                table[3] = True
+            if tag in _CELL_TAGS:
+                table[2] += 1
+                self.cell = (table[0], table[1], table[2])
+
+    def _track_end(self, tag):
+        if tag == 'table' and self._table_depth:
+            self._table_depth -= 1
+            if not self._table_depth:
+                self._table = None
+                self.cell = None
+        elif self._table_depth == 1:
+            if tag == 'tr':
+                self._table[3] = False
+            elif tag in _CELL_TAGS:
+                self.cell = None
+
+
+class _BlockExtractor(CellTracker, HTMLParser):
+    """单次顺序扫描 HTML，按文档顺序收集目标标签的文本、层级、源码偏移与所在单元格"""
+
+    def __init__(self, html_content):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self._init_cells()
+        self.html_content = html_content
+        # 每行起始偏移，用于把 getpos() 的 (行, 列) 换算为绝对偏移
+        self.line_offsets = [0]
+        for match in re.finditer('\n', html_content):
+            self.line_offsets.append(match.end())
+        self.node_count = 0
+        self.open_nodes = []  # [标签, 序号, 层级, 内部起始偏移, 文本片段列表, 所在单元格]
+        self.closed_nodes = []
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self.line_offsets[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        self._track_start(tag)
+        if tag not in _TARGET_TAG_SET:
+            return
+        # 提取合同层级信息（基于CSS类名，如 clause-level1 对应一级条款）
+        level = 0
+        for name, value in attrs:
+            if name == 'class' and value:
+                for cls in value.split():
+                    if cls.startswith(LEVEL_CLASS_PREFIX):
+                        level = int(cls[len(LEVEL_CLASS_PREFIX):])
+                        break
+        inner_start = self._offset() + len(self.get_starttag_text())
+        self.open_nodes.append([tag, self.node_count, level, inner_start, [], self.cell])
+        self.node_count += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # 自闭合标签（如 <br/>、<img/>）不含文本
+        self._track_start(tag)
+        self._track_end(tag)
+        if tag in _TARGET_TAG_SET:
+            self.node_count += 1
+
+    def handle_endtag(self, tag):
+        self._track_end(tag)
+        if tag not in _TARGET_TAG_SET:
+            return
+        # 关闭最近一个同名元素（其后未闭合的元素一并视为结束）
+        for i in range(len(self.open_nodes) - 1, -1, -1):
+            if self.open_nodes[i][0] == tag:
+                end = self._offset()
+                while len(self.open_nodes) > i:
+                    self._close(self.open_nodes.pop(), end)
+                break
+
+    def handle_data(self, data):
+        # 与 get_text(strip=True) 一致：逐段去除首尾空白后拼接，并计入所有祖先元素
+        text = data.strip()
+        if text:
+            for node in self.open_nodes:
+                node[4].append(text)
+
+    def _close(self, node, end):
+        tag, node_index, level, start, pieces, cell = node
+        self.closed_nodes.append((node_index, tag, level, start, end, ''.join(pieces), cell))
+
+    def close(self):
+        super().close()
+        end = len(self.html_content)
+        while self.open_nodes:
+            self._close(self.open_nodes.pop(), end)
+
+
+# --------------------------------------------------------
+# 从 HTML 提取文本块
+# --------------------------------------------------------
+def extract_text_blocks(html_content, normalization=DEFAULT_NORMALIZATION):
+    """单次遍历 HTML，按文档顺序返回非空的 TextBlock 列表（同时计算归一化指纹）"""
+    extractor = _BlockExtractor(html_content)
+    extractor.feed(html_content)
+    extractor.close()
+
+    text_blocks = []
+    # 元素在结束标签处收集完成，按起始顺序（文档顺序）排列
+    for node_index, tag, level, start, end, text, cell in sorted(extractor.closed_nodes, key=lambda node: node[0]):
+        if not text:
+            continue  # 跳过空文本块
+        match = CLAUSE_PATTERN.match(text)
+        identifier = match.group() if match else None
+        text_blocks.append(TextBlock(text, tag, level, identifier, node_index, start, end, cell))
+    return fingerprint_blocks(text_blocks, normalization)
+
+
+# 默认差异算法后端（Myers O(ND)，超过编辑距离上限时整段替换）
+_DEFAULT_BACKEND = get_diff_backend()
+
+# 相似度匹配阈值：同层级条款文本相似度超过该值视为同一条款
+SIMILARITY_THRESHOLD = 0.7
+
+# 无标识条款的匹配策略
+MATCH_STRATEGIES = ('anchored', 'greedy', 'vector')
+
+
+def match_blocks_by_structure(original_blocks, compare_blocks, progress=None, strategy='anchored'):
+    """通过条款标识（如第1条）和层级匹配对应文本块，解决顺序变动问题
+
+    strategy 决定无标识条款的匹配方式：'anchored' 为锚点对齐（默认），'greedy' 为逐条贪心相似度匹配，
+    'vector' 为 n-gram 向量余弦相似度的全局最优分配（需要 numpy 与 scipy）。
+    """
+    matched = []
+    orig_matched = set()  # 记录已匹配的原文件索引
+    comp_matched = set()  # 记录已匹配的对比文件索引
+    total = len(original_blocks) * 2
+
+    # 预先按 (条款标识, 层级) 分桶，桶内按文档顺序保存尚未匹配的对比文件索引
+    id_buckets = defaultdict(deque)
+    for comp_idx, comp_block in enumerate(compare_blocks):
+        if comp_block.identifier:
+            id_buckets[(comp_block.identifier, comp_block.level)].append(comp_idx)
+
+    # 优先通过条款标识匹配（如"第1条"必须匹配）
+    for orig_idx, orig_block in enumerate(original_blocks):
+        _report(progress, "匹配条款", orig_idx, total)
+        orig_id = orig_block.identifier
+        if not orig_id:
+            continue
+        # 允许相邻层级的微小差异（层级相差>1级不匹配）：取三个桶队首中文档顺序最靠前的一个
+        best_bucket = None
+        for level in (orig_block.level - 1, orig_block.level, orig_block.level + 1):
+            bucket = id_buckets.get((orig_id, level))
+            if bucket and (best_bucket is None or bucket[0] < best_bucket[0]):
+                best_bucket = bucket
+        if best_bucket is not None:
+            comp_idx = best_bucket.popleft()
+            matched.append((orig_idx, comp_idx))
+            orig_matched.add(orig_idx)
+            comp_matched.add(comp_idx)
+
+    if strategy == 'greedy':
+        _match_greedy(original_blocks, compare_blocks, matched, orig_matched, comp_matched, progress)
+    elif strategy == 'anchored':
+        # 剩余未匹配项做文档级锚点对齐，只在锚点间隙内计算文本相似度
+        orig_rest = [i for i in range(len(original_blocks)) if i not in orig_matched]
+        comp_rest = [j for j in range(len(compare_blocks)) if j not in comp_matched]
+        matched.extend(anchored_alignment(
+            original_blocks, compare_blocks, orig_rest, comp_rest, is_similar,
+            lambda done, count: _report(progress, "匹配条款", len(original_blocks) + min(done, count), total)))
+    elif strategy == 'vector':
+        # 先按哈希配对完全相同的块，剩余块在各层级桶内做向量化相似度全局分配
+        orig_rest = [i for i in range(len(original_blocks)) if i not in orig_matched]
+        comp_rest = [j for j in range(len(compare_blocks)) if j not in comp_matched]
+        identical = pair_identical(original_blocks, compare_blocks, orig_rest, comp_rest)
+        identical_orig = {p[0] for p in identical}
+        identical_comp = {p[1] for p in identical}
+        _report(progress, "匹配条款", len(original_blocks) + len(identical), total)
+        matched.extend(identical)
+        matched.extend(vector_assignment(original_blocks, compare_blocks,
+                                         [i for i in orig_rest if i not in identical_orig],
+                                         [j for j in comp_rest if j not in identical_comp]))
+    else:
+        raise ValueError(f"未知的匹配策略：{strategy}（可选：{', '.join(MATCH_STRATEGIES)}）")
+
+    return matched
+
+
+def is_similar(orig_block, comp_block):
+    """文本相似度是否超过阈值（先用长度/字符频次上界快速排除，不影响判断结果）"""
+    matcher = SequenceMatcher(None, orig_block.text, comp_block.text)
+    if matcher.real_quick_ratio() <= SIMILARITY_THRESHOLD or matcher.quick_ratio() <= SIMILARITY_THRESHOLD:
+        return False
+    return matcher.ratio() > SIMILARITY_THRESHOLD
+
+
+def _match_greedy(original_blocks, compare_blocks, matched, orig_matched, comp_matched, progress=None):
+    """旧版相似度匹配：按原文件顺序为每个未匹配块选取第一个同层级且相似的候选"""
+    total = len(original_blocks) * 2
+    # 剩余未匹配的对比文件条款按层级分桶（保持文档顺序）
+    level_buckets = defaultdict(list)
+    for comp_idx, comp_block in enumerate(compare_blocks):
+        if comp_idx not in comp_matched:
+            level_buckets[comp_block.level].append(comp_idx)
+
+    # 剩余未匹配项按层级+文本相似度匹配
+    for orig_idx, orig_block in enumerate(original_blocks):
+        _report(progress, "匹配条款", len(original_blocks) + orig_idx, total)
+        if orig_idx in orig_matched:
+            continue  # 跳过已匹配项
+        # 找同层级且文本相似度>0.7的条款
+        for comp_idx in level_buckets.get(orig_block.level, ()):
+            if comp_idx in comp_matched:
+                continue
+            if is_similar(orig_block, compare_blocks[comp_idx]):
+                matched.append((orig_idx, comp_idx))
+                orig_matched.add(orig_idx)
+                comp_matched.add(comp_idx)
+                break
+
+
+def last_index_by_level(original_blocks):
+    """原文件中每个层级最后一个条款的索引（供新增条款定位）"""
+    last_by_level = {}
+    for i, block in enumerate(original_blocks):
+        last_by_level[block.level] = i
+    return last_by_level
+
+
+def get_insert_position(original_blocks, compare_blocks, comp_idx, last_by_level=None):
+    """判断新增条款在原文件中的相对位置（如"第3条后"）"""
+    comp_block = compare_blocks[comp_idx]
+    if last_by_level is None:
+        last_by_level = last_index_by_level(original_blocks)
+    # 找到原文件中同层级的最后一个条款
+    last_orig_idx = last_by_level.get(comp_block.level, -1)
+    if last_orig_idx == -1:
+        return ""
+    orig_id = original_blocks[last_orig_idx].identifier or f"第{last_orig_idx + 1}项"
+    return f"（位于原文件{orig_id}后）"
+
+
+def highlight_differences(original_text, compare_text, diff_backend=None):
+    """增强版差异标红：优化中文分词、忽略无关空格、支持标点符号精确对比
+
+    文本无实质差异时原样返回 compare_text；否则返回转义后的标红 HTML 片段。
+    """
+    # 针对中文优化的序列匹配（使用字符级比对，避免英文分词逻辑干扰；算法后端可替换）
+    opcodes = text_opcodes(original_text, compare_text, diff_backend or _DEFAULT_BACKEND)
+    if opcodes is None:
+        return compare_text
+    return render_text_diff(original_text, compare_text, opcodes)
+
+
+def build_diff_ops(original_blocks, compare_blocks, matched_pairs, extra_compare_indices, progress=None,
+                   diff_backend=None, last_by_level=None, diff_workers=None, missing_indices=None, known_opcodes=None):
+    """生成差异操作列表（按展示顺序编号锚点）及差异计数
+
+    diff_workers 大于 1（或为 'auto'）时，文本总量较大的条款对分批并行计算字符级差异（见 engine.parallel_diff）。
+    missing_indices 为缺失的原文件文本块，默认为未出现在 matched_pairs 中的全部原文件文本块。
+    known_opcodes 为已计算字符级差异的配对 {(原索引, 新索引): opcodes}（如表格单元格），不再重复计算。
+    """
+    diff_backend = diff_backend or _DEFAULT_BACKEND
+    ops = []
+    diff_count = 0
+
+    # 1. 对比已匹配的条款块（跳过空文本块；归一化指纹相同的条款视为未修改，跳过字符级对比）
+    candidates = []
+    for orig_idx, comp_idx in matched_pairs:
+        orig_block = original_blocks[orig_idx]
+        comp_block = compare_blocks[comp_idx]
+        if not orig_block.text or not comp_block.text:
+            continue
+        changed = orig_block.fingerprint is None or orig_block.fingerprint != comp_block.fingerprint
+        candidates.append((orig_idx, comp_idx, changed))
+    known_opcodes = known_opcodes or {}
+    text_pairs = [(original_blocks[orig_idx].text, compare_blocks[comp_idx].text)
+                  for orig_idx, comp_idx, changed in candidates
+                  if changed and (orig_idx, comp_idx) not in known_opcodes]
+    results = iter_text_opcodes(text_pairs, diff_backend, diff_workers)
+    try:
+        for pair_no, (orig_idx, comp_idx, changed) in enumerate(candidates):
+            _report(progress, "标红差异", pair_no, len(candidates))
+            orig_block = original_blocks[orig_idx]
+            comp_block = compare_blocks[comp_idx]
+            if not changed:
+                opcodes = None
+            elif (orig_idx, comp_idx) in known_opcodes:
+                opcodes = known_opcodes[orig_idx, comp_idx]
+            else:
+                opcodes = next(results)
+            if opcodes is None and orig_block.level == comp_block.level:
+                continue
+
+            op = DiffOp(OP_MODIFY, orig_idx, comp_idx, opcodes, orig_block.level, comp_block.level)
+            ops.append(op)
+            # 层级变化（如一级条款变成二级条款）单独计一处差异
+            diff_count += 2 if op.level_changed else 1
+    finally:
+        # 取消对比时立即关闭并行计算（丢弃排队中的批次）
+        results.close()
+
+    # 2. 标记新增条款（合同中新增的条款单独标注来源）
+    if last_by_level is None:
+        last_by_level = last_index_by_level(original_blocks)
+    for comp_idx in extra_compare_indices:
+        comp_block = compare_blocks[comp_idx]
+        if comp_block.text:
+            diff_count += 1
+            # 新增条款标记中加入原文件位置提示（如"新增于原文件第X条后"）
+            insert_pos = get_insert_position(original_blocks, compare_blocks, comp_idx, last_by_level)
+            ops.append(DiffOp(OP_INSERT, comp_index=comp_idx, comp_level=comp_block.level,
+                              insert_position=insert_pos))
+
+    # 3. 按对比文档中的位置排序，缺失条款（展示在文末）排在最后
+    ops.sort(key=lambda op: op.comp_index)
+    if missing_indices is None:
+        matched_original = {pair[0] for pair in matched_pairs}
+        missing_indices = [i for i in range(len(original_blocks)) if i not in matched_original]
+    for orig_idx in missing_indices:
+        diff_count += 1
+        ops.append(DiffOp(OP_DELETE, orig_index=orig_idx, orig_level=original_blocks[orig_idx].level))
+    for anchor, op in enumerate(ops):
+        op.anchor = anchor
+    return ops, diff_count
+
+
+def compare_text_blocks(original_blocks, compare_blocks, compare_html, progress=None, diff_backend=None,
+                        match_strategy='anchored', last_by_level=None, render=True, watchlist=None,
+                        diff_workers=None):
+    """对比两组文本块，返回差异操作列表、标红后的对比文档及差异统计
+
+    last_by_level 为原文件预先计算的 last_index_by_level 结果（同一原文件对比多份修订时复用）。
+    render=False 时不生成标红文档（'html' 为 None，compare_html 可传 None），用于只输出差异数据的场景。
+    结果中的 'watchlist' 为变化条款中金额、日期、比例、当事方与关注词的变化（见 engine.watchlist），
+    watchlist 为 None 时使用默认关注词。diff_workers 为字符级差异的并行工作者数（见 build_diff_ops）。
+    表格单元格不参与条款匹配，按行/列对齐生成差异操作，'table_changes' 为表格的行/列级报告（见 engine.table_diff）。
+    """
+    # 1. 基于条款标识和层级的智能匹配（只匹配表格之外的文本块）
+    original_clauses = [i for i, block in enumerate(original_blocks) if block.cell is None]
+    compare_clauses = [j for j, block in enumerate(compare_blocks) if block.cell is None]
+    with tracer.span("match", strategy=match_strategy, original_blocks=len(original_clauses),
+                     compare_blocks=len(compare_clauses)) as match_span:
+        if len(original_clauses) == len(original_blocks) and len(compare_clauses) == len(compare_blocks):
+            matched_pairs = match_blocks_by_structure(original_blocks, compare_blocks, progress, match_strategy)
+        else:
+            matched_pairs = [(original_clauses[i], compare_clauses[j]) for i, j in match_blocks_by_structure(
+                [original_blocks[i] for i in original_clauses], [compare_blocks[j] for j in compare_clauses],
+                progress, match_strategy)]
+        match_span.set(pairs=len(matched_pairs))
+    fallback = not matched_pairs
+    if fallback:
+        # 退回到原始顺序对比逻辑
+        matched_pairs = list(zip(original_clauses, compare_clauses))
+        extra_compare_indices = compare_clauses[len(matched_pairs):]
+        missing_indices = original_clauses[len(matched_pairs):]
+    else:
+        # 提取未匹配的新增条款与缺失条款
+        matched_original = {pair[0] for pair in matched_pairs}
+        matched_compare = {pair[1] for pair in matched_pairs}
+        extra_compare_indices = [j for j in compare_clauses if j not in matched_compare]
+        missing_indices = [i for i in original_clauses if i not in matched_original]
+
+    # 表格单元格按行/列对齐：每个变化的单元格只对应一个差异操作
+    with tracer.span("tables") as table_span:
+        tables = diff_table_blocks(original_blocks, compare_blocks, diff_backend or _DEFAULT_BACKEND)
+        table_span.set(cells=len(tables['pairs']) + len(tables['inserted']) + len(tables['deleted']))
+    if tables['pairs'] or tables['inserted'] or tables['deleted']:
+        matched_pairs = matched_pairs + tables['pairs']
+        extra_compare_indices = sorted(extra_compare_indices + tables['inserted'])
+        missing_indices = sorted(missing_indices + tables['deleted'])
+
+    # 2. 生成差异中间表示（渲染、导航与导出共用）
+    with tracer.span("diff", pairs=len(matched_pairs), extra=len(extra_compare_indices)) as diff_span:
+        ops, diff_count = build_diff_ops(original_blocks, compare_blocks, matched_pairs, extra_compare_indices,
+                                         progress, diff_backend, last_by_level, diff_workers, missing_indices,
+                                         tables['opcodes'])
+        diff_span.set(ops=len(ops), diff_count=diff_count)
+
+    with tracer.span("watchlist") as watch_span:
+        findings = (watchlist or default_watchlist()).compare(original_blocks, compare_blocks, ops)
+        watch_span.set(findings=len(findings))
+
+    # 3. 生成最终HTML（按提取时记录的源码偏移一次拼接，缺失条款汇总追加在文档末尾）
+    full_html = None
+    if render:
+        _report(progress, "生成结果", 0, 1)
+        with tracer.span("render", ops=len(ops)) as render_span:
+            full_html = build_full_html(render_diff_document(compare_html, ops, original_blocks, compare_blocks),
+                                        RESULT_CSS)
+            render_span.set(html_chars=len(full_html))
+    return {
+        'html': full_html,
+        'ops': ops,
+        'diff_count': diff_count,
+        'fallback': fallback,  # True 表示未找到条款结构，按默认顺序对比
+        'matched_pairs': matched_pairs,
+        'extra_indices': extra_compare_indices,
+        'missing_indices': [op.orig_index for op in ops if op.kind == OP_DELETE],
+        'watchlist': findings,
+        'table_changes': tables['table_changes'],
+    }
+
+
+def load_document(docx_path, style_map=STYLE_MAP, progress=None, cache=None, normalization=DEFAULT_NORMALIZATION,
+                  image_store=None):
+    """转换并提取单个 docx，返回 (HTML片段, 文本块列表)；传入 cache 时优先读取转换缓存
+
+    传入 image_store 时图片外置到该目录（见 convert_docx_bytes）。
+    """
+    with tracer.span("load_document", file=os.path.basename(docx_path)) as load_span:
+        with open(docx_path, "rb") as docx_file:
+            docx_bytes = docx_file.read()
+        load_span.set(bytes=len(docx_bytes))
+
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(docx_bytes, style_map, external_images=image_store is not None)
+            with tracer.span("cache_lookup") as cache_span:
+                cached = cache.get(cache_key)
+                cache_span.set(hit=cached is not None)
+            if cached is not None:
+                html_content, text_blocks = cached
+                text_blocks = fingerprint_blocks(text_blocks, normalization)
+                load_span.set(blocks=len(text_blocks), cached=True)
+                return html_content, text_blocks
+
+        _report(progress, "转换文档", 0, 2)
+        with tracer.span("convert") as convert_span:
+            html_content = convert_docx_bytes(docx_bytes, style_map, image_store)
+            convert_span.set(html_chars=len(html_content))
+        _report(progress, "提取条款", 1, 2)
+        with tracer.span("extract") as extract_span:
+            text_blocks = extract_text_blocks(html_content, normalization)
+            extract_span.set(blocks=len(text_blocks))
+        load_span.set(blocks=len(text_blocks), cached=False)
+
+        if cache is not None:
+            try:
+                cache.put(cache_key, html_content, text_blocks)
+            except OSError:
+                pass  # 缓存写入失败不影响本次结果
+        return html_content, text_blocks
+
+
+def compare_documents(original_path, compare_path, style_map=STYLE_MAP, cache=None, diff_backend=None,
+                      match_strategy='anchored', normalization=DEFAULT_NORMALIZATION, render=True, watchlist=None,
+                      diff_workers=None):
+    """完整对比两个 docx 文件（转换 → 提取 → 匹配 → 标红），结果另含图片变化（见 compare_document_details）
+
+    render=False 时不生成标红文档：直接流式解析 docx 提取文本块，跳过 HTML 转换（结果 'html' 为 None）。
+    """
+    if not render:
+        from engine.docx_stream import load_blocks
+        original_blocks = load_blocks(original_path, style_map, cache, normalization)
+        compare_blocks = load_blocks(compare_path, style_map, cache, normalization)
+        compare_html = None
+    else:
+        _, original_blocks = load_document(original_path, style_map, cache=cache, normalization=normalization)
+        compare_html, compare_blocks = load_document(compare_path, style_map, cache=cache,
+                                                     normalization=normalization)
+    result = compare_text_blocks(original_blocks, compare_blocks, compare_html, diff_backend=diff_backend,
+                                 match_strategy=match_strategy, render=render, watchlist=watchlist,
+                                 diff_workers=diff_workers)
+    result['original_block_count'] = len(original_blocks)
+    result['compare_block_count'] = len(compare_blocks)
+    result.update(compare_document_details(original_path, compare_path))
+    return result
+
+
+def compare_document_details(original_path, compare_path):
+    """条款之外的结构化对比，返回 {'image_changes'}
+
+    图片按内容哈希序列对比（印章、签名图片替换不会体现在文本块中）；表格变化由 compare_text_blocks 给出。
+    """
+    from engine.image_store import compare_docx_images
+
+    return {'image_changes': compare_docx_images(original_path, compare_path)}
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""按内容寻址的转换缓存：以 docx 字节和样式映射的 SHA-256 为键，保存转换后的 HTML 与文本块"""
+import hashlib
+import json
+import os
+import tempfile
+
+from engine.compare_engine import BLOCK_FIELDS, TextBlock
+
+# 缓存格式版本：文本块结构变化时递增，使旧缓存自动失效
+CACHE_FORMAT_VERSION = 3
+
+
+class ConversionCache:
+    """磁盘缓存，总大小超过上限时按最近访问时间（LRU）淘汰"""
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(docx_bytes, style_map, external_images=False):
+        """external_images=True 时为图片外置（HTML 只含图片 URL）的转换结果，与内嵌图片的结果分开缓存"""
+        digest = hashlib.sha256()
+        digest.update(f"v{CACHE_FORMAT_VERSION}\0".encode("utf-8"))
+        digest.update(style_map.encode("utf-8"))
+        digest.update(b"\0")
+        if external_images:
+            digest.update(b"external-images\0")
+        digest.update(docx_bytes)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """命中时返回 (HTML片段, 文本块列表) 并刷新访问时间，未命中返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('version') != CACHE_FORMAT_VERSION:
+            return None
+        try:
+            os.utime(path)  # 以修改时间记录最近访问，用于 LRU 淘汰
+        except OSError:
+            pass
+        blocks = [TextBlock(*row) for row in entry['blocks']]
+        for block in blocks:
+            if block.cell is not None:
+                block.cell = tuple(block.cell)  # JSON 中保存为列表
+        return entry['html'], blocks
+
+    def put(self, key, html_content, text_blocks):
+        """写入缓存（先写临时文件再替换，避免并发进程读到半个文件）"""
+        entry = {
+            'version': CACHE_FORMAT_VERSION,
+            'html': html_content,
+            'blocks': [[getattr(block, field) for field in BLOCK_FIELDS] for block in text_blocks],
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """删除最久未访问的缓存，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""字符级差异算法后端：统一输出 difflib 风格的 opcodes (tag, i1, i2, j1, j2)"""
+from difflib import SequenceMatcher
+
+
+def _common_affix(a, b):
+    """返回公共前缀长度与公共后缀长度（后缀不与前缀重叠）"""
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def _moves_to_opcodes(moves, i_offset, j_offset):
+    """把逐字符编辑序列（'=' 相同 / '-' 删除 / '+' 新增）合并为 opcodes"""
+    opcodes = []
+    i = j = 0
+    pos = 0
+    n = len(moves)
+    while pos < n:
+        if moves[pos] == '=':
+            start = pos
+            while pos < n and moves[pos] == '=':
+                pos += 1
+            length = pos - start
+            opcodes.append(('equal', i_offset + i, i_offset + i + length, j_offset + j, j_offset + j + length))
+            i += length
+            j += length
+            continue
+        deleted = inserted = 0
+        while pos < n and moves[pos] != '=':
+            if moves[pos] == '-':
+                deleted += 1
+            else:
+                inserted += 1
+            pos += 1
+        if deleted and inserted:
+            tag = 'replace'
+        elif deleted:
+            tag = 'delete'
+        else:
+            tag = 'insert'
+        opcodes.append((tag, i_offset + i, i_offset + i + deleted, j_offset + j, j_offset + j + inserted))
+        i += deleted
+        j += inserted
+    return opcodes
+
+
+def myers_moves(a, b, max_edit_distance):
+    """Myers O(ND) 差异算法，返回逐字符编辑序列；编辑距离超过上限时返回 None"""
+    n, m = len(a), len(b)
+    max_d = min(max_edit_distance, n + m)
+    v = {1: 0}
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]  # 向下移动：新增 b 中字符
+            else:
+                x = v[k - 1] + 1  # 向右移动：删除 a 中字符
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace, x, y):
+    """沿 trace 回溯出完整编辑路径"""
+    moves = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v.get(k - 1, -1) < v.get(k + 1, -1)):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            moves.append('=')
+            x -= 1
+            y -= 1
+        if d > 0:
+            moves.append('+' if x == prev_x else '-')
+        x, y = prev_x, prev_y
+    moves.reverse()
+    return moves
+
+
+class SequenceMatcherBackend:
+    """difflib.SequenceMatcher 后端（最坏情况为平方复杂度，适合短文本）"""
+    name = 'difflib'
+
+    def __init__(self, autojunk=False):
+        # 默认关闭 autojunk：该启发式在文本超过 200 字符时会把高频汉字/标点当作垃圾字符，导致差异结果失真
+        self.autojunk = autojunk
+
+    def get_opcodes(self, a, b):
+        return SequenceMatcher(None, a, b, autojunk=self.autojunk).get_opcodes()
+
+
+class MyersBackend:
+    """Myers O(ND) 后端：编辑距离超过上限时整段按替换处理，保证单条款耗时有界"""
+    name = 'myers'
+
+    def __init__(self, max_edit_distance=500):
+        self.max_edit_distance = max_edit_distance
+
+    def get_opcodes(self, a, b):
+        if a == b:
+            return [('equal', 0, len(a), 0, len(b))] if a else []
+        # 先剥离公共前后缀，只对中间变化区域运行 Myers
+        prefix, suffix = _common_affix(a, b)
+        a_mid = a[prefix:len(a) - suffix]
+        b_mid = b[prefix:len(b) - suffix]
+
+        opcodes = []
+        if prefix:
+            opcodes.append(('equal', 0, prefix, 0, prefix))
+        moves = myers_moves(a_mid, b_mid, self.max_edit_distance)
+        if moves is None:
+            # 超过编辑距离上限：整段替换（一侧为空时为纯删除或纯新增）
+            tag = 'replace' if a_mid and b_mid else ('delete' if a_mid else 'insert')
+            opcodes.append((tag, prefix, len(a) - suffix, prefix, len(b) - suffix))
+        else:
+            opcodes.extend(_moves_to_opcodes(moves, prefix, prefix))
+        if suffix:
+            opcodes.append(('equal', len(a) - suffix, len(a), len(b) - suffix, len(b)))
+        return opcodes
+
+
+DIFF_BACKENDS = {
+    SequenceMatcherBackend.name: SequenceMatcherBackend,
+    MyersBackend.name: MyersBackend,
+}
+
+DEFAULT_DIFF_BACKEND = MyersBackend.name
+
+
+def get_diff_backend(name=None, **options):
+    """按名称创建差异后端实例（未指定时使用 Myers）"""
+    name = name or DEFAULT_DIFF_BACKEND
+    if name not in DIFF_BACKENDS:
+        raise ValueError(f"未知的差异算法：{name}（可选：{', '.join(DIFF_BACKENDS)}）")
+    return DIFF_BACKENDS[name](**options)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""差异中间表示：对比一次生成的差异操作列表，供渲染、差异导航与 docx 导出直接使用"""
+import re
+
+# 操作类型
+OP_MODIFY = 'modify'  # 已匹配条款的文本和/或层级发生变化
+OP_INSERT = 'insert'  # 对比文件新增的条款
+OP_DELETE = 'delete'  # 原文件有、对比文件缺失的条款
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def preprocess_text(text):
+    """统一空格和换行符：合并连续空白为单个空格并去除首尾空白（合同中常因格式产生无关空格差异）"""
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class DiffOp:
+    """单条差异操作
+
+    opcodes 为预处理后文本上的 (tag, i1, i2, j1, j2) 列表；文本无实质变化（仅层级变化）时为 None。
+    anchor 为该差异在结果文档中的锚点编号（按展示顺序从 0 开始），导航时直接按编号定位。
+    """
+    __slots__ = ('kind', 'orig_index', 'comp_index', 'opcodes', 'orig_level', 'comp_level',
+                 'insert_position', 'anchor')
+
+    def __init__(self, kind, orig_index=None, comp_index=None, opcodes=None, orig_level=None, comp_level=None,
+                 insert_position=None, anchor=-1):
+        self.kind = kind
+        self.orig_index = orig_index
+        self.comp_index = comp_index
+        self.opcodes = opcodes
+        self.orig_level = orig_level
+        self.comp_level = comp_level
+        self.insert_position = insert_position
+        self.anchor = anchor
+
+    @property
+    def level_changed(self):
+        return self.kind == OP_MODIFY and self.orig_level != self.comp_level
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return (f"DiffOp({self.kind}, orig={self.orig_index}, comp={self.comp_index}, "
+                f"anchor={self.anchor})")
+
+
+def text_opcodes(original_text, compare_text, diff_backend):
+    """计算预处理后文本的字符级差异，无实质差异时返回 None"""
+    if original_text == compare_text:
+        return None
+    orig_processed = preprocess_text(original_text)
+    comp_processed = preprocess_text(compare_text)
+    if orig_processed == comp_processed:
+        return None
+    return list(diff_backend.get_opcodes(orig_processed, comp_processed))
+
+
+def anchor_id(anchor):
+    """差异锚点在结果 HTML 中的元素 id"""
+    return f"diff-{anchor}"
+
+
+class DiffNavigator:
+    """按展示顺序在差异之间前后跳转（差异按锚点编号存放，跳转为 O(1)）"""
+
+    def __init__(self, ops=()):
+        self.ops = sorted(ops, key=lambda op: op.anchor)
+        self.position = -1
+
+    def __len__(self):
+        return len(self.ops)
+
+    def current(self):
+        return self.ops[self.position] if 0 <= self.position < len(self.ops) else None
+
+    def next(self):
+        """跳到下一处差异（到末尾后回到第一处）"""
+        if not self.ops:
+            return None
+        self.position = (self.position + 1) % len(self.ops)
+        return self.ops[self.position]
+
+    def previous(self):
+        """跳到上一处差异（到开头后回到最后一处）"""
+        if not self.ops:
+            return None
+        self.position = (self.position - 1) % len(self.ops) if self.position >= 0 else len(self.ops) - 1
+        return self.ops[self.position]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""按差异操作列表导出带标红的 .docx 副本（删除部分带删除线），无需重新解析结果 HTML"""
+from docx import Document
+from docx.shared import RGBColor
+
+from engine.diff_ir import OP_DELETE, OP_INSERT, preprocess_text
+
+# 与旧版导出一致：只输出段落与列表项（表格单元格内的段落同样是 p）
+EXPORT_TAGS = frozenset(('p', 'li'))
+
+_RED = RGBColor(255, 0, 0)
+
+
+def _add_run(para, text, highlight=False, strike=False):
+    run = para.add_run(text)
+    if highlight or strike:
+        run.font.color.rgb = _RED
+        run.bold = True
+    if strike:
+        run.font.strike = True
+    return run
+
+
+def _add_text_diff(para, original_text, compare_text, opcodes):
+    """按字符级差异写入带格式的文本片段（与 HTML 渲染的标注文字一致）"""
+    orig_processed = preprocess_text(original_text)
+    comp_processed = preprocess_text(compare_text)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            _add_run(para, compare_text[j1:j2])
+        elif tag == 'insert':
+            _add_run(para, f"[新增]{comp_processed[j1:j2]}", highlight=True)
+        elif tag == 'delete':
+            _add_run(para, f"[删除]{orig_processed[i1:i2]}", strike=True)
+        elif tag == 'replace':
+            _add_run(para, f"[删除]{orig_processed[i1:i2]}", strike=True)
+            _add_run(para, f"[替换为]{comp_processed[j1:j2]}", highlight=True)
+
+
+def export_diff_docx(output_path, ops, original_blocks, compare_blocks):
+    """按对比文件的段落顺序写出 docx：修改/新增的段落按差异操作着色，缺失条款汇总在文末"""
+    ops_by_comp = {op.comp_index: op for op in ops if op.kind != OP_DELETE}
+    doc = Document()
+
+    for comp_idx, block in enumerate(compare_blocks):
+        if block.tag not in EXPORT_TAGS:
+            continue
+        para = doc.add_paragraph()
+        op = ops_by_comp.get(comp_idx)
+        if op is None:
+            _add_run(para, block.text)
+        elif op.kind == OP_INSERT:
+            _add_run(para, f"[新增条款{op.insert_position}] {block.text}", highlight=True)
+        else:
+            if op.level_changed:
+                _add_run(para, "[层级变化] ")
+            if op.opcodes is None:
+                _add_run(para, block.text)
+            else:
+                _add_text_diff(para, original_blocks[op.orig_index].text, block.text, op.opcodes)
+
+    missing = [op for op in ops if op.kind == OP_DELETE]
+    if missing:
+        doc.add_paragraph().add_run("原文件缺失条款：").bold = True
+        for op in missing:
+            _add_run(doc.add_paragraph(), f"[缺失] {original_blocks[op.orig_index].text}", strike=True)
+
+    doc.save(output_path)
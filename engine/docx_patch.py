@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""在对比文件 docx 上原地打补丁导出：只改写差异涉及的文字，保留原有格式、表格与样式
+
+差异按字符位置对应到 word/document.xml 中相应段落原有的 <w:r>，只拆分差异涉及的 run（各部分沿用原 run 的字符格式），
+超链接、书签、图片等其余内容原样保留；其余 zip 成员内容不变（按原压缩方式重新写入）。
+两种标注方式：
+    'track'  — Word 原生修订（w:ins / w:del），可在 Word 中逐条接受或拒绝；
+    'markup' — 红色加粗/删除线文字，与标红 HTML 的标注一致。
+"""
+import re
+import zipfile
+from bisect import bisect_right
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, unescape
+
+from engine.diff_ir import OP_DELETE, OP_INSERT, preprocess_text
+
+PATCH_MODES = ('track', 'markup')
+DEFAULT_AUTHOR = '文件对比工具'
+
+DOCUMENT_PART = 'word/document.xml'
+
+# 段落起止标签（不匹配 <w:pPr>、<w:pStyle> 等同前缀标签）
+_PARAGRAPH_TAG = re.compile(r'<w:p(?=[\s>/])[^>]*?(/?)>|</w:p>')
+_TEXT = re.compile(r'<w:t(?:\s[^>]*)?>([^<]*)</w:t>')
+_PPR = re.compile(r'<w:pPr>.*?</w:pPr>|<w:pPr/>', re.S)
+# <w:r> 的开始标签、字符格式与其余子元素（<w:r(?:\s 不匹配 <w:rPr>、<w:rFonts> 等同前缀标签）
+_RUN = re.compile(r'(<w:r(?:\s[^>]*)?>)\s*(?:<w:rPr>(.*?)</w:rPr>|<w:rPr/>)?(.*?)</w:r>', re.S)
+_RPR_CHILD = re.compile(r'<w:(\w+)\b[^>]*?(?:/>|>.*?</w:\1>)', re.S)
+# 段落中已有的修订内容（不含段落标记处自闭合的 <w:ins .../>）
+_REVISION = re.compile(r'<w:(?:ins|del|moveFrom|moveTo)\s[^>]*[^/]>')
+_REVISION_ID = re.compile(r'w:id="(\d+)"')
+_WHITESPACE = re.compile(r'\s+')
+_XML_ENTITIES = {'&quot;': '"', '&apos;': "'"}
+
+# w:rPr 子元素在 OOXML 架构中的顺序（Word 对顺序敏感），仅列出常见元素
+_RPR_ORDER = ('rStyle', 'rFonts', 'b', 'bCs', 'i', 'iCs', 'caps', 'smallCaps', 'strike', 'dstrike', 'outline',
+              'shadow', 'emboss', 'imprint', 'noProof', 'snapToGrid', 'vanish', 'webHidden', 'color', 'spacing',
+              'w', 'kern', 'position', 'sz', 'szCs', 'highlight', 'u', 'effect', 'bdr', 'shd', 'fitText',
+              'vertAlign', 'rtl', 'cs', 'em', 'lang', 'eastAsianLayout', 'specVanish', 'oMath')
+_RPR_RANK = {name: rank for rank, name in enumerate(_RPR_ORDER)}
+
+
+def _match_key(text):
+    """段落与文本块的对应键：去掉全部空白（文本块提取时会去掉行内元素边界处的空白）"""
+    return _WHITESPACE.sub('', text)
+
+
+def _scan_paragraphs(xml):
+    """扫描 document.xml 中不含嵌套段落的 <w:p> 元素，返回 [(起始偏移, 结束偏移, 文本)]"""
+    paragraphs = []
+    stack = []  # [起始偏移, 是否含嵌套段落]
+    for match in _PARAGRAPH_TAG.finditer(xml):
+        if match.group(0).startswith('</'):
+            if not stack:
+                continue
+            start, has_nested = stack.pop()
+            if stack:
+                stack[-1][1] = True
+            if not has_nested:
+                end = match.end()
+                text = ''.join(_TEXT.findall(xml, start, end))
+                paragraphs.append((start, end, unescape(text, _XML_ENTITIES)))
+        elif match.group(1):  # 自闭合的空段落
+            if stack:
+                stack[-1][1] = True
+        else:
+            stack.append([match.start(), False])
+    return paragraphs
+
+
+def _is_container(compare_blocks, index):
+    """文本块是否包含后续文本块（表格单元格、含子列表的列表项），其文字由内层文本块对应"""
+    block = compare_blocks[index]
+    if block.tag in ('td', 'th'):
+        return True
+    following = compare_blocks[index + 1] if index + 1 < len(compare_blocks) else None
+    return following is not None and block.start >= 0 and block.start <= following.start < block.end
+
+
+def map_blocks_to_paragraphs(xml, compare_blocks):
+    """按文档顺序把文本块对应到段落，返回 {文本块索引: [(起始偏移, 结束偏移, 段落文本), ...]}
+
+    mammoth 会把样式相同的相邻段落（如连续的 "标题 3"、"签名项"）合并为一个文本块，
+    因此一个文本块对应一段或连续多段，各段对应键拼接后与文本块的对应键相同。
+    mammoth 会跳过空段落，且可能附加脚注等不在正文中的内容，因此按对应键做顺序对齐而非按序号直接对应。
+    表格单元格按行/列对齐对比，差异操作落在单元格上，因此单元格对应其内层文本块的全部段落（拼接后须与单元格一致）；
+    其他容器块（含子列表的列表项等）不参与对应。
+    """
+    paragraphs = [(p, _match_key(p[2])) for p in _scan_paragraphs(xml)]
+    paragraphs = [(p, key) for p, key in paragraphs if key]
+    mapping = {}
+    containers = []
+    para_pos = 0
+    for block_idx in range(len(compare_blocks)):
+        if _is_container(compare_blocks, block_idx):
+            if compare_blocks[block_idx].tag in ('td', 'th'):
+                containers.append(block_idx)
+            continue
+        key = _match_key(compare_blocks[block_idx].text)
+        # 在后续少量段落中查找起始段落（容忍 mammoth 未输出的段落），找不到则视为无法对应
+        for pos in range(para_pos, min(para_pos + 8, len(paragraphs))):
+            joined = ''
+            end = pos
+            while end < len(paragraphs) and len(joined) < len(key) and key.startswith(joined + paragraphs[end][1]):
+                joined += paragraphs[end][1]
+                end += 1
+            if joined == key:
+                mapping[block_idx] = [paragraph for paragraph, _ in paragraphs[pos:end]]
+                para_pos = end
+                break
+
+    for block_idx in containers:
+        block = compare_blocks[block_idx]
+        if block.start < 0:
+            continue  # 没有源码偏移时无法确定内层文本块
+        inner = []
+        for inner_idx in range(block_idx + 1, len(compare_blocks)):
+            if not block.start <= compare_blocks[inner_idx].start < block.end:
+                break
+            if _is_container(compare_blocks, inner_idx):
+                continue  # 嵌套表格、子列表的文字由其内层文本块对应
+            if inner_idx not in mapping:
+                inner = None
+                break
+            inner.extend(mapping[inner_idx])
+        if inner and ''.join(_match_key(text) for _, _, text in inner) == _match_key(block.text):
+            mapping[block_idx] = inner
+    return mapping
+
+
+def _merge_rpr(base_rpr, additions):
+    """在基础字符格式上叠加标注格式，按架构顺序输出子元素"""
+    replaced = {_RPR_CHILD.match(item).group(1) for item in additions}
+    children = [m.group(0) for m in _RPR_CHILD.finditer(base_rpr) if m.group(1) not in replaced]
+    children.extend(additions)
+    children.sort(key=lambda item: _RPR_RANK.get(_RPR_CHILD.match(item).group(1), len(_RPR_ORDER)))
+    return f"<w:rPr>{''.join(children)}</w:rPr>" if children else ''
+
+
+def _text_xml(text, deleted=False):
+    tag = 'w:delText' if deleted else 'w:t'
+    return f'<{tag} xml:space="preserve">{escape(text)}</{tag}>'
+
+
+class _ParagraphWriter:
+    """生成标注后的 run XML（修订编号在整个文档内递增）
+
+    content 为 run 的子元素 XML（原 run 拆分出的 w:t、制表符等）；删除内容不在对比文件中，按文字生成。
+    """
+
+    def __init__(self, mode, author, first_revision_id):
+        if mode not in PATCH_MODES:
+            raise ValueError(f"未知的导出方式：{mode}（可选：{', '.join(PATCH_MODES)}）")
+        self.mode = mode
+        self.author = escape(author, {'"': '&quot;'})
+        self.date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.next_id = first_revision_id
+
+    def _revision_attrs(self):
+        attrs = f'w:id="{self.next_id}" w:author="{self.author}" w:date="{self.date}"'
+        self.next_id += 1
+        return attrs
+
+    @staticmethod
+    def _run(base_rpr, content, additions=(), open_tag='<w:r>'):
+        return f'{open_tag}{_merge_rpr(base_rpr, list(additions))}{content}</w:r>'
+
+    def equal(self, base_rpr, content, open_tag='<w:r>'):
+        return self._run(base_rpr, content, open_tag=open_tag) if content else ''
+
+    def inserted(self, base_rpr, content, label, open_tag='<w:r>'):
+        if not content:
+            return ''
+        if self.mode == 'track':
+            return f'<w:ins {self._revision_attrs()}>{self._run(base_rpr, content, open_tag=open_tag)}</w:ins>'
+        additions = ('<w:b/>', '<w:color w:val="FF0000"/>')
+        label_run = self._run(base_rpr, _text_xml(label), additions, open_tag) if label else ''
+        return label_run + self._run(base_rpr, content, additions, open_tag)
+
+    def deleted(self, base_rpr, text, label, open_tag='<w:r>'):
+        if not text:
+            return ''
+        if self.mode == 'track':
+            run = self._run(base_rpr, _text_xml(text, deleted=True), open_tag=open_tag)
+            return f'<w:del {self._revision_attrs()}>{run}</w:del>'
+        additions = ('<w:b/>', '<w:strike/>', '<w:color w:val="FF0000"/>')
+        return self._run(base_rpr, _text_xml(f"{label}{text}"), additions, open_tag)
+
+    def paragraph_mark(self, kind):
+        """修订模式下新增/删除段落标记的 w:rPr（拒绝或接受全部修订后不残留空段落），标注模式下为空"""
+        if self.mode != 'track':
+            return ''
+        return f'<w:rPr><w:{kind} {self._revision_attrs()}/></w:rPr>'
+
+    def new_paragraph(self, runs, kind):
+        """追加的新段落（修订模式下段落标记同样记为修订）"""
+        mark = self.paragraph_mark(kind)
+        return f"<w:p>{f'<w:pPr>{mark}</w:pPr>' if mark else ''}{runs}</w:p>"
+
+
+def _mark_paragraph(ppr, mark):
+    """把段落标记的修订信息（<w:rPr><w:ins .../></w:rPr>）并入 w:pPr（w:rPr 位于 w:sectPr、w:pPrChange 之前）"""
+    revision = mark[len('<w:rPr>'):-len('</w:rPr>')]
+    if not ppr or ppr == '<w:pPr/>':
+        return f'<w:pPr>{mark}</w:pPr>'
+    rpr_at = ppr.find('<w:rPr>')
+    if rpr_at >= 0:
+        # 修订元素是段落标记 w:rPr 的第一个子元素
+        return f"{ppr[:rpr_at + len('<w:rPr>')]}{revision}{ppr[rpr_at + len('<w:rPr>'):]}"
+    if '<w:rPr/>' in ppr:
+        return ppr.replace('<w:rPr/>', mark, 1)
+    insert_at = len(ppr) - len('</w:pPr>')
+    for tail in ('<w:sectPr', '<w:pPrChange'):
+        position = ppr.find(tail)
+        if position >= 0:
+            insert_at = min(insert_at, position)
+    return f"{ppr[:insert_at]}{mark}{ppr[insert_at:]}"
+
+
+def _with_mark(paragraph_xml, mark):
+    """把段落标记的修订信息写入段落的 w:pPr（没有则新建）"""
+    ppr = _PPR.search(paragraph_xml)
+    if ppr:
+        return f"{paragraph_xml[:ppr.start()]}{_mark_paragraph(ppr.group(0), mark)}{paragraph_xml[ppr.end():]}"
+    open_end = paragraph_xml.index('>') + 1
+    return f"{paragraph_xml[:open_end]}{_mark_paragraph('', mark)}{paragraph_xml[open_end:]}"
+
+
+def _text_runs(paragraph_xml):
+    """段落中含文字的 <w:r>：[(匹配对象, [(子元素 XML, 文字)])]，制表符、图片等非文字子元素的文字为 None
+
+    不含 w:t 的 run（图片、域代码、脚注引用等）不在其中，打补丁时原样保留。
+    """
+    runs = []
+    for match in _RUN.finditer(paragraph_xml):
+        content = match.group(3)
+        children = []
+        cursor = 0
+        for text in _TEXT.finditer(content):
+            if text.start() > cursor:
+                children.append((content[cursor:text.start()], None))
+            children.append((text.group(0), unescape(text.group(1), _XML_ENTITIES)))
+            cursor = text.end()
+        if not children:
+            continue
+        if cursor < len(content):
+            children.append((content[cursor:], None))
+        runs.append((match, children))
+    return runs
+
+
+def _revision_spans(stream, comp_processed, orig_processed, opcodes):
+    """把预处理后文本上的字符级差异换算为段落原文（各 w:t 文字依次拼接）中的位置
+
+    两者的非空白字符一一对应（文本块提取与预处理只改变空白）；返回
+    (新增区间 [(起, 止, 标签)], 删除内容 [(位置, 文字, 标签)])，均按位置排序。
+    """
+    visible = [position for position, ch in enumerate(stream) if not ch.isspace()]
+    counts = [0]  # 预处理后文本各位置之前的非空白字符数
+    for ch in comp_processed:
+        counts.append(counts[-1] + (not ch.isspace()))
+
+    def locate(j):
+        if j == 0:
+            return 0
+        if j >= len(comp_processed):
+            return len(stream)
+        position = visible[counts[j] - 1] + 1
+        if comp_processed[j - 1].isspace():
+            # 位置在空白之后：跳过原文中对应的空白
+            while position < len(stream) and stream[position].isspace():
+                position += 1
+        return position
+
+    inserted = []
+    deleted = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        start, end = locate(j1), locate(j2)
+        if tag in ('delete', 'replace'):
+            deleted.append((start, orig_processed[i1:i2], '[删除]'))
+        if tag in ('insert', 'replace') and start < end:
+            inserted.append((start, end, '[新增]' if tag == 'insert' else '[替换为]'))
+    return inserted, deleted
+
+
+def _patch_runs(writer, paragraph_xmls, parsed, inserted, deleted):
+    """在各段原有的 run 上标注差异，返回改写后的段落 XML
+
+    只拆分差异涉及的 run，拆出的每一部分沿用所在 run 的字符格式；超链接、书签、批注范围、图片等非文字内容留在原处。
+    删除内容插在其位置所在的 run 中：位于两个 run 之间时放在后一个 run 开头（与替换后的新增内容相邻），
+    位于段末时放在最后一个 run 末尾。
+    """
+    starts = [start for start, _, _ in inserted]
+    labels = {start: label for start, _, label in inserted}
+    bounds = sorted({position for start, end, _ in inserted for position in (start, end)})
+    pending = list(reversed(deleted))
+
+    def is_inserted(position):
+        k = bisect_right(starts, position) - 1
+        return k >= 0 and position < inserted[k][1]
+
+    patched = []
+    offset = 0
+    for paragraph_xml, runs in zip(paragraph_xmls, parsed):
+        paragraph_end = offset + sum(len(text or '') for _, children in runs for _, text in children)
+        pieces = []
+        cursor = 0
+        for match, children in runs:
+            units = []  # [(状态, 子元素 XML 或删除文字, 标签)]，状态为 'equal'/'ins'/'del'
+            for child_xml, text in children:
+                if not text:
+                    # 非文字子元素跟随前一个字符的标注状态
+                    state = 'ins' if offset and is_inserted(offset - 1) else 'equal'
+                    units.append((state, child_xml, ''))
+                    continue
+                start, end = offset, offset + len(text)
+                cuts = [start] + [b for b in bounds if start < b < end]
+                cuts += [p for p, _, _ in pending if start < p < end]
+                cuts = sorted(set(cuts)) + [end]
+                for x, y in zip(cuts, cuts[1:]):
+                    while pending and pending[-1][0] <= x:
+                        _, deleted_text, label = pending.pop()
+                        units.append(('del', deleted_text, label))
+                    inside = is_inserted(x)
+                    label = labels.get(x, '') if inside else ''
+                    units.append(('ins' if inside else 'equal', _text_xml(text[x - start:y - start]), label))
+                while end == paragraph_end and pending and pending[-1][0] <= end:
+                    _, deleted_text, label = pending.pop()
+                    units.append(('del', deleted_text, label))
+                offset = end
+            if all(state == 'equal' for state, _, _ in units):
+                continue  # 不涉及差异的 run 原样保留
+            open_tag, base_rpr = match.group(1), match.group(2) or ''
+            groups = []
+            for state, content, label in units:
+                if groups and state != 'del' and groups[-1][0] == state and not label:
+                    groups[-1][1] += content
+                else:
+                    groups.append([state, content, label])
+            rendered = []
+            for state, content, label in groups:
+                if state == 'del':
+                    rendered.append(writer.deleted(base_rpr, content, label, open_tag))
+                elif state == 'ins':
+                    rendered.append(writer.inserted(base_rpr, content, label, open_tag))
+                else:
+                    rendered.append(writer.equal(base_rpr, content, open_tag))
+            pieces.append(paragraph_xml[cursor:match.start()])
+            pieces.append(''.join(rendered))
+            cursor = match.end()
+        pieces.append(paragraph_xml[cursor:])
+        patched.append(''.join(pieces))
+    return patched
+
+
+def _patch_document_xml(xml, ops, original_blocks, compare_blocks, writer):
+    """按差异操作替换变化段落并在正文末尾追加缺失条款，返回 (新 XML, 统计)"""
+    mapping = map_blocks_to_paragraphs(xml, compare_blocks)
+    replacements = []
+    unmapped = 0
+    for op in ops:
+        if op.kind == OP_DELETE:
+            continue
+        if op.kind != OP_INSERT and op.opcodes is None:
+            continue  # 仅层级变化：Word 段落样式已体现新层级，无需改写文字
+        paragraphs = mapping.get(op.comp_index)
+        if paragraphs is None:
+            unmapped += 1
+            continue
+        paragraph_xmls = [xml[start:end] for start, end, _ in paragraphs]
+        parsed = [_text_runs(paragraph_xml) for paragraph_xml in paragraph_xmls]
+        stream = ''.join(text or '' for runs in parsed for _, children in runs for _, text in children)
+        comp_processed = preprocess_text(compare_blocks[op.comp_index].text)
+        if (any(_REVISION.search(paragraph_xml) for paragraph_xml in paragraph_xmls)
+                or _match_key(stream) != _match_key(comp_processed)):
+            # 已含修订的段落不再嵌套修订；run 中的文字与文本块不一致时无法定位差异
+            unmapped += 1
+            continue
+        if op.kind == OP_INSERT:
+            # 新增条款整体标为新增（段落标记同样记为新增），标签只加在第一段
+            inserted, deleted = [(0, len(stream), f"[新增条款{op.insert_position}] ")], []
+            marks = [writer.paragraph_mark('ins') for _ in paragraphs]
+        else:
+            inserted, deleted = _revision_spans(stream, comp_processed,
+                                                preprocess_text(original_blocks[op.orig_index].text), op.opcodes)
+            marks = [''] * len(paragraphs)
+        patched_xmls = _patch_runs(writer, paragraph_xmls, parsed, inserted, deleted)
+        for (start, end, _), paragraph_xml, mark in zip(paragraphs, patched_xmls, marks):
+            replacements.append((start, end, _with_mark(paragraph_xml, mark) if mark else paragraph_xml))
+    patched = len(replacements)
+
+    missing = [op for op in ops if op.kind == OP_DELETE]
+    if missing:
+        # 缺失条款汇总追加到正文最后（位于正文级 w:sectPr 之前）；修订模式下标题为新增内容，
+        # 缺失条款为删除内容（段落标记同样记为删除），接受或拒绝全部修订后都不残留空段落
+        body_end = xml.rindex('</w:body>')
+        sect_pr = xml.rfind('<w:sectPr', 0, body_end)
+        insert_at = sect_pr if sect_pr >= 0 and '</w:p>' not in xml[sect_pr:body_end] else body_end
+        title = "原文件缺失条款："
+        title_run = (writer.inserted('<w:b/>', _text_xml(title), '') if writer.mode == 'track'
+                     else writer.equal('<w:b/>', _text_xml(title)))
+        paragraphs = [writer.new_paragraph(title_run, 'ins')]
+        for op in missing:
+            paragraphs.append(writer.new_paragraph(
+                writer.deleted('', original_blocks[op.orig_index].text, '[缺失] '), 'del'))
+        replacements.append((insert_at, insert_at, ''.join(paragraphs)))
+
+    pieces = []
+    cursor = 0
+    for start, end, fragment in sorted(replacements, key=lambda item: item[0]):
+        pieces.append(xml[cursor:start])
+        pieces.append(fragment)
+        cursor = end
+    pieces.append(xml[cursor:])
+    stats = {'patched_paragraphs': patched, 'unmapped_ops': unmapped, 'missing_clauses': len(missing)}
+    return ''.join(pieces), stats
+
+
+def patch_docx(revised_path, output_path, ops, original_blocks, compare_blocks, mode='track',
+               author=DEFAULT_AUTHOR):
+    """以对比文件为底稿导出带差异标注的 docx，返回统计信息
+
+    ops/original_blocks/compare_blocks 即 compare_text_blocks 的差异操作列表及对比时使用的文本块。
+    """
+    with zipfile.ZipFile(revised_path) as source:
+        xml = source.read(DOCUMENT_PART).decode('utf-8')
+        revision_ids = [int(i) for i in _REVISION_ID.findall(xml)]
+        writer = _ParagraphWriter(mode, author, max(revision_ids, default=0) + 1)
+        patched_xml, stats = _patch_document_xml(xml, ops, original_blocks, compare_blocks, writer)
+
+        with zipfile.ZipFile(output_path, 'w') as target:
+            for info in source.infolist():
+                # 保留原成员的文件名、时间戳与压缩方式
+                data = patched_xml.encode('utf-8') if info.filename == DOCUMENT_PART else source.read(info)
+                target.writestr(info, data)
+    return stats
@@ -0,0 +1,938 @@
+# -*- coding: utf-8 -*-
+"""直接流式解析 .docx 提取文本块：不经过 mammoth 转换 HTML 再解析 HTML，只用于不需要显示结果的对比（如批量 JSON 输出）
+
+按 mammoth 的转换规则重现 extract_text_blocks 的结果：样式映射（含 mammoth 默认的标题/列表映射）、
+相邻的非 :fresh 元素合并、表格表头与纵向合并单元格、文本框段落后置、脚注/尾注附在文末等。
+word/document.xml 用 iterparse 逐个顶层元素解析并立即释放；styles.xml、numbering.xml 先行读取。
+得到的 TextBlock 与 HTML 路径的 text/tag/level/identifier 一致，node_index 为文档顺序，
+start/end 为 -1（没有 HTML 源码，不能用于渲染标红结果）。
+
+版本锁定是必需的：这里复现的是 mammoth 1.13.0 的转换规则，并直接使用 mammoth 的内部模块
+（mammoth.options.read_options 解析样式映射、mammoth.html_paths、mammoth.docx.dingbats），
+它们都不属于公开接口，任何版本都可能改变。因此 requirements.txt 固定 mammoth==1.13.0，
+本模块只在安装的版本等于 MAMMOTH_VERSION 时启用；版本不同时 load_blocks 发出 RuntimeWarning
+并改走 mammoth 转换路径（结果正确，但失去流式提取的速度与内存优势）。
+升级 mammoth 时需逐条核对转换规则的变化，通过 benchmarks/check_stream_parity.py 的一致性检查后，
+同时修改 requirements.txt 与 MAMMOTH_VERSION。
+"""
+import io
+import os
+from importlib import metadata
+import posixpath
+import re
+import warnings
+import zipfile
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+from engine.compare_engine import CLAUSE_PATTERN, LEVEL_CLASS_PREFIX, STYLE_MAP, TARGET_TAGS, CellTracker, TextBlock
+from engine.normalize import DEFAULT_NORMALIZATION, fingerprint_blocks
+from engine.tracing import tracer
+
+# 转换规则所对应的 mammoth 版本（与 requirements.txt 中的版本一致）
+MAMMOTH_VERSION = '1.13.0'
+
+# 域代码指令（超链接与复选框）
+_HYPERLINK_INSTR = re.compile(r'^\s*HYPERLINK\s+(\\l\s+)?(?:"(.*)"|([^\\]\S*))')
+_CHECKBOX_INSTR = re.compile(r'\s*FORMCHECKBOX\s*')
+
+# 命名空间（过渡格式与严格格式使用相同前缀）
+_NAMESPACES = {
+    'http://schemas.openxmlformats.org/wordprocessingml/2006/main': 'w',
+    'http://purl.oclc.org/ooxml/wordprocessingml/main': 'w',
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships': 'r',
+    'http://purl.oclc.org/ooxml/officeDocument/relationships': 'r',
+    'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing': 'wp',
+    'http://purl.oclc.org/ooxml/drawingml/wordprocessingDrawing': 'wp',
+    'http://schemas.openxmlformats.org/drawingml/2006/main': 'a',
+    'http://purl.oclc.org/ooxml/drawingml/main': 'a',
+    'http://schemas.openxmlformats.org/drawingml/2006/picture': 'pic',
+    'http://purl.oclc.org/ooxml/drawingml/picture': 'pic',
+    'http://schemas.openxmlformats.org/package/2006/relationships': 'rel',
+    'http://schemas.openxmlformats.org/markup-compatibility/2006': 'mc',
+    'urn:schemas-microsoft-com:vml': 'v',
+    'http://schemas.microsoft.com/office/word/2010/wordml': 'wordml',
+}
+_URIS_BY_PREFIX = {}
+for _uri, _prefix in _NAMESPACES.items():
+    _URIS_BY_PREFIX.setdefault(_prefix, []).append(_uri)
+
+_SHORT_NAMES = {}
+
+
+def _short(tag):
+    """'{uri}local' → 'w:local'（未知命名空间保留原样）"""
+    name = _SHORT_NAMES.get(tag)
+    if name is None:
+        uri, _, local = tag[1:].partition('}')
+        prefix = _NAMESPACES.get(uri)
+        name = _SHORT_NAMES[tag] = f"{prefix}:{local}" if prefix else tag
+    return name
+
+
+@lru_cache(maxsize=None)
+def _attribute_keys(name):
+    prefix, _, local = name.partition(':')
+    return tuple(f"{{{uri}}}{local}" for uri in _URIS_BY_PREFIX[prefix])
+
+
+def _attr(element, name):
+    """读取带命名空间前缀的属性（如 'w:val'）"""
+    for key in _attribute_keys(name):
+        value = element.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _child(element, name):
+    if element is None:
+        return None
+    for child in element:
+        if _short(child.tag) == name:
+            return child
+    return None
+
+
+def _child_attr(element, path, name='w:val'):
+    """沿子元素路径（如 ('w:pPr', 'w:pStyle')）取属性，路径中断时返回 None"""
+    for step in path:
+        element = _child(element, step)
+        if element is None:
+            return None
+    return _attr(element, name)
+
+
+def _is_true(element):
+    """布尔型属性元素（如 <w:b/>、<w:b w:val="0"/>）"""
+    return element is not None and _attr(element, 'w:val') not in ('false', '0')
+
+
+# ---------- 样式映射 ----------
+class _PathElement:
+    """HTML 路径中的一个元素：tag_names 首项为写出的标签名，collapsible=False 即 :fresh"""
+    __slots__ = ('tag_names', 'attributes', 'collapsible', 'separator')
+
+    def __init__(self, tag_names, attributes, collapsible, separator=None):
+        self.tag_names = tag_names
+        self.attributes = attributes
+        self.collapsible = collapsible
+        self.separator = separator
+
+
+_IGNORE = object()  # 样式映射为 "!"：整个元素不输出
+_NOT_FOUND = object()
+_FRESH_P = (_PathElement(('p',), (), False),)
+_FRESH_TABLE = (_PathElement(('table',), (), False),)
+_FRESH_BR = (_PathElement(('br',), (), False),)
+
+
+@lru_cache(maxsize=8)
+def _style_rules(style_map):
+    """用 mammoth 的解析器读取样式映射（自定义规则在前，默认规则在后）"""
+    from mammoth import html_paths
+    from mammoth.options import read_options
+    rules = []
+    for style in read_options({'style_map': style_map}).value['style_map']:
+        if style.html_path is html_paths.ignore:
+            path = _IGNORE
+        else:
+            path = tuple(_PathElement(tuple(element.tag.tag_names), tuple(sorted(element.tag.attributes.items())),
+                                      element.tag.collapsible, element.tag.separator)
+                         for element in style.html_path.elements)
+        rules.append((style.document_matcher, path))
+    return tuple(rules)
+
+
+def _find_path(rules, element_type, style_id=None, style_name=None, numbering=None, break_type=None, color=None):
+    """按 mammoth 的匹配规则返回第一条匹配的 HTML 路径，没有匹配时返回 _NOT_FOUND"""
+    for matcher, path in rules:
+        if matcher.element_type != element_type:
+            continue
+        if element_type in ('paragraph', 'run', 'table'):
+            if matcher.style_id is not None and matcher.style_id != style_id:
+                continue
+            if matcher.style_name is not None and (style_name is None or not matcher.style_name.matches(style_name)):
+                continue
+            if element_type == 'paragraph' and matcher.numbering is not None and (
+                    numbering is None
+                    or (matcher.numbering.level_index, matcher.numbering.is_ordered) != numbering):
+                continue
+        elif element_type == 'highlight':
+            if matcher.color is not None and matcher.color != color:
+                continue
+        elif element_type == 'break':
+            if matcher.break_type != break_type:
+                continue
+        return path
+    return _NOT_FOUND
+
+
+# ---------- HTML 节点（与 mammoth.html 的 strip_empty / collapse 规则一致） ----------
+_FORCE_WRITE = object()
+_VOID_TAGS = frozenset(('br', 'hr', 'img', 'input'))
+
+
+class _Element:
+    __slots__ = ('tag_names', 'attributes', 'collapsible', 'separator', 'children')
+
+    def __init__(self, tag_names, attributes, children, collapsible=False, separator=None):
+        self.tag_names = tag_names
+        self.attributes = attributes
+        self.collapsible = collapsible
+        self.separator = separator
+        self.children = children
+
+    @property
+    def tag(self):
+        return self.tag_names[0]
+
+
+def _wrap(path, nodes):
+    for element in reversed(path):
+        nodes = [_Element(element.tag_names, element.attributes, nodes, element.collapsible, element.separator)]
+    return nodes
+
+
+def _strip_empty(nodes):
+    stripped = []
+    for node in nodes:
+        if node.__class__ is str:
+            if node:
+                stripped.append(node)
+        elif node is _FORCE_WRITE:
+            stripped.append(node)
+        else:
+            children = _strip_empty(node.children)
+            if children or node.tag in _VOID_TAGS:
+                node.children = children
+                stripped.append(node)
+    return stripped
+
+
+def _collapsing_add(collapsed, node):
+    if node.__class__ is _Element:
+        children = []
+        for child in node.children:
+            _collapsing_add(children, child)
+        node.children = children
+    if not _try_collapse(collapsed, node):
+        collapsed.append(node)
+
+
+def _try_collapse(collapsed, node):
+    if not collapsed:
+        return False
+    last = collapsed[-1]
+    if last.__class__ is not _Element or node.__class__ is not _Element or not node.collapsible:
+        return False
+    if last.tag not in node.tag_names or last.attributes != node.attributes:
+        return False
+    if node.separator:
+        last.children.append(node.separator)
+    for child in node.children:
+        _collapsing_add(last.children, child)
+    return True
+
+
+# ---------- 文档结构读取（与 mammoth.docx.body_xml 的处理一致） ----------
+# 读取结果为轻量元组，首项为类型：
+#   ('paragraph', 样式ID, 样式名, 编号, 子项)   ('run', 格式, 子项)   ('text', 文本)   ('tab',)
+#   ('break', 类型)   ('hyperlink', 属性, 子项)   ('bookmark', 名称)   ('note', 类型, ID)   ('checkbox',)
+#   ('image', 链接)   ('table', 样式ID, 样式名, 子项)   ('row', 是否表头, 子项)   ('cell', 是否纵向合并, 子项)
+
+# 读取其子元素即可的容器元素
+_TRANSPARENT = frozenset((
+    'w:customXml', 'w:ins', 'w:moveFromRangeEnd', 'w:moveFromRangeStart', 'w:moveTo', 'w:moveToRangeEnd',
+    'w:moveToRangeStart', 'w:object', 'w:smartTag', 'w:drawing', 'v:group', 'v:rect', 'v:roundrect', 'v:shape',
+    'v:textbox', 'w:txbxContent',
+))
+_EMPTY = ([], [])
+
+
+class _BodyReader:
+    """读取 document.xml / 脚注 / 尾注中的正文元素；复杂域与已删除段落标记的状态跨元素保持"""
+
+    def __init__(self, styles, numbering, relationships):
+        self.styles = styles
+        self.numbering = numbering
+        self.relationships = relationships
+        self.complex_fields = []  # 复杂域栈：'begin' / ('hyperlink', 属性) / 'checkbox' / None
+        self.begin_elements = []  # 与 'begin' 对应的 w:fldChar 元素（复选框读取 ffData）
+        self.instr_text = []
+        self.deleted_paragraph_contents = []
+        self.handlers = {
+            'w:t': self.text, 'w:r': self.run, 'w:p': self.paragraph, 'w:fldChar': self.fld_char,
+            'w:instrText': self.instr, 'w:tab': lambda element: ([('tab',)], []),
+            'w:noBreakHyphen': lambda element: ([('text', '‑')], []),
+            'w:softHyphen': lambda element: ([('text', '­')], []),
+            'w:sym': self.symbol, 'w:tbl': self.table, 'w:tr': self.table_row, 'w:tc': self.table_cell,
+            'w:pict': self.pict, 'w:hyperlink': self.hyperlink, 'w:bookmarkStart': self.bookmark,
+            'w:br': self.break_, 'wp:inline': self.inline_image, 'wp:anchor': self.inline_image,
+            'v:imagedata': self.image_data, 'w:footnoteReference': self.note_reference,
+            'w:endnoteReference': self.note_reference, 'mc:AlternateContent': self.alternate_content,
+            'w:sdt': self.sdt,
+        }
+
+    def read_all(self, elements):
+        items, extra = [], []
+        for element in elements:
+            name = _short(element.tag)
+            handler = self.handlers.get(name)
+            if handler is not None:
+                element_items, element_extra = handler(element)
+            elif name in _TRANSPARENT:
+                element_items, element_extra = self.read_all(element)
+            else:
+                continue
+            items.extend(element_items)
+            extra.extend(element_extra)
+        return items, extra
+
+    def text(self, element):
+        return [('text', ''.join(element.itertext()))], []
+
+    def run(self, element):
+        properties = _child(element, 'w:rPr')
+        vertical_alignment = _child_attr(properties, ('w:vertAlign',))
+        underline = _child_attr(properties, ('w:u',))
+        highlight = _child_attr(properties, ('w:highlight',))
+        style_id = _child_attr(properties, ('w:rStyle',))
+        run_format = (
+            _is_true(_child(properties, 'w:b')),
+            _is_true(_child(properties, 'w:i')),
+            underline not in (None, 'false', '0', 'none'),
+            _is_true(_child(properties, 'w:strike')),
+            _is_true(_child(properties, 'w:caps')),
+            _is_true(_child(properties, 'w:smallCaps')),
+            vertical_alignment,
+            None if highlight in (None, '', 'none') else highlight,
+            style_id,
+            self.styles['character'].get(style_id) if style_id is not None else None,
+        )
+        children, extra = self.read_all(element)
+        # 域代码构成的超链接包在本段文字内部（在读取子元素之后判断，与 mammoth 一致）
+        for field in reversed(self.complex_fields):
+            if field.__class__ is tuple and field[0] == 'hyperlink':
+                children = [('hyperlink', field[1], children)]
+                break
+        return [('run', run_format, children)], extra
+
+    def paragraph(self, element):
+        properties = _child(element, 'w:pPr')
+        if _child(_child(properties, 'w:rPr'), 'w:del') is not None:
+            # 段落标记被删除：内容并入下一段
+            self.deleted_paragraph_contents.extend(element)
+            return _EMPTY
+        children = list(element)
+        if self.deleted_paragraph_contents:
+            children = self.deleted_paragraph_contents + children
+            self.deleted_paragraph_contents = []
+        style_id = _child_attr(properties, ('w:pStyle',))
+        style_name = self.styles['paragraph'].get(style_id) if style_id is not None else None
+        numbering = self.numbering.level_for(_child(properties, 'w:numPr'), style_id)
+        items, extra = self.read_all(children)
+        # 文本框等附加内容排在段落之后
+        return [('paragraph', style_id, style_name, numbering, items)] + extra, []
+
+    def fld_char(self, element):
+        field_type = _attr(element, 'w:fldCharType')
+        if field_type == 'begin':
+            self.complex_fields.append('begin')
+            self.begin_elements.append(element)
+            self.instr_text = []
+        elif field_type == 'separate':
+            if self.complex_fields:
+                field = self.complex_fields.pop()
+                begin = self.begin_elements.pop() if field == 'begin' else None
+                self.complex_fields.append(self._parse_instr(begin))
+                self.begin_elements.append(None)
+        elif field_type == 'end':
+            if self.complex_fields:
+                field = self.complex_fields.pop()
+                begin = self.begin_elements.pop()
+                if field == 'begin':
+                    field = self._parse_instr(begin)
+                if field == 'checkbox':
+                    return [('checkbox',)], []
+        return _EMPTY
+
+    def _parse_instr(self, begin_element):
+        instr_text = ''.join(self.instr_text)
+        link = _HYPERLINK_INSTR.match(instr_text)
+        if link is not None:
+            location = link.group(3) if link.group(2) is None else link.group(2)
+            if link.group(1) is None:
+                return ('hyperlink', (('href', location),))
+            return ('hyperlink', (('href', '#' + location),))
+        if _CHECKBOX_INSTR.match(instr_text) is not None:
+            return 'checkbox'
+        return None
+
+    def instr(self, element):
+        self.instr_text.append(''.join(element.itertext()))
+        return _EMPTY
+
+    def symbol(self, element):
+        from mammoth.docx.dingbats import dingbats
+        font, char = _attr(element, 'w:font'), _attr(element, 'w:char')
+        if char is None:
+            return _EMPTY
+        code_point = dingbats.get((font, int(char, 16)))
+        if code_point is None and len(char) == 4 and char[:2].upper() == 'F0':
+            code_point = dingbats.get((font, int(char[2:], 16)))
+        return ([('text', chr(code_point))], []) if code_point is not None else _EMPTY
+
+    def table(self, element):
+        style_id = _child_attr(_child(element, 'w:tblPr'), ('w:tblStyle',))
+        style_name = self.styles['table'].get(style_id) if style_id is not None else None
+        children, extra = self.read_all(element)
+        well_formed = all(child[0] == 'row' and all(cell[0] == 'cell' for cell in child[2]) for child in children)
+        if well_formed:
+            # 纵向合并的后续单元格不输出（其内容被丢弃）
+            children = [('row', row[1], [cell for cell in row[2] if not cell[1]]) for row in children]
+        return [('table', style_id, style_name, children)], extra
+
+    def table_row(self, element):
+        properties = _child(element, 'w:trPr')
+        if _child(properties, 'w:del') is not None:
+            return _EMPTY
+        children, extra = self.read_all(element)
+        return [('row', _child(properties, 'w:tblHeader') is not None, children)], extra
+
+    def table_cell(self, element):
+        vmerge = _child(_child(element, 'w:tcPr'), 'w:vMerge')
+        is_continuation = vmerge is not None and _attr(vmerge, 'w:val') in (None, '', 'continue')
+        children, extra = self.read_all(element)
+        return [('cell', is_continuation, children)], extra
+
+    def pict(self, element):
+        items, extra = self.read_all(element)
+        return [], items + extra
+
+    def hyperlink(self, element):
+        relationship_id = _attr(element, 'r:id')
+        anchor = _attr(element, 'w:anchor')
+        target_frame = _attr(element, 'w:tgtFrame') or None
+        children, extra = self.read_all(element)
+        if relationship_id is not None:
+            href = self.relationships.get(relationship_id, '')
+            if anchor is not None:
+                href = href.split('#', 1)[0] + '#' + anchor
+        elif anchor is not None:
+            href = '#' + anchor
+        else:
+            return children, extra
+        attributes = (('href', href),) if target_frame is None else (('href', href), ('target', target_frame))
+        return [('hyperlink', attributes, children)], extra
+
+    def bookmark(self, element):
+        name = _attr(element, 'w:name')
+        return _EMPTY if name == '_GoBack' else ([('bookmark', name)], [])
+
+    def break_(self, element):
+        break_type = _attr(element, 'w:type')
+        if not break_type or break_type == 'textWrapping':
+            return [('break', 'line')], []
+        if break_type in ('page', 'column'):
+            return [('break', break_type)], []
+        return _EMPTY
+
+    def inline_image(self, element):
+        properties = _child(element, 'wp:docPr')
+        href = None
+        link = _child(properties, 'a:hlinkClick')
+        if link is not None and _attr(link, 'r:id'):
+            href = self.relationships.get(_attr(link, 'r:id'))
+        images = []
+        for graphic in element:
+            if _short(graphic.tag) != 'a:graphic':
+                continue
+            for blip in graphic.iter():
+                if _short(blip.tag) == 'a:blip' and (_attr(blip, 'r:embed') or _attr(blip, 'r:link')):
+                    images.append(('image', href))
+        return images, []
+
+    def image_data(self, element):
+        return ([('image', None)], []) if _attr(element, 'r:id') is not None else _EMPTY
+
+    def note_reference(self, element):
+        note_type = 'footnote' if _short(element.tag) == 'w:footnoteReference' else 'endnote'
+        return [('note', note_type, _attr(element, 'w:id'))], []
+
+    def alternate_content(self, element):
+        return self.read_all(_child(element, 'mc:Fallback') or ())
+
+    def sdt(self, element):
+        items, extra = self.read_all(_child(element, 'w:sdtContent') or ())
+        if _child(_child(element, 'w:sdtPr'), 'wordml:checkbox') is None:
+            return items, extra
+        # 复选框内容控件：第一段非空文本替换为复选框，没有时整个内容替换为复选框
+        for index, item in enumerate(items):
+            if item[0] == 'text' and item[1]:
+                return items[:index] + [('checkbox',)] + items[index + 1:], extra
+        return [('checkbox',)], extra
+
+
+# ---------- 转换为 HTML 节点（与 mammoth.conversion 一致） ----------
+class _Converter:
+    def __init__(self, rules):
+        self.rules = rules
+        self.note_references = []
+        self._paragraph_paths = {}
+        self._run_paths = {}
+
+    def convert_all(self, items, is_table_header=False):
+        nodes = []
+        for item in items:
+            nodes.extend(self.convert(item, is_table_header))
+        return nodes
+
+    def convert(self, item, is_table_header=False):
+        kind = item[0]
+        if kind == 'text':
+            return [item[1]]
+        if kind == 'run':
+            path = self._run_path(item[1])
+            return [] if path is _IGNORE else _wrap(path, self.convert_all(item[2], is_table_header))
+        if kind == 'paragraph':
+            path = self._paragraph_path(item[1], item[2], item[3])
+            return [] if path is _IGNORE else _wrap(path, self.convert_all(item[4], is_table_header))
+        if kind == 'tab':
+            return ['\t']
+        if kind == 'hyperlink':
+            return [_Element(('a',), item[1], self.convert_all(item[2], is_table_header), True)]
+        if kind == 'bookmark':
+            return [_Element(('a',), (('id', item[1]),), [_FORCE_WRITE], True)]
+        if kind == 'break':
+            path = _find_path(self.rules, 'break', break_type=item[1])
+            if path is _NOT_FOUND:
+                path = _FRESH_BR if item[1] == 'line' else ()
+            return [] if path is _IGNORE else _wrap(path, [])
+        if kind == 'note':
+            self.note_references.append((item[1], item[2]))
+            label = f"[{len(self.note_references)}]"
+            return [_Element(('sup',), (), [_Element(('a',), (('href', f"#{item[1]}-{item[2]}"),), [label])])]
+        if kind == 'checkbox':
+            return [_Element(('input',), (('type', 'checkbox'),), [])]
+        if kind == 'image':
+            image = _Element(('img',), (), [])
+            return [image] if item[1] is None else [_Element(('a',), (('href', item[1]),), [image], True)]
+        if kind == 'table':
+            return self._table(item, is_table_header)
+        if kind == 'row':
+            return [_Element(('tr',), (), [_FORCE_WRITE] + self.convert_all(item[2], is_table_header))]
+        if kind == 'cell':
+            return [_Element(('th' if is_table_header else 'td',), (),
+                             [_FORCE_WRITE] + self.convert_all(item[2], is_table_header))]
+        return []
+
+    def _table(self, item, is_table_header):
+        path = _find_path(self.rules, 'table', style_id=item[1], style_name=item[2])
+        if path is _NOT_FOUND:
+            path = _FRESH_TABLE
+        if path is _IGNORE:
+            return []
+        children = item[3]
+        body_index = next((i for i, child in enumerate(children) if child[0] != 'row' or not child[1]),
+                          len(children))
+        if body_index == 0:
+            nodes = self.convert_all(children, False)
+        else:
+            nodes = [_Element(('thead',), (), self.convert_all(children[:body_index], True)),
+                     _Element(('tbody',), (), self.convert_all(children[body_index:], False))]
+        return _wrap(path, [_FORCE_WRITE] + nodes)
+
+    def _paragraph_path(self, style_id, style_name, numbering):
+        key = (style_id, style_name, numbering)
+        path = self._paragraph_paths.get(key)
+        if path is None:
+            path = _find_path(self.rules, 'paragraph', style_id, style_name, numbering)
+            if path is _NOT_FOUND:
+                path = _FRESH_P
+            self._paragraph_paths[key] = path
+        return path
+
+    def _run_path(self, run_format):
+        path = self._run_paths.get(run_format)
+        if path is None:
+            path = self._run_paths[run_format] = self._build_run_path(*run_format)
+        return path
+
+    def _build_run_path(self, bold, italic, underline, strike, caps, small_caps, vertical_alignment, highlight,
+                        style_id, style_name):
+        def property_path(element_type, default=None):
+            found = _find_path(self.rules, element_type)
+            if found is not _NOT_FOUND:
+                return found
+            return (_PathElement((default,), (), True),) if default else ()
+
+        paths = []  # 依次包裹，最后一项在最外层
+        if highlight is not None:
+            found = _find_path(self.rules, 'highlight', color=highlight)
+            if found is not _NOT_FOUND:
+                paths.append(found)
+        if small_caps:
+            paths.append(property_path('small_caps'))
+        if caps:
+            paths.append(property_path('all_caps'))
+        if strike:
+            paths.append(property_path('strikethrough', 's'))
+        if underline:
+            paths.append(property_path('underline'))
+        if vertical_alignment == 'subscript':
+            paths.append((_PathElement(('sub',), (), True),))
+        if vertical_alignment == 'superscript':
+            paths.append((_PathElement(('sup',), (), True),))
+        if italic:
+            paths.append(property_path('italic', 'em'))
+        if bold:
+            paths.append(property_path('bold', 'strong'))
+        run_style = _find_path(self.rules, 'run', style_id, style_name)
+        paths.append(() if run_style is _NOT_FOUND else run_style)
+        if any(path is _IGNORE for path in paths):
+            return _IGNORE
+        combined = ()
+        for path in paths:
+            combined = path + combined
+        return combined
+
+    def notes(self, read_note):
+        """文末脚注/尾注列表：每条引用对应一项，正文后附返回链接"""
+        items = []
+        for note_type, note_id in self.note_references:
+            body = self.convert_all(read_note(note_type, note_id))
+            body.append(_Element(('p',), (), [' ', _Element(('a',), (('href', f"#{note_type}-ref-{note_id}"),),
+                                                            ['↑'])], True))
+            items.append(_Element(('li',), (('id', f"{note_type}-{note_id}"),), body))
+        return _Element(('ol',), (), items)
+
+
+# ---------- 由 HTML 节点生成文本块（与 _BlockExtractor 一致） ----------
+_TARGET_TAG_SET = frozenset(TARGET_TAGS)
+
+
+def replay_events(node, handler):
+    """按 HTMLParser 的回调顺序把节点树重放给 handler（handle_starttag / handle_startendtag /
+    handle_endtag / handle_data；相邻文本合并为一次 handle_data，与解析转换后的 HTML 时一致）"""
+    buffer = []
+
+    def flush():
+        if buffer:
+            handler.handle_data(''.join(buffer))
+            buffer.clear()
+
+    def visit(node):
+        if node.__class__ is str:
+            buffer.append(node)
+            return
+        if node is _FORCE_WRITE:
+            return
+        flush()
+        if not node.children and node.tag in _VOID_TAGS:
+            handler.handle_startendtag(node.tag, node.attributes)
+            return
+        handler.handle_starttag(node.tag, node.attributes)
+        for child in node.children:
+            visit(child)
+        flush()
+        handler.handle_endtag(node.tag)
+
+    visit(node)
+    flush()
+
+
+class _BlockWriter(CellTracker):
+    """接收重放的节点事件：文本片段去除首尾空白后计入所有打开的目标元素"""
+
+    def __init__(self):
+        self._init_cells()
+        self.blocks = []
+        self.node_count = 0
+        self._open = []  # [标签, 序号, 层级, 文本片段列表, 所在单元格]
+        self._closed = []
+
+    def write(self, node):
+        replay_events(node, self)
+        # 父元素在子元素之后关闭，按起始顺序（序号）排列
+        self._closed.sort(key=lambda closed: closed[0])
+        for node_index, tag, level, text, cell in self._closed:
+            if not text:
+                continue
+            match = CLAUSE_PATTERN.match(text)
+            self.blocks.append(TextBlock(text, tag, level, match.group() if match else None, node_index, cell=cell))
+        self._closed = []
+
+    def handle_starttag(self, tag, attrs):
+        self._track_start(tag)
+        if tag not in _TARGET_TAG_SET:
+            return
+        level = 0
+        for name, value in attrs:
+            if name == 'class' and value:
+                for cls in value.split():
+                    if cls.startswith(LEVEL_CLASS_PREFIX):
+                        level = int(cls[len(LEVEL_CLASS_PREFIX):])
+                        break
+        self._open.append([tag, self.node_count, level, [], self.cell])
+        self.node_count += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._track_start(tag)
+        self._track_end(tag)
+        if tag in _TARGET_TAG_SET:
+            self.node_count += 1
+
+    def handle_endtag(self, tag):
+        self._track_end(tag)
+        if tag in _TARGET_TAG_SET:
+            tag, node_index, level, pieces, cell = self._open.pop()
+            self._closed.append((node_index, tag, level, ''.join(pieces), cell))
+
+    def handle_data(self, data):
+        text = data.strip()
+        if text:
+            for open_node in self._open:
+                open_node[3].append(text)
+
+
+# ---------- 包内辅助部件 ----------
+class _Numbering:
+    """numbering.xml：编号 ID + 级别 → (级别, 是否有序)，以及段落样式关联的编号"""
+
+    def __init__(self, abstract_nums=None, nums=None, numbering_styles=None):
+        self.abstract_nums = abstract_nums or {}  # abstractNumId → ({级别: (级别, 是否有序)}, numStyleLink)
+        self.nums = nums or {}  # numId → abstractNumId
+        self.numbering_styles = numbering_styles or {}  # 编号样式 ID → numId
+        self.by_paragraph_style = {}
+        for levels, _ in self.abstract_nums.values():
+            for level, style_id in levels.values():
+                if style_id is not None:
+                    self.by_paragraph_style[style_id] = level
+
+    def find_level(self, num_id, level_index, seen=None):
+        seen = seen or set()
+        if num_id in seen or num_id not in self.nums:
+            return None
+        seen.add(num_id)
+        abstract_num = self.abstract_nums.get(self.nums[num_id])
+        if abstract_num is None:
+            return None
+        levels, style_link = abstract_num
+        if style_link is None:
+            level = levels.get(level_index)
+            return level[0] if level is not None else None
+        return self.find_level(self.numbering_styles.get(style_link), level_index, seen)
+
+    def level_for(self, num_pr, paragraph_style_id):
+        num_id = _child_attr(num_pr, ('w:numId',))
+        level_index = _child_attr(num_pr, ('w:ilvl',))
+        if num_id is not None and level_index is not None:
+            return self.find_level(num_id, level_index)
+        if paragraph_style_id is not None:
+            level = self.by_paragraph_style.get(paragraph_style_id)
+            if level is not None:
+                return level
+        if num_id is not None:
+            return self.find_level(num_id, '0')
+        return None
+
+
+def _read_styles(docx_zip, path):
+    """styles.xml → {'paragraph'|'character'|'table': {样式ID: 样式名}, 'numbering': {样式ID: numId}}"""
+    styles = {'paragraph': {}, 'character': {}, 'table': {}, 'numbering': {}}
+    if path not in docx_zip.NameToInfo:
+        return styles
+    with docx_zip.open(path) as stream:
+        for _, element in ET.iterparse(stream):
+            if _short(element.tag) != 'w:style':
+                continue
+            style_type, style_id = _attr(element, 'w:type'), _attr(element, 'w:styleId')
+            target = styles.get(style_type)
+            if target is not None and style_id not in target:
+                # 相同 styleId 以第一个定义为准
+                if style_type == 'numbering':
+                    target[style_id] = _child_attr(element, ('w:pPr', 'w:numPr', 'w:numId'))
+                else:
+                    target[style_id] = _child_attr(element, ('w:name',))
+            element.clear()
+    return styles
+
+
+def _read_numbering(docx_zip, path, numbering_styles):
+    if path not in docx_zip.NameToInfo:
+        return _Numbering(numbering_styles=numbering_styles)
+    root = ET.fromstring(docx_zip.read(path))
+    abstract_nums, nums = {}, {}
+    for element in root:
+        name = _short(element.tag)
+        if name == 'w:abstractNum':
+            levels = {}
+            level_without_index = None
+            for level_element in element:
+                if _short(level_element.tag) != 'w:lvl':
+                    continue
+                level_index = _attr(level_element, 'w:ilvl')
+                is_ordered = _child_attr(level_element, ('w:numFmt',)) != 'bullet'
+                style_id = _child_attr(level_element, ('w:pStyle',))
+                if level_index is None:
+                    level_without_index = (('0', is_ordered), style_id)
+                else:
+                    levels[level_index] = ((level_index, is_ordered), style_id)
+            if level_without_index is not None and '0' not in levels:
+                levels['0'] = level_without_index
+            abstract_nums[_attr(element, 'w:abstractNumId')] = (levels, _child_attr(element, ('w:numStyleLink',)))
+        elif name == 'w:num':
+            nums[_attr(element, 'w:numId')] = _child_attr(element, ('w:abstractNumId',))
+    return _Numbering(abstract_nums, nums, numbering_styles)
+
+
+def _read_relationships(docx_zip, path):
+    """返回 ({关系ID: 目标}, {关系类型名: [目标]})"""
+    by_id, by_type = {}, {}
+    if path in docx_zip.NameToInfo:
+        for element in ET.fromstring(docx_zip.read(path)):
+            target, relationship_type = element.get('Target'), element.get('Type', '')
+            by_id[element.get('Id')] = target
+            by_type.setdefault(relationship_type.rsplit('/', 1)[-1], []).append(target)
+    return by_id, by_type
+
+
+def _part_path(docx_zip, base, targets, fallback):
+    for target in targets:
+        path = posixpath.normpath(posixpath.join(base, target)).lstrip('/') if not target.startswith('/') \
+            else target.lstrip('/')
+        if path in docx_zip.NameToInfo:
+            return path
+    return fallback
+
+
+def _read_notes(docx_zip, path, note_type):
+    """脚注/尾注：{ID: 正文元素列表}（跳过分隔线）"""
+    notes = {}
+    if path not in docx_zip.NameToInfo:
+        return notes
+    for element in ET.fromstring(docx_zip.read(path)):
+        if _short(element.tag) == f'w:{note_type}' and _attr(element, 'w:type') not in ('separator',
+                                                                                          'continuationSeparator'):
+            notes[_attr(element, 'w:id')] = list(element)
+    return notes
+
+
+def iter_document_nodes(docx_file, style_map=STYLE_MAP):
+    """流式解析 .docx（路径或文件对象），按文档顺序逐个生成转换后的顶层 HTML 节点（已合并，不再变化）
+
+    节点可用 replay_events 按 HTMLParser 回调重放；脚注/尾注列表在最后生成。
+    """
+    with zipfile.ZipFile(docx_file) as docx_zip:
+        _, package_types = _read_relationships(docx_zip, '_rels/.rels')
+        document_path = _part_path(docx_zip, '', package_types.get('officeDocument', []), 'word/document.xml')
+        if document_path not in docx_zip.NameToInfo:
+            raise ValueError("找不到 word/document.xml，文件不是有效的 .docx")
+        base, name = posixpath.split(document_path)
+        relationships, document_types = _read_relationships(docx_zip, posixpath.join(base, '_rels', name + '.rels'))
+
+        def part(part_type):
+            return _part_path(docx_zip, base, document_types.get(part_type, []), f"word/{part_type}.xml")
+
+        styles = _read_styles(docx_zip, part('styles'))
+        numbering = _read_numbering(docx_zip, part('numbering'), styles['numbering'])
+        reader = _BodyReader(styles, numbering, relationships)
+        converter = _Converter(_style_rules(style_map))
+        collapsed = []
+
+        def add_top_level(nodes):
+            finished = []
+            for node in _strip_empty(nodes):
+                if collapsed and not _try_collapse(collapsed, node):
+                    # 上一个顶层元素不会再合并新内容，可以输出并释放
+                    finished.append(collapsed.pop())
+                if not collapsed:
+                    _collapsing_add(collapsed, node)
+            return finished
+
+        with docx_zip.open(document_path) as stream:
+            depth = 0
+            body = None
+            for event, element in ET.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 2 and _short(element.tag) == 'w:body':
+                        body = element
+                    continue
+                depth -= 1
+                if depth == 2 and body is not None:
+                    # 一个顶层元素（段落、表格、内容控件）解析完毕：转换后立即释放
+                    items, _ = reader.read_all((element,))
+                    yield from add_top_level(converter.convert_all(items))
+                    body.clear()
+                elif depth == 1 and element is body:
+                    body = None
+
+        if converter.note_references:
+            notes = {note_type: _read_notes(docx_zip, part(note_type + 's'), note_type)
+                     for note_type in ('footnote', 'endnote')}
+            note_reader = _BodyReader(styles, numbering, relationships)
+            yield from add_top_level([converter.notes(
+                lambda note_type, note_id: note_reader.read_all(notes[note_type].get(note_id, ()))[0])])
+        yield from collapsed
+
+
+def extract_docx_blocks(docx_file, style_map=STYLE_MAP, normalization=DEFAULT_NORMALIZATION):
+    """流式解析 .docx（路径或文件对象），按文档顺序返回非空 TextBlock 列表（同时计算归一化指纹）"""
+    writer = _BlockWriter()
+    for node in iter_document_nodes(docx_file, style_map):
+        writer.write(node)
+    return fingerprint_blocks(writer.blocks, normalization)
+
+
+@lru_cache(maxsize=None)
+def stream_supported():
+    """安装的 mammoth 是否为流式提取所对应的版本（版本不同时规则可能已变化，不能保证与 HTML 路径一致）
+
+    版本不同时发出一次 RuntimeWarning（load_blocks 随后改走 mammoth 转换路径）。
+    """
+    try:
+        installed = metadata.version('mammoth')
+    except metadata.PackageNotFoundError:
+        installed = None
+    if installed != MAMMOTH_VERSION:
+        warnings.warn(f"安装的 mammoth 为 {installed}，流式提取只支持 {MAMMOTH_VERSION}，改用 mammoth 转换提取文本块",
+                      RuntimeWarning, stacklevel=3)
+        return False
+    return True
+
+
+def load_blocks(docx_path, style_map=STYLE_MAP, cache=None, normalization=DEFAULT_NORMALIZATION):
+    """只取文本块（不生成 HTML）：转换缓存中已有该文件时直接使用缓存结果，否则流式解析（结果不写入缓存）
+
+    图片内嵌与外置两种转换结果的文本块相同，两种缓存键都会查找（界面写入的是图片外置的缓存）。
+    """
+    with tracer.span("load_blocks", file=os.path.basename(docx_path)) as load_span:
+        with open(docx_path, "rb") as docx_file:
+            docx_bytes = docx_file.read()
+        load_span.set(bytes=len(docx_bytes))
+        if cache is not None:
+            with tracer.span("cache_lookup") as cache_span:
+                cached = None
+                for external_images in (False, True):
+                    cached = cache.get(cache.make_key(docx_bytes, style_map, external_images=external_images))
+                    if cached is not None:
+                        break
+                cache_span.set(hit=cached is not None)
+            if cached is not None:
+                text_blocks = fingerprint_blocks(cached[1], normalization)
+                load_span.set(blocks=len(text_blocks), cached=True)
+                return text_blocks
+        if not stream_supported():
+            from engine.compare_engine import convert_docx_bytes, extract_text_blocks
+            with tracer.span("extract", fallback=True) as extract_span:
+                text_blocks = extract_text_blocks(convert_docx_bytes(docx_bytes, style_map), normalization)
+                extract_span.set(blocks=len(text_blocks))
+            load_span.set(blocks=len(text_blocks), cached=False)
+            return text_blocks
+        with tracer.span("stream_extract") as extract_span:
+            text_blocks = extract_docx_blocks(io.BytesIO(docx_bytes), style_map, normalization)
+            extract_span.set(blocks=len(text_blocks))
+        load_span.set(blocks=len(text_blocks), cached=False)
+        return text_blocks
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""历史文件目录：SQLite 记录每个导入文件的元数据，文件内容按 SHA-256 去重只保存一份
+
+目录结构：
+    history_files/history.sqlite3                 元数据（内容哈希、原文件名、大小、导入时间、条款数）
+    history_files/objects/<哈希前2位>/<哈希>.docx  文件内容
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import time
+
+DATABASE_NAME = 'history.sqlite3'
+OBJECTS_DIR = 'objects'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    content_hash TEXT PRIMARY KEY,
+    name         TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    imported_at  REAL NOT NULL,
+    clause_count INTEGER NOT NULL DEFAULT -1
+);
+CREATE INDEX IF NOT EXISTS history_imported_at ON history (imported_at, content_hash);
+CREATE INDEX IF NOT EXISTS history_name ON history (name, content_hash);
+CREATE INDEX IF NOT EXISTS history_size ON history (size, content_hash);
+CREATE INDEX IF NOT EXISTS history_clause_count ON history (clause_count, content_hash);
+"""
+
+_COLUMNS = ('content_hash', 'name', 'size', 'imported_at', 'clause_count')
+
+# 可排序的列（均有 (列, 内容哈希) 索引，支持按键分页）
+SORT_COLUMNS = ('imported_at', 'name', 'size', 'clause_count')
+
+# 条款数未知（尚未完成提取）时的存储值，读取时还原为 None
+_UNKNOWN_CLAUSE_COUNT = -1
+
+# 旧版备份文件名中的时间戳后缀（如 合同_20240101_120000.docx）
+_LEGACY_TIMESTAMP = re.compile(r'_\d{8}_\d{6}$')
+
+
+class HistoryIndex:
+    """历史文件目录（仅在创建它的线程中使用）"""
+
+    def __init__(self, history_dir):
+        self.history_dir = history_dir
+        self.objects_dir = os.path.join(history_dir, OBJECTS_DIR)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(history_dir, DATABASE_NAME))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+        with self.connection:
+            # 早期版本以 NULL 表示条款数未知
+            self.connection.execute("UPDATE history SET clause_count = ? WHERE clause_count IS NULL",
+                                    (_UNKNOWN_CLAUSE_COUNT,))
+            # 早期版本记录的转换缓存键未被使用（且与界面实际使用的键不一致）
+            columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(history)")}
+            if 'cache_key' in columns:
+                try:
+                    self.connection.execute("ALTER TABLE history DROP COLUMN cache_key")
+                except sqlite3.OperationalError:
+                    pass  # SQLite 3.35 之前不支持删除列，保留该列不影响读写
+
+    def close(self):
+        self.connection.close()
+
+    def object_path(self, content_hash):
+        return os.path.join(self.objects_dir, content_hash[:2], f"{content_hash}.docx")
+
+    def content_hash_for(self, path):
+        """path 位于对象目录中时返回其内容哈希，否则返回 None"""
+        if os.path.dirname(os.path.dirname(os.path.abspath(path))) != os.path.abspath(self.objects_dir):
+            return None
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def _store(self, content_hash, docx_bytes):
+        """写入文件内容（已存在时跳过；先写临时文件再替换）"""
+        path = self.object_path(content_hash)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(docx_bytes)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def import_file(self, source_path, name=None, imported_at=None):
+        """导入文件并返回 (对象路径, 内容哈希)；相同内容只保存一份，再次导入时以较新的一次为准更新文件名与导入时间"""
+        with open(source_path, "rb") as f:
+            docx_bytes = f.read()
+        content_hash = hashlib.sha256(docx_bytes).hexdigest()
+        path = self._store(content_hash, docx_bytes)
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO history (content_hash, name, size, imported_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (content_hash) DO UPDATE SET "
+                "name = CASE WHEN excluded.imported_at >= imported_at THEN excluded.name ELSE name END, "
+                "imported_at = MAX(imported_at, excluded.imported_at)",
+                (content_hash, name or os.path.basename(source_path), len(docx_bytes),
+                 time.time() if imported_at is None else imported_at))
+        return path, content_hash
+
+    def set_clause_count(self, content_hash, clause_count):
+        with self.connection:
+            self.connection.execute("UPDATE history SET clause_count = ? WHERE content_hash = ?",
+                                    (clause_count, content_hash))
+
+    def get(self, content_hash):
+        """按内容哈希取单条历史记录，不存在时返回 None"""
+        row = self.connection.execute(f"SELECT {', '.join(_COLUMNS)} FROM history WHERE content_hash = ?",
+                                      (content_hash,)).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def _entry(self, row):
+        entry = dict(row, path=self.object_path(row['content_hash']))
+        if entry['clause_count'] == _UNKNOWN_CLAUSE_COUNT:
+            entry['clause_count'] = None
+        return entry
+
+    @staticmethod
+    def _name_filter(name_filter):
+        """文件名包含关键字的过滤条件（LIKE 通配符按字面匹配）"""
+        if not name_filter:
+            return [], []
+        pattern = name_filter.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return ["name LIKE ? ESCAPE '\\'"], [f"%{pattern}%"]
+
+    def count(self, name_filter=''):
+        conditions, params = self._name_filter(name_filter)
+        where = f" WHERE {conditions[0]}" if conditions else ""
+        return self.connection.execute(f"SELECT COUNT(*) FROM history{where}", params).fetchone()[0]
+
+    def entries(self, limit=-1, order_by='imported_at', descending=True, name_filter='', after=None):
+        """返回历史记录（字典列表，含对象路径 path），默认按导入时间倒序
+
+        after 为上一页最后一条记录：按 (排序列, 内容哈希) 做键集分页，翻到任意深度都只走一次索引范围扫描。
+        """
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"不支持的排序列：{order_by}")
+        conditions, params = self._name_filter(name_filter)
+        direction = 'DESC' if descending else 'ASC'
+        if after is not None:
+            value = after[order_by]
+            if order_by == 'clause_count' and value is None:
+                value = _UNKNOWN_CLAUSE_COUNT
+            conditions.append(f"({order_by}, content_hash) {'<' if descending else '>'} (?, ?)")
+            params.extend((value, after['content_hash']))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM history{where} "
+            f"ORDER BY {order_by} {direction}, content_hash {direction} LIMIT ?",
+            params + [limit])
+        return [self._entry(row) for row in rows]
+
+    def migrate_legacy_files(self):
+        """把旧版直接放在历史目录下的带时间戳副本并入目录（导入时间取文件修改时间），返回迁移数量"""
+        migrated = 0
+        with os.scandir(self.history_dir) as it:
+            legacy = [entry.path for entry in it if entry.is_file() and entry.name.endswith('.docx')]
+        for path in legacy:
+            stem, ext = os.path.splitext(os.path.basename(path))
+            self.import_file(path, _LEGACY_TIMESTAMP.sub('', stem) + ext, os.path.getmtime(path))
+            os.remove(path)  # 内容已保存到对象目录
+            migrated += 1
+        return migrated
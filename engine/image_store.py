@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""图片外置与按哈希对比：转换时把 docx 中的图片按内容哈希写入磁盘目录，HTML 中只保留 URL
+
+mammoth 默认把每张图片以 base64 data URI 内嵌在 HTML 中，扫描的印章、签字页会使 HTML、转换缓存与
+展示区载入的文档各增大数 MB。外置后相同图片（各版本合同中的同一印章）只保存一份，由展示区的
+contract://image/<哈希>.<扩展名> 请求读取（见 ui/document_scheme.py）。
+
+图片对比只比较内容哈希序列：不做像素处理，印章、签名图片被替换、增加或删除时都能发现。
+
+目录结构：
+    <存储目录>/<哈希前2位>/<哈希>.<扩展名>
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from difflib import SequenceMatcher
+
+from engine.docx_stream import _attr, _part_path, _read_relationships, _short
+
+IMAGE_HOST = 'image'
+IMAGE_URL_PREFIX = f'contract://{IMAGE_HOST}/'
+
+# 图片文件名：SHA-256 + 扩展名（同时用于校验展示区请求的路径）
+IMAGE_NAME_PATTERN = re.compile(r'^([0-9a-f]{64})\.([0-9a-z]+)$')
+
+# mimetypes 无法识别的 Word 常见图片格式
+_EXTENSIONS = {'image/x-emf': 'emf', 'image/x-wmf': 'wmf', 'image/jpeg': 'jpeg'}
+_CONTENT_TYPES = {extension: content_type for content_type, extension in _EXTENSIONS.items()}
+
+# 正文中不显示的修订内容（其中的图片不参与对比，与转换结果一致）
+_HIDDEN_CONTAINERS = frozenset(('w:del', 'w:moveFrom'))
+
+
+def image_extension(content_type):
+    extension = _EXTENSIONS.get(content_type) or mimetypes.guess_extension(content_type or '')
+    return extension.lstrip('.') if extension else 'bin'
+
+
+def image_content_type(name):
+    """由图片文件名（扩展名）得到 MIME 类型"""
+    extension = name.rsplit('.', 1)[-1]
+    return _CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class ImageStore:
+    """按内容寻址的图片目录（写入先写临时文件再替换，多进程同时写同一图片也安全）"""
+
+    def __init__(self, store_dir, url_prefix=IMAGE_URL_PREFIX):
+        self.store_dir = store_dir
+        self.url_prefix = url_prefix
+        os.makedirs(store_dir, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.store_dir, name[:2], name)
+
+    def url(self, name):
+        return self.url_prefix + name
+
+    def put(self, data, content_type=None):
+        """保存图片并返回文件名（<哈希>.<扩展名>）；相同内容已存在时跳过写入"""
+        name = f"{hashlib.sha256(data).hexdigest()}.{image_extension(content_type)}"
+        path = self.path(name)
+        if os.path.exists(path):
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+    def read(self, name):
+        """按文件名读取图片内容；名称不合法或文件不存在时返回 None"""
+        if IMAGE_NAME_PATTERN.match(name) is None:
+            return None
+        try:
+            with open(self.path(name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def image_converter(self):
+        """mammoth 的 convert_image 回调：图片写入目录，<img> 只引用 URL；图片读取失败时输出无 src 的占位"""
+        import mammoth
+
+        def convert(image):
+            try:
+                with image.open() as image_bytes:
+                    name = self.put(image_bytes.read(), image.content_type)
+            except (OSError, KeyError):
+                return {"alt": "[无法显示的图片]"}
+            return {"src": self.url(name)}
+
+        return mammoth.images.img_element(convert)
+
+
+def docx_image_hashes(docx_file):
+    """按正文顺序返回图片内容的 SHA-256 列表（同一图片多次出现时重复；外部链接图片与删除修订中的图片除外）"""
+    with zipfile.ZipFile(docx_file) as docx_zip:
+        _, package_types = _read_relationships(docx_zip, '_rels/.rels')
+        document_path = _part_path(docx_zip, '', package_types.get('officeDocument', []), 'word/document.xml')
+        if document_path not in docx_zip.NameToInfo:
+            raise ValueError("找不到 word/document.xml，文件不是有效的 .docx")
+        base, name = posixpath.split(document_path)
+        relationships, _ = _read_relationships(docx_zip, posixpath.join(base, '_rels', name + '.rels'))
+
+        hashes = []
+        part_hashes = {}  # 图片部件路径 → 哈希（同一图片只读取一次）
+        hidden_depth = 0
+        with docx_zip.open(document_path) as stream:
+            for event, element in ET.iterparse(stream, events=('start', 'end')):
+                tag = _short(element.tag)
+                if tag in _HIDDEN_CONTAINERS:
+                    hidden_depth += 1 if event == 'start' else -1
+                    continue
+                if event == 'end':
+                    if tag in ('w:p', 'w:tbl'):
+                        element.clear()
+                    continue
+                if hidden_depth or tag not in ('a:blip', 'v:imagedata'):
+                    continue
+                relationship_id = _attr(element, 'r:embed' if tag == 'a:blip' else 'r:id')
+                target = relationships.get(relationship_id)
+                if target is None:
+                    continue
+                part = _part_path(docx_zip, base, [target], None)
+                if part is None:
+                    continue
+                if part not in part_hashes:
+                    part_hashes[part] = hashlib.sha256(docx_zip.read(part)).hexdigest()
+                hashes.append(part_hashes[part])
+    return hashes
+
+
+def diff_images(original_hashes, compare_hashes):
+    """对比两份文档的图片哈希序列，返回变化列表
+
+    每项为 {'kind': 'replace'|'delete'|'insert', 'original_positions': [...], 'compare_positions': [...],
+    'original': [哈希], 'compare': [哈希]}；位置为图片在各自文档中的序号（从 0 开始）。
+    """
+    changes = []
+    matcher = SequenceMatcher(None, original_hashes, compare_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        changes.append({
+            'kind': tag,
+            'original_positions': list(range(i1, i2)),
+            'compare_positions': list(range(j1, j2)),
+            'original': original_hashes[i1:i2],
+            'compare': compare_hashes[j1:j2],
+        })
+    return changes
+
+
+def compare_docx_images(original_file, compare_file):
+    """对比两个 docx 的正文图片（只读取 document.xml 与图片部件，不需要转换）"""
+    return diff_images(docx_image_hashes(original_file), docx_image_hashes(compare_file))
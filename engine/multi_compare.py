@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""一份原文件对比多份修订：原文件只转换、提取并计算指纹一次，通过进程池初始化参数分发给各工作进程，
+各修订并行对比后汇总为条款 × 修订的变化矩阵"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from engine.compare_engine import STYLE_MAP, compare_text_blocks, last_index_by_level, load_document
+from engine.conversion_cache import ConversionCache
+from engine.docx_stream import load_blocks
+from engine.diff_ir import OP_DELETE, OP_INSERT
+from engine.normalize import DEFAULT_NORMALIZATION
+
+# 矩阵单元格的状态（未变化为空字符串）
+STATUS_UNCHANGED = ''
+STATUS_MODIFIED = '修改'
+STATUS_LEVEL = '层级变化'
+STATUS_MODIFIED_LEVEL = '修改+层级变化'
+STATUS_DELETED = '删除'
+STATUS_INSERTED = '新增'
+
+
+def prepare_original(original_path, style_map=STYLE_MAP, cache=None, normalization=DEFAULT_NORMALIZATION,
+                     render=True):
+    """转换原文件并预先计算文本块、指纹与层级索引（对所有修订复用）；render=False 时不生成 HTML（'html' 为 None）"""
+    if render:
+        original_html, original_blocks = load_document(original_path, style_map, cache=cache,
+                                                       normalization=normalization)
+    else:
+        original_html, original_blocks = None, load_blocks(original_path, style_map, cache, normalization)
+    return {
+        'path': original_path,
+        'html': original_html,
+        'blocks': original_blocks,
+        'last_by_level': last_index_by_level(original_blocks),
+    }
+
+
+# 工作进程内的已准备原文件（由进程池初始化函数设置，每个进程只反序列化一次）
+_PREPARED = None
+
+
+def _init_worker(prepared):
+    global _PREPARED
+    _PREPARED = prepared
+
+
+def _clause_statuses(ops, clause_count):
+    """把差异操作折算为原文件每个条款的状态"""
+    statuses = [STATUS_UNCHANGED] * clause_count
+    for op in ops:
+        if op.kind == OP_DELETE:
+            statuses[op.orig_index] = STATUS_DELETED
+        elif op.kind != OP_INSERT:
+            if op.opcodes is None:
+                statuses[op.orig_index] = STATUS_LEVEL
+            else:
+                statuses[op.orig_index] = STATUS_MODIFIED_LEVEL if op.level_changed else STATUS_MODIFIED
+    return statuses
+
+
+def compare_revision(revision_path, prepared=None, style_map=STYLE_MAP, cache_dir=None, diff_backend=None,
+                     match_strategy='anchored', normalization=DEFAULT_NORMALIZATION, output_base=None,
+                     watchlist=None):
+    """对比一份修订，返回该修订一列的矩阵数据；prepared 缺省时使用进程池初始化时传入的原文件
+
+    output_base 为 None 时不输出标红 HTML，修订文件直接流式提取文本块（不经 HTML 转换）。
+    """
+    prepared = prepared or _PREPARED
+    record = {'revision': revision_path}
+    try:
+        cache = ConversionCache(cache_dir) if cache_dir else None
+        render = output_base is not None
+        if render:
+            compare_html, compare_blocks = load_document(revision_path, style_map, cache=cache,
+                                                         normalization=normalization)
+        else:
+            compare_html, compare_blocks = None, load_blocks(revision_path, style_map, cache, normalization)
+        result = compare_text_blocks(prepared['blocks'], compare_blocks, compare_html, diff_backend=diff_backend,
+                                     match_strategy=match_strategy, last_by_level=prepared['last_by_level'],
+                                     render=render, watchlist=watchlist)
+        record.update({
+            'status': 'ok',
+            'diff_count': result['diff_count'],
+            'watchlist': result['watchlist'],
+            'clause_statuses': _clause_statuses(result['ops'], len(prepared['blocks'])),
+            'insertions': [{'text': compare_blocks[op.comp_index].text,
+                            'fingerprint': compare_blocks[op.comp_index].fingerprint,
+                            'position': op.insert_position}
+                           for op in result['ops'] if op.kind == OP_INSERT],
+        })
+        if output_base is not None:
+            with open(output_base + ".html", "w", encoding="utf-8") as f:
+                f.write(result['html'])
+    except Exception as e:
+        record.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+    return record
+
+
+def compare_many(original_path, revision_paths, jobs=None, output_dir=None, cache_dir=None, diff_backend=None,
+                 match_strategy='anchored', normalization=DEFAULT_NORMALIZATION, style_map=STYLE_MAP,
+                 watchlist=None):
+    """原文件对比多份修订，返回条款 × 修订的变化矩阵
+
+    返回 {'original', 'revisions', 'records', 'clauses': [{'index', 'identifier', 'text', 'statuses'}],
+          'insertions': [{'text', 'position', 'statuses'}]}；
+    statuses 与 revisions 一一对应。相同文本的新增条款合并为一行。
+    """
+    cache = ConversionCache(cache_dir) if cache_dir else None
+    prepared = prepare_original(original_path, style_map, cache, normalization, render=output_dir is not None)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    output_bases = []
+    used_names = set()
+    for i, path in enumerate(revision_paths):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in used_names:
+            name = f"{name}_{i}"
+        used_names.add(name)
+        output_bases.append(os.path.join(output_dir, name) if output_dir is not None else None)
+
+    # 原文件只在每个工作进程初始化时传递一次，不随每个任务重复序列化
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(prepared,)) as pool:
+        futures = [pool.submit(compare_revision, path, None, style_map, cache_dir, diff_backend, match_strategy,
+                               normalization, output_base, watchlist)
+                   for path, output_base in zip(revision_paths, output_bases)]
+        records = [future.result() for future in futures]
+
+    clauses = [{'index': i, 'identifier': block.identifier, 'text': block.text, 'statuses': []}
+               for i, block in enumerate(prepared['blocks'])]
+    insertions = {}
+    for column, record in enumerate(records):
+        ok = record['status'] == 'ok'
+        for clause in clauses:
+            clause['statuses'].append(record['clause_statuses'][clause['index']] if ok else None)
+        if not ok:
+            continue
+        for insertion in record['insertions']:
+            row = insertions.setdefault(insertion['fingerprint'], {
+                'text': insertion['text'], 'position': insertion['position'],
+                'statuses': [STATUS_UNCHANGED] * len(records)})
+            row['statuses'][column] = STATUS_INSERTED
+    return {
+        'original': original_path,
+        'revisions': list(revision_paths),
+        'records': [{key: value for key, value in record.items() if key not in ('clause_statuses', 'insertions')}
+                    for record in records],
+        'clauses': clauses,
+        'insertions': list(insertions.values()),
+    }
+
+
+def write_matrix(matrix, output_dir):
+    """写出 matrix.csv（可直接用 Excel 打开）与 matrix.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    names = [os.path.basename(path) for path in matrix['revisions']]
+    with open(os.path.join(output_dir, "matrix.csv"), "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["序号", "条款", "条款内容"] + names)
+        for clause in matrix['clauses']:
+            writer.writerow([clause['index'] + 1, clause['identifier'] or "", clause['text']]
+                            + ["失败" if status is None else status for status in clause['statuses']])
+        for insertion in matrix['insertions']:
+            writer.writerow(["", f"新增{insertion['position']}", insertion['text']] + insertion['statuses'])
+    with open(os.path.join(output_dir, "matrix.json"), "w", encoding="utf-8") as f:
+        json.dump(matrix, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""条款文本归一化与 64 位指纹：提取时计算一次，对比时用整数比较跳过未修改的条款"""
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+# 全角/半角统一后仍存在的中文标点变体（NFKC 已处理全角逗号、括号、冒号等）
+_PUNCTUATION_TABLE = str.maketrans({
+    '。': '.', '、': ',', '“': '"', '”': '"', '‘': "'", '’': "'",
+    '【': '[', '】': ']', '〔': '(', '〕': ')', '《': '<', '》': '>',
+    '—': '-', '–': '-', '―': '-', '－': '-', '…': '...', '·': '.',
+})
+
+
+class NormalizationOptions:
+    """归一化选项：whitespace 合并空白，width 统一全角/半角，punctuation 统一中英文标点"""
+    __slots__ = ('whitespace', 'width', 'punctuation')
+
+    def __init__(self, whitespace=True, width=False, punctuation=False):
+        self.whitespace = whitespace
+        self.width = width
+        self.punctuation = punctuation
+
+    def __repr__(self):
+        return (f"NormalizationOptions(whitespace={self.whitespace}, width={self.width}, "
+                f"punctuation={self.punctuation})")
+
+
+# 默认只合并空白，与 highlight_differences 的预处理一致
+DEFAULT_NORMALIZATION = NormalizationOptions()
+
+
+def normalize_text(text, options=DEFAULT_NORMALIZATION):
+    """按选项归一化文本"""
+    if options.width:
+        text = unicodedata.normalize('NFKC', text)
+    if options.punctuation:
+        text = text.translate(_PUNCTUATION_TABLE)
+    if options.whitespace:
+        text = _WHITESPACE.sub(' ', text).strip()
+    return text
+
+
+def text_fingerprint(normalized_text):
+    """归一化文本的 64 位指纹（blake2b 截断，不受进程哈希随机化影响）"""
+    digest = hashlib.blake2b(normalized_text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def fingerprint_blocks(text_blocks, options=DEFAULT_NORMALIZATION):
+    """为文本块计算指纹（提取或读取缓存后调用一次）"""
+    for block in text_blocks:
+        block.fingerprint = text_fingerprint(normalize_text(block.text, options))
+    return text_blocks
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""并行字符级差异：把需要对比的条款对按文本长度切成连续的批次，分发到多个进程（自由线程构建下为线程）
+
+大量修订的长合同中，逐对计算字符级差异是单核瓶颈。这里只并行 text_opcodes 本身：
+批次按原顺序连续划分、按顺序取回结果，差异操作的顺序与锚点编号与串行对比完全一致。
+待对比文本总量较小时进程启动与序列化的开销大于收益，直接串行计算。
+
+工作进程使用 spawn 方式启动：调用方可能是带有多个线程的界面进程（Qt 后台线程中 fork 可能死锁）。
+spawn 启动的进程默认会重新导入调用方的主模块（如界面入口及其 PyQt 依赖），这里在启动工作进程期间
+把主模块替换为本模块，工作进程只导入 engine 包。
+"""
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+
+from engine.diff_ir import text_opcodes
+
+# 待对比文本总字符数低于该值时串行计算
+PARALLEL_MIN_CHARS = 200000
+
+# 每个批次的最小字符数（批次过小时序列化与调度开销占比过高）
+MIN_CHUNK_CHARS = 20000
+
+# 每个工作者平均分到的批次数：批次多一些可以平衡长短不一的条款
+CHUNKS_PER_WORKER = 4
+
+
+def free_threaded():
+    """当前解释器是否为关闭 GIL 的自由线程构建（此时线程即可并行，无需进程）"""
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def resolve_workers(workers):
+    """workers 为 'auto' 时取 CPU 核数；None/0/1 表示串行"""
+    if workers == 'auto':
+        return os.cpu_count() or 1
+    return workers or 1
+
+
+def _pair_cost(pair):
+    # 差异算法的耗时大致与两段文本总长成正比（编辑距离受上限约束）
+    return len(pair[0]) + len(pair[1])
+
+
+def make_chunks(text_pairs, workers):
+    """按文本长度把条款对划分为连续批次，返回 [[(原文, 修订文), ...], ...]"""
+    total = sum(_pair_cost(pair) for pair in text_pairs)
+    target = max(MIN_CHUNK_CHARS, total // (workers * CHUNKS_PER_WORKER) + 1)
+    chunks = []
+    chunk = []
+    cost = 0
+    for pair in text_pairs:
+        chunk.append(pair)
+        cost += _pair_cost(pair)
+        if cost >= target:
+            chunks.append(chunk)
+            chunk = []
+            cost = 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+_MAIN_LOCK = threading.Lock()
+
+
+@contextmanager
+def _engine_main():
+    """启动工作进程期间以本模块作为主模块（spawn 按主模块的名称在工作进程中导入）"""
+    with _MAIN_LOCK:
+        main_module = sys.modules['__main__']
+        sys.modules['__main__'] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = main_module
+
+
+def _diff_chunk(chunk, diff_backend):
+    """工作者中执行：逐对计算一个批次的字符级差异"""
+    return [text_opcodes(original_text, compare_text, diff_backend) for original_text, compare_text in chunk]
+
+
+def iter_text_opcodes(text_pairs, diff_backend, workers=None):
+    """按输入顺序逐个生成每对文本的 text_opcodes 结果
+
+    workers 大于 1 且文本总量足够大时并行计算（参见 resolve_workers），否则串行。
+    """
+    workers = resolve_workers(workers)
+    total = sum(_pair_cost(pair) for pair in text_pairs)
+    chunks = make_chunks(text_pairs, workers) if workers > 1 and total >= PARALLEL_MIN_CHARS else []
+    if len(chunks) < 2:
+        for original_text, compare_text in text_pairs:
+            yield text_opcodes(original_text, compare_text, diff_backend)
+        return
+
+    max_workers = min(workers, len(chunks))
+    if free_threaded():
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        # map 立即提交全部批次（工作进程在提交时启动），按提交顺序返回批次结果
+        with _engine_main():
+            batches = pool.map(_diff_chunk, chunks, repeat(diff_backend))
+        for results in batches:
+            yield from results
+    finally:
+        # 调用方提前停止迭代（如取消对比）时丢弃尚未开始的批次，不等待其完成
+        pool.shutdown(wait=False, cancel_futures=True)
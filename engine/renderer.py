@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""对比结果渲染：按提取阶段记录的源码偏移，一次顺序拼接生成标红文档，不再重新解析 HTML 片段；
+并在顶层元素边界处把文档切块，供展示区按需加载"""
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from engine.diff_ir import OP_DELETE, OP_INSERT, anchor_id, preprocess_text
+
+# 缺失条款汇总区标题
+MISSING_SECTION_TITLE = '<p><strong>原文件缺失条款：</strong></p>'
+
+# 空差异标签（连续删除/新增时可能产生）
+_EMPTY_SPAN = re.compile(r'<span class="[^"]+"></span>')
+
+
+def render_text_diff(original_text, compare_text, opcodes):
+    """把字符级差异渲染为转义后的标红 HTML 片段（opcodes 基于预处理后的文本）"""
+    orig_processed = preprocess_text(original_text)
+    comp_processed = preprocess_text(compare_text)
+    result = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        orig_segment = escape(orig_processed[i1:i2], quote=False)
+        comp_segment = escape(comp_processed[j1:j2], quote=False)
+
+        if tag == 'equal':
+            # 保留原始文本的空格格式（仅替换差异部分，非差异部分保持原样）
+            # 这里简化处理：直接使用对比文本的原始片段（适合大部分场景）
+            result.append(escape(compare_text[j1:j2], quote=False) if j1 < j2 else '')
+        elif tag == 'insert':
+            # 新增内容标红，添加"新增"提示（合同审核中需明确标识新增项）
+            result.append(f'<span class="diff-highlight">[新增]{comp_segment}</span>')
+        elif tag == 'delete':
+            # 删除内容标红+删除线，添加"删除"提示
+            result.append(f'<span class="diff-delete">[删除]{orig_segment}</span>')
+        elif tag == 'replace':
+            # 替换内容同时显示删除和新增部分，用"替换为"连接
+            result.append(
+                f'<span class="diff-delete">[删除]{orig_segment}</span>'
+                f'<span class="diff-highlight">[替换为]{comp_segment}</span>'
+            )
+    return _EMPTY_SPAN.sub('', ''.join(result))
+
+
+def render_op(op, original_blocks, compare_blocks):
+    """渲染单条新增/修改操作替换到对比文档中的 HTML 片段（不含锚点）"""
+    comp_text = compare_blocks[op.comp_index].text
+    if op.kind == OP_INSERT:
+        return (f'<span class="diff-highlight">[新增条款{escape(op.insert_position, quote=False)}] '
+                f'{escape(comp_text, quote=False)}</span>')
+    if op.opcodes is None:
+        fragment = escape(comp_text, quote=False)
+    else:
+        fragment = render_text_diff(original_blocks[op.orig_index].text, comp_text, op.opcodes)
+    if op.level_changed:
+        # 标记条款层级变化（如一级条款变成二级条款）
+        fragment = f'<span class="level-change">[层级变化] {fragment}</span>'
+    return fragment
+
+
+def render_diff_document(compare_html, ops, original_blocks, compare_blocks):
+    """按差异操作列表生成标红后的对比文档 body（每处差异带 diff-<编号> 锚点）"""
+    replacements = []
+    missing = []
+    for op in ops:
+        if op.kind == OP_DELETE:
+            missing.append((anchor_id(op.anchor), original_blocks[op.orig_index].text))
+            continue
+        block = compare_blocks[op.comp_index]
+        fragment = render_op(op, original_blocks, compare_blocks)
+        replacements.append((block.start, block.end, fragment,
+                             f'<span id="{anchor_id(op.anchor)}" class="diff-anchor"></span>'))
+    return render_highlighted_body(compare_html, replacements, missing)
+
+
+def render_highlighted_body(source_html, replacements, missing=()):
+    """单次遍历源 HTML，用标红片段替换指定元素的内部内容，并在末尾追加缺失条款汇总
+
+    replacements 为 (内部起始偏移, 内部结束偏移, 替换 HTML, 锚点 HTML) 列表；
+    嵌套元素同时被替换时内容以外层为准（与整体替换外层内容的语义一致），内层的锚点并入外层锚点之后，
+    导航到内层差异时定位到外层元素，不会丢失锚点。
+    missing 为 (元素 id, 缺失条款文本) 列表。
+    """
+    pieces = []
+    cursor = 0
+    anchor_slot = None  # 上一个外层替换中锚点所在的位置
+    for start, end, fragment, anchor in sorted(replacements, key=lambda item: item[0]):
+        if start < 0:
+            continue  # 缺少源码偏移
+        if start < cursor:
+            pieces[anchor_slot] += anchor  # 已被外层替换覆盖，只保留锚点
+            continue
+        pieces.append(source_html[cursor:start])
+        anchor_slot = len(pieces)
+        pieces.append(anchor)
+        pieces.append(fragment)
+        cursor = end
+    pieces.append(source_html[cursor:])
+
+    if missing:
+        pieces.append('<div class="missing-clauses">')
+        pieces.append(MISSING_SECTION_TITLE)
+        for element_id, text in missing:
+            pieces.append(f'<p id="{element_id}"><span class="diff-delete">[缺失] {escape(text, quote=False)}</span></p>')
+        pieces.append('</div>')
+    return ''.join(pieces)
+
+# 分块目标大小（字符数）：相邻顶层元素合并到约该大小，单个超大元素独立成块
+CHUNK_CHARS = 32 * 1024
+
+# 无结束标签的 HTML 空元素
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                        'link', 'meta', 'source', 'track', 'wbr'))
+
+
+class _TopLevelScanner(HTMLParser):
+    """顺序扫描 HTML 片段，记录每个顶层元素结束处的源码偏移"""
+
+    def __init__(self, html_content):
+        super().__init__(convert_charrefs=True)
+        self.html_content = html_content
+        self.line_offsets = [0]
+        for match in re.finditer('\n', html_content):
+            self.line_offsets.append(match.end())
+        self.depth = 0
+        self.boundaries = []
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self.line_offsets[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in _VOID_TAGS:
+            self.depth += 1
+        elif self.depth == 0:
+            self.boundaries.append(self._offset() + len(self.get_starttag_text()))
+
+    def handle_startendtag(self, tag, attrs):
+        if self.depth == 0:
+            self.boundaries.append(self._offset() + len(self.get_starttag_text()))
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS or self.depth == 0:
+            return
+        self.depth -= 1
+        if self.depth == 0:
+            # getpos() 指向结束标签的 '<'，边界取到其后的 '>'
+            self.boundaries.append(self.html_content.index('>', self._offset()) + 1)
+
+
+def split_document(full_html):
+    """把完整 HTML 文档拆为 (<body> 之前的头部, body 内容)；无 body 标签时整体视为 body"""
+    body_open = full_html.find('<body')
+    body_close = full_html.rfind('</body>')
+    if body_open < 0 or body_close < body_open:
+        return '', full_html
+    body_start = full_html.index('>', body_open) + 1
+    return full_html[:body_open], full_html[body_start:body_close]
+
+
+def chunk_body_html(body_html, chunk_chars=CHUNK_CHARS):
+    """在顶层元素边界处把 body 内容切成约 chunk_chars 大小的片段（不会切断任何元素）"""
+    scanner = _TopLevelScanner(body_html)
+    scanner.feed(body_html)
+    scanner.close()
+
+    chunks = []
+    start = 0
+    for boundary in scanner.boundaries:
+        if boundary - start >= chunk_chars:
+            chunks.append(body_html[start:boundary])
+            start = boundary
+    tail = body_html[start:]
+    if tail.strip() or not chunks:
+        chunks.append(tail)
+    return chunks
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""向量化相似度匹配：把未匹配文本块转为字符 n-gram 稀疏向量，分块矩阵乘法算出余弦相似度，再做全局最优分配
+
+依赖 numpy 与 scipy（稀疏矩阵与匈牙利算法 linear_sum_assignment）。n-gram 向量以 CSR 稀疏矩阵保存，
+内存与文本总长成正比；相似度按行分块计算，只保留不低于阈值的候选，分配只在有候选的行列上求解。
+numpy/scipy 的导入耗时约半秒，默认匹配策略用不到，因此在第一次使用 'vector' 策略时才导入。
+"""
+import zlib
+from collections import defaultdict
+
+np = None
+sparse = None
+linear_sum_assignment = None
+_numeric_loaded = False
+
+
+def _load_numeric():
+    """导入 numpy 与 scipy，返回是否可用"""
+    global np, sparse, linear_sum_assignment, _numeric_loaded
+    if not _numeric_loaded:
+        try:
+            import numpy as np
+            from scipy import sparse
+            from scipy.optimize import linear_sum_assignment
+        except ImportError:  # numpy/scipy 为可选依赖，仅 'vector' 匹配策略需要
+            np = None
+        _numeric_loaded = True
+    return np is not None
+
+# 余弦相似度阈值：低于该值的候选不参与配对
+VECTOR_SIMILARITY_THRESHOLD = 0.7
+
+# 特征哈希维度（把 n-gram 映射到固定维度，避免构建全局词表；稀疏存储，不随维度占用内存）
+HASH_DIMENSIONS = 4096
+
+# 分块计算相似度时每块的元素上限，以及匈牙利算法求解的矩阵元素上限（超过时退化为全局贪心分配）
+MAX_ASSIGNMENT_CELLS = 4_000_000
+
+
+def _ngram_vectors(texts, n=2, dimensions=HASH_DIMENSIONS):
+    """把文本转为 L2 归一化的字符 n-gram 计数向量（float32 CSR 稀疏矩阵，每行一个文本）"""
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        # 过短文本退化为单字
+        grams = [text[i:i + n] for i in range(len(text) - n + 1)] if len(text) >= n else [text]
+        rows.extend([row] * len(grams))
+        # 使用 crc32 而非内置 hash：后者对字符串加盐，不同进程得到的向量与配对结果不一致
+        cols.extend(zlib.crc32(gram.encode('utf-8')) % dimensions for gram in grams)
+    # 重复的 (行, 列) 在转换为 CSR 时累加为计数
+    matrix = sparse.coo_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                               shape=(len(texts), dimensions)).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float32).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(matrix).tocsr()
+
+
+def _candidates(orig_vectors, comp_vectors, threshold):
+    """按行分块计算余弦相似度，返回不低于阈值的候选 (行数组, 列数组, 相似度数组)"""
+    comp_t = comp_vectors.T.tocsc()
+    chunk = max(1, MAX_ASSIGNMENT_CELLS // max(1, comp_vectors.shape[0]))
+    rows, cols, scores = [], [], []
+    for start in range(0, orig_vectors.shape[0], chunk):
+        block = (orig_vectors[start:start + chunk] @ comp_t).tocoo()
+        keep = block.data >= threshold
+        rows.append(block.row[keep] + start)
+        cols.append(block.col[keep])
+        scores.append(block.data[keep])
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+
+
+def _greedy_assignment(rows, cols, scores):
+    """按相似度从高到低做全局贪心分配（候选行列过多时使用）"""
+    order = np.argsort(-scores, kind='stable')
+    used_rows, used_cols = set(), set()
+    pairs = []
+    for k in order:
+        r, c = int(rows[k]), int(cols[k])
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+def _assign(orig_vectors, comp_vectors, threshold):
+    """计算余弦相似度候选并求解分配，返回 (行, 列) 列表"""
+    rows, cols, scores = _candidates(orig_vectors, comp_vectors, threshold)
+    if not len(scores):
+        return []
+    # 只在有候选的行列上求最大权匹配（没有候选的行列不会被配对）
+    row_ids, row_pos = np.unique(rows, return_inverse=True)
+    col_ids, col_pos = np.unique(cols, return_inverse=True)
+    if len(row_ids) * len(col_ids) > MAX_ASSIGNMENT_CELLS:
+        return _greedy_assignment(rows, cols, scores)
+    weights = np.zeros((len(row_ids), len(col_ids)), dtype=np.float32)
+    weights[row_pos, col_pos] = scores
+    assigned_rows, assigned_cols = linear_sum_assignment(weights, maximize=True)
+    return [(int(row_ids[r]), int(col_ids[c])) for r, c in zip(assigned_rows, assigned_cols) if weights[r, c] > 0]
+
+
+def vector_assignment(original_blocks, compare_blocks, orig_indices, comp_indices,
+                      threshold=VECTOR_SIMILARITY_THRESHOLD):
+    """在每个层级桶内对未匹配块做全局最优配对，返回按原文件索引排序的 (原文件索引, 对比文件索引) 列表"""
+    if not _load_numeric():
+        raise ImportError("'vector' 匹配策略需要安装 numpy 与 scipy")
+
+    orig_by_level = defaultdict(list)
+    comp_by_level = defaultdict(list)
+    for i in orig_indices:
+        orig_by_level[original_blocks[i].level].append(i)
+    for j in comp_indices:
+        comp_by_level[compare_blocks[j].level].append(j)
+
+    pairs = []
+    for level, orig_bucket in orig_by_level.items():
+        comp_bucket = comp_by_level.get(level)
+        if not comp_bucket:
+            continue
+        orig_vectors = _ngram_vectors([original_blocks[i].text for i in orig_bucket])
+        comp_vectors = _ngram_vectors([compare_blocks[j].text for j in comp_bucket])
+        for r, c in _assign(orig_vectors, comp_vectors, threshold):
+            pairs.append((orig_bucket[r], comp_bucket[c]))
+    pairs.sort()
+    return pairs
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""表格结构化对比：按行指纹对齐行、按表头（或整列内容）指纹对齐列，只对内容变化的行做单元格对比
+
+条款对比把每个单元格作为独立文本块，插入一行会使其后所有单元格错位，付款计划、价格表等大表格
+会产生大量单元格两两模糊匹配。这里把表格还原为 行 × 单元格 结构：
+    1. 表格按文档顺序、以全部行指纹为签名配对（内容相同的表格直接跳过）；
+    2. 列按首行单元格指纹对齐，首行没有相同单元格时按整列内容指纹对齐，仍无法对齐时按位置对应；
+    3. 行按（投影到已对齐列上的）行指纹做序列对齐，相同的行不再比较；
+    4. 只在被替换的行区间内按单元格相似度配对行，并对配对行中内容不同的单元格计算字符级差异。
+整体开销与表格行数近似线性，与单元格两两比较的次数无关。
+
+表格由文本块的单元格位置还原（见 tables_from_blocks），单元格文本块不参与条款匹配：
+同一次对齐同时给出表格的行/列级报告与单元格文本块的差异（见 diff_table_blocks）。
+"""
+from difflib import SequenceMatcher
+
+from engine.diff_backends import get_diff_backend
+from engine.diff_ir import text_opcodes
+from engine.normalize import text_fingerprint
+
+# 被替换的行区间内按相似度配对行的上限（行数乘积），超过时按位置配对
+ROW_PAIRING_LIMIT = 10000
+
+# 两行被视为同一行（修改）所需的相同单元格比例
+ROW_SIMILARITY_THRESHOLD = 0.5
+
+# 两个表格被视为同一表格（修改）所需的相同行比例
+TABLE_SIMILARITY_THRESHOLD = 0.3
+
+_CELL_TAGS = frozenset(('td', 'th'))
+
+# 空单元格的指纹
+_EMPTY_FINGERPRINT = text_fingerprint('')
+
+
+class Table:
+    """表格记录：rows 为单元格文本列表的列表，cell_fingerprints、cell_blocks 与之一一对应
+    （嵌套表格的文本计入外层单元格，与文本块一致）"""
+    __slots__ = ('rows', 'header_rows', 'cell_fingerprints', 'row_fingerprints', 'cell_blocks')
+
+    def __init__(self):
+        self.rows = []
+        self.header_rows = 0  # 开头由 <th> 组成的表头行数
+        self.cell_fingerprints = []
+        self.row_fingerprints = None  # 各行单元格指纹的组合
+        self.cell_blocks = []  # 各单元格的文本块索引（空单元格为 None）
+
+    @property
+    def column_count(self):
+        return max((len(row) for row in self.rows), default=0)
+
+    def __repr__(self):
+        return f"Table(rows={len(self.rows)}, columns={self.column_count}, header_rows={self.header_rows})"
+
+
+def tables_from_blocks(text_blocks):
+    """由文本块的单元格位置还原最外层表格（已计算指纹的文本块，见 TextBlock.cell）
+
+    空单元格没有文本块，还原为空文本；末尾的空单元格、空行与空表格不会出现在结果中。
+    """
+    tables = []
+    for index, block in enumerate(text_blocks):
+        # 单元格本身的文本块先于其内部的文本块
+        if block.cell is None or block.tag not in _CELL_TAGS:
+            continue
+        table_index, row, column = block.cell
+        while len(tables) <= table_index:
+            tables.append(Table())
+        table = tables[table_index]
+        while len(table.rows) <= row:
+            table.rows.append([])
+            table.cell_fingerprints.append([])
+            table.cell_blocks.append([])
+        cells, fingerprints, blocks = table.rows[row], table.cell_fingerprints[row], table.cell_blocks[row]
+        if len(cells) > column:
+            continue  # 嵌套表格中的单元格（与外层单元格位置相同）
+        padding = column - len(cells)
+        cells.extend([''] * padding + [block.text])
+        fingerprints.extend([_EMPTY_FINGERPRINT] * padding + [block.fingerprint])
+        blocks.extend([None] * padding + [index])
+    for table in tables:
+        table.row_fingerprints = [hash(tuple(row)) for row in table.cell_fingerprints]
+        # 开头全部由 <th> 组成的行为表头
+        for row in table.cell_blocks:
+            if not any(index is not None for index in row) \
+                    or any(index is not None and text_blocks[index].tag != 'th' for index in row):
+                break
+            table.header_rows += 1
+    return tables
+
+
+# ---------- 对齐 ----------
+def _pair_positionally(i1, i2, j1, j2):
+    return [(i1 + k, j1 + k) for k in range(min(i2 - i1, j2 - j1))]
+
+
+def align_columns(original, compare):
+    """返回 (列配对 [(原列, 新列)], 删除的原列, 新增的列)"""
+    original_count, compare_count = original.column_count, compare.column_count
+    pairs = []
+    if original.rows and compare.rows:
+        keys = [(original.cell_fingerprints[0], compare.cell_fingerprints[0])]
+        # 首行没有相同单元格时（表头整体改写或没有表头），按整列内容对齐
+        keys.append(([hash(column) for column in _columns(original)],
+                     [hash(column) for column in _columns(compare)]))
+        for original_keys, compare_keys in keys:
+            matcher = SequenceMatcher(None, original_keys, compare_keys, autojunk=False)
+            opcodes = matcher.get_opcodes()
+            if any(tag == 'equal' for tag, *_ in opcodes):
+                for tag, i1, i2, j1, j2 in opcodes:
+                    if tag == 'equal' or tag == 'replace':
+                        # 替换区间内的列按位置对应（表头改名）
+                        pairs.extend(_pair_positionally(i1, i2, j1, j2))
+                break
+        else:
+            pairs = _pair_positionally(0, original_count, 0, compare_count)
+    paired_original = {i for i, _ in pairs}
+    paired_compare = {j for _, j in pairs}
+    return (pairs, [i for i in range(original_count) if i not in paired_original],
+            [j for j in range(compare_count) if j not in paired_compare])
+
+
+def _columns(table):
+    width = table.column_count
+    return [tuple(row[k] if k < len(row) else None for row in table.cell_fingerprints) for k in range(width)]
+
+
+def _projected_keys(table, columns):
+    """行在已对齐列上的指纹（新增/删除列不影响行对齐）"""
+    keys = []
+    for row in table.cell_fingerprints:
+        keys.append(hash(tuple(row[k] if k < len(row) else None for k in columns)))
+    return keys
+
+
+def _row_similarity(original_row, compare_row, column_pairs):
+    if not column_pairs:
+        return 0.0
+    same = 0
+    for i, j in column_pairs:
+        if i < len(original_row) and j < len(compare_row) and original_row[i] == compare_row[j]:
+            same += 1
+    return same / len(column_pairs)
+
+
+def _pair_rows(original, compare, i1, i2, j1, j2, column_pairs):
+    """被替换行区间内的行配对：按单元格相似度保持顺序贪心配对，区间过大时按位置配对"""
+    if (i2 - i1) * (j2 - j1) > ROW_PAIRING_LIMIT:
+        return _pair_positionally(i1, i2, j1, j2)
+    pairs = []
+    next_j = j1
+    for i in range(i1, i2):
+        for j in range(next_j, j2):
+            if _row_similarity(original.cell_fingerprints[i], compare.cell_fingerprints[j],
+                               column_pairs) >= ROW_SIMILARITY_THRESHOLD:
+                pairs.append((i, j))
+                next_j = j + 1
+                break
+    return pairs
+
+
+def align_rows(original, compare, column_pairs):
+    """按投影行指纹对齐两个表格的行，按顺序返回 [(类型, 原行, 新行)]
+
+    类型为 'equal'（已对齐列内容相同）、'pair'（被替换区间内配对的行）、'delete' 或 'insert'。
+    """
+    original_keys = _projected_keys(original, [i for i, _ in column_pairs])
+    compare_keys = _projected_keys(compare, [j for _, j in column_pairs])
+    rows = []
+    matcher = SequenceMatcher(None, original_keys, compare_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            rows.extend(('equal', i1 + k, j1 + k) for k in range(i2 - i1))
+            continue
+        pairs = _pair_rows(original, compare, i1, i2, j1, j2, column_pairs) if tag == 'replace' else []
+        # 配对行两侧均保持顺序：相邻两对之间的行即为删除/新增行（删除在前）
+        next_i, next_j = i1, j1
+        for i, j in pairs + [(i2, j2)]:
+            rows.extend(('delete', k, None) for k in range(next_i, i))
+            rows.extend(('insert', None, k) for k in range(next_j, j))
+            if i < i2:
+                rows.append(('pair', i, j))
+            next_i, next_j = i + 1, j + 1
+    return rows
+
+
+# ---------- 对比 ----------
+def _new_changes():
+    """单元格文本块的差异：内容不同的配对单元格及其字符级差异、新增与删除的单元格"""
+    return {'pairs': [], 'opcodes': {}, 'inserted': [], 'deleted': []}
+
+
+def _row_blocks(table, row, columns=None):
+    blocks = table.cell_blocks[row]
+    if columns is None:
+        return [index for index in blocks if index is not None]
+    return [blocks[k] for k in columns if k < len(blocks) and blocks[k] is not None]
+
+
+def diff_table(original, compare, diff_backend=None, changes=None):
+    """对比两个表格，返回行/列级报告（无变化时 'rows' 为空且无列增删）
+
+    返回 {'columns': {'deleted': [原列], 'inserted': [新列]}, 'unchanged_rows': 数量,
+          'rows': [{'kind': 'modify'|'delete'|'insert', 'original_row', 'compare_row', 'cells'}]}；
+    modify 的 cells 为 [{'original_column', 'compare_column', 'original', 'compare', 'opcodes'}]，
+    只列出内容不同的单元格；delete/insert 的 cells 为整行单元格文本。
+    传入 changes（见 _new_changes）时同时收集单元格文本块的差异。
+    """
+    diff_backend = diff_backend or get_diff_backend()
+    if changes is None:
+        changes = _new_changes()
+    column_pairs, deleted_columns, inserted_columns = align_columns(original, compare)
+    rows = []
+    unchanged = 0
+    for kind, i, j in align_rows(original, compare, column_pairs):
+        if kind == 'delete':
+            rows.append(_row_entry('delete', i, None, original.rows[i]))
+            changes['deleted'].extend(_row_blocks(original, i))
+            continue
+        if kind == 'insert':
+            rows.append(_row_entry('insert', None, j, compare.rows[j]))
+            changes['inserted'].extend(_row_blocks(compare, j))
+            continue
+        # 新增/删除列中的单元格（行对齐只看已对齐的列）
+        changes['deleted'].extend(_row_blocks(original, i, deleted_columns))
+        changes['inserted'].extend(_row_blocks(compare, j, inserted_columns))
+        cells = [] if kind == 'equal' else _cell_changes(original, compare, i, j, column_pairs, diff_backend,
+                                                         changes)
+        if cells:
+            rows.append(_row_entry('modify', i, j, cells))
+        else:
+            unchanged += 1
+    return {
+        'columns': {'deleted': deleted_columns, 'inserted': inserted_columns},
+        'unchanged_rows': unchanged,
+        'rows': rows,
+    }
+
+
+def _row_entry(kind, original_row, compare_row, cells):
+    return {'kind': kind, 'original_row': original_row, 'compare_row': compare_row, 'cells': cells}
+
+
+def _cell_changes(original, compare, i, j, column_pairs, diff_backend, changes):
+    original_row, compare_row = original.rows[i], compare.rows[j]
+    original_fingerprints, compare_fingerprints = original.cell_fingerprints[i], compare.cell_fingerprints[j]
+    original_blocks, compare_blocks = original.cell_blocks[i], compare.cell_blocks[j]
+    cells = []
+    for oc, cc in column_pairs:
+        original_text = original_row[oc] if oc < len(original_row) else ''
+        compare_text = compare_row[cc] if cc < len(compare_row) else ''
+        if oc < len(original_row) and cc < len(compare_row) \
+                and original_fingerprints[oc] == compare_fingerprints[cc]:
+            continue
+        opcodes = text_opcodes(original_text, compare_text, diff_backend)
+        orig_idx = original_blocks[oc] if oc < len(original_blocks) else None
+        comp_idx = compare_blocks[cc] if cc < len(compare_blocks) else None
+        if orig_idx is not None and comp_idx is not None:
+            changes['pairs'].append((orig_idx, comp_idx))
+            changes['opcodes'][orig_idx, comp_idx] = opcodes
+        elif orig_idx is not None:
+            changes['deleted'].append(orig_idx)  # 对应单元格变为空
+        elif comp_idx is not None:
+            changes['inserted'].append(comp_idx)
+        if opcodes is None:
+            continue
+        cells.append({'original_column': oc, 'compare_column': cc, 'original': original_text,
+                      'compare': compare_text, 'opcodes': [list(opcode) for opcode in opcodes]})
+    return cells
+
+
+def align_tables(original_tables, compare_tables):
+    """按文档顺序配对表格：整表签名相同的直接配对，其余在替换区间内按单元格重合度（或位置）配对"""
+    original_keys = [hash(tuple(table.row_fingerprints)) for table in original_tables]
+    compare_keys = [hash(tuple(table.row_fingerprints)) for table in compare_tables]
+    pairs = []
+    matcher = SequenceMatcher(None, original_keys, compare_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            pairs.extend(_pair_positionally(i1, i2, j1, j2))
+        elif tag == 'replace':
+            # 用单元格集合衡量相似度：增删列会改变每一行的指纹，但大部分单元格不变
+            compare_cells = {j: _cell_set(compare_tables[j]) for j in range(j1, j2)}
+            next_j = j1
+            for i in range(i1, i2):
+                original_cells = _cell_set(original_tables[i])
+                for j in range(next_j, j2):
+                    if _jaccard(original_cells, compare_cells[j]) >= TABLE_SIMILARITY_THRESHOLD \
+                            or (i2 - i1 == j2 - j1 and i - i1 == j - j1):
+                        pairs.append((i, j))
+                        next_j = j + 1
+                        break
+    return pairs
+
+
+def _cell_set(table):
+    return {fingerprint for row in table.cell_fingerprints for fingerprint in row}
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def compare_tables(original_tables, compare_tables, diff_backend=None, changes=None):
+    """对比两份文档的表格，返回报告
+
+    {'tables': [{'original_table', 'compare_table', 'original_rows', 'compare_rows', ...diff_table 结果}]（只含有变化的表格）,
+     'deleted_tables': [原表格序号], 'inserted_tables': [新表格序号],
+     'modified_rows', 'inserted_rows', 'deleted_rows', 'modified_cells'}
+    传入 changes（见 _new_changes）时同时收集单元格文本块的差异。
+    """
+    if changes is None:
+        changes = _new_changes()
+    pairs = align_tables(original_tables, compare_tables)
+    tables = []
+    for i, j in pairs:
+        original, compare = original_tables[i], compare_tables[j]
+        if original.row_fingerprints == compare.row_fingerprints:
+            continue
+        report = diff_table(original, compare, diff_backend, changes)
+        if not report['rows'] and not report['columns']['deleted'] and not report['columns']['inserted']:
+            continue
+        tables.append(dict(original_table=i, compare_table=j, original_rows=len(original.rows),
+                           compare_rows=len(compare.rows), **report))
+    paired_original = {i for i, _ in pairs}
+    paired_compare = {j for _, j in pairs}
+    deleted_tables = [i for i in range(len(original_tables)) if i not in paired_original]
+    inserted_tables = [j for j in range(len(compare_tables)) if j not in paired_compare]
+    for i in deleted_tables:
+        changes['deleted'].extend(index for row in original_tables[i].cell_blocks for index in row
+                                  if index is not None)
+    for j in inserted_tables:
+        changes['inserted'].extend(index for row in compare_tables[j].cell_blocks for index in row
+                                   if index is not None)
+    all_rows = [row for table in tables for row in table['rows']]
+    return {
+        'tables': tables,
+        'deleted_tables': deleted_tables,
+        'inserted_tables': inserted_tables,
+        'modified_rows': sum(1 for row in all_rows if row['kind'] == 'modify'),
+        'inserted_rows': sum(1 for row in all_rows if row['kind'] == 'insert'),
+        'deleted_rows': sum(1 for row in all_rows if row['kind'] == 'delete'),
+        'modified_cells': sum(len(row['cells']) for row in all_rows if row['kind'] == 'modify'),
+    }
+
+
+def has_table_changes(report):
+    return bool(report['tables'] or report['deleted_tables'] or report['inserted_tables'])
+
+
+def diff_table_blocks(original_blocks, compare_blocks, diff_backend=None):
+    """对比两份文档中表格单元格文本块（一次行/列对齐同时得到报告与单元格差异）
+
+    返回 {'table_changes': compare_tables 报告, 'pairs': [(原单元格块, 新单元格块)]（内容不同的配对单元格）,
+          'opcodes': {(原单元格块, 新单元格块): 字符级差异}, 'inserted': [新增单元格块], 'deleted': [删除单元格块]}；
+    索引均按文档顺序排列。
+    """
+    changes = _new_changes()
+    report = compare_tables(tables_from_blocks(original_blocks), tables_from_blocks(compare_blocks), diff_backend,
+                            changes)
+    return {
+        'table_changes': report,
+        'pairs': sorted(changes['pairs'], key=lambda pair: pair[1]),
+        'opcodes': changes['opcodes'],
+        'inserted': sorted(changes['inserted']),
+        'deleted': sorted(changes['deleted']),
+    }
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""分阶段性能跟踪：记录各阶段的墙钟时间、CPU 时间、内存峰值与条款/差异数量，导出 Chrome 跟踪格式
+
+默认关闭，关闭时 span() 只返回一个共享的空阶段，几乎没有开销。开启方式：
+  - 环境变量 CONTRACT_COMPARE_TRACE=1（进程退出时写出 compare_trace.json），
+    或 CONTRACT_COMPARE_TRACE=<文件路径>.json；
+  - 界面中按 Ctrl+Alt+Shift+P 打开性能面板并开始记录。
+导出的 JSON 可直接用 chrome://tracing、Perfetto 或 speedscope 打开。
+
+内存峰值由 tracemalloc 统计（会使 Python 代码整体变慢约一倍）。tracemalloc 按进程统计，
+多个线程同时运行的阶段其峰值会互相包含，只在单个任务运行时准确。
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+TRACE_ENV = "CONTRACT_COMPARE_TRACE"
+DEFAULT_TRACE_FILE = "compare_trace.json"
+
+
+class Span:
+    """一个进行中的阶段；结束时写入跟踪记录。可用 set() 补充块数、差异数等参数"""
+    __slots__ = ('tracer', 'name', 'args', 'thread_id', 'wall_start', 'cpu_start', 'base_memory',
+                 'outer_peak', 'child_peak')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.thread_id = threading.get_ident()
+        self.child_peak = 0
+        self.base_memory = self.outer_peak = None
+        if tracer.trace_memory and tracemalloc.is_tracing():
+            # 重置峰值以单独统计本阶段；外层阶段此前的峰值先保存下来，结束时再合并回去
+            self.base_memory, self.outer_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def finish(self, **args):
+        cpu = time.thread_time() - self.cpu_start
+        wall = time.perf_counter() - self.wall_start
+        self.args.update(args)
+        peak = None
+        if self.base_memory is not None and tracemalloc.is_tracing():
+            absolute_peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            peak = max(absolute_peak - self.base_memory, 0)
+            self.tracer._pop(self, max(absolute_peak, self.outer_peak))
+        else:
+            self.tracer._pop(self, None)
+        self.tracer._record(self, wall, cpu, peak)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.finish()
+        return False
+
+
+class _NullSpan:
+    """未开启跟踪时使用的空阶段：所有操作均无效果"""
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def finish(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """跟踪记录器（线程安全）；records() 供性能面板显示，write() 导出 Chrome 跟踪 JSON"""
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self._lock = threading.Lock()
+        self._records = []
+        self._stacks = threading.local()
+        self._origin = time.perf_counter()
+
+    def enable(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def clear(self):
+        with self._lock:
+            self._records = []
+
+    def start(self, name, **args):
+        """开始一个阶段；跨回调的阶段（如页面加载）用 span.finish() 结束"""
+        if not self.enabled:
+            return _NULL_SPAN
+        span = Span(self, name, args)
+        self._stack().append(span)
+        return span
+
+    def span(self, name, **args):
+        """with tracer.span("match", blocks=n) as span: ...；未开启跟踪时返回空阶段"""
+        return self.start(name, **args)
+
+    def _stack(self):
+        stack = getattr(self._stacks, 'spans', None)
+        if stack is None:
+            stack = self._stacks.spans = []
+        return stack
+
+    def _pop(self, span, absolute_peak):
+        stack = self._stack() if threading.get_ident() == span.thread_id else []
+        if span in stack:
+            stack.remove(span)
+        # 把本阶段的峰值并入外层阶段（reset_peak 清掉了外层此前的峰值）
+        if absolute_peak is not None and stack:
+            stack[-1].child_peak = max(stack[-1].child_peak, absolute_peak)
+
+    def _record(self, span, wall, cpu, peak):
+        record = {
+            'name': span.name,
+            'thread': span.thread_id,
+            'start': span.wall_start - self._origin,
+            'wall': wall,
+            'cpu': cpu,
+            'peak_bytes': peak,
+            'args': dict(span.args),
+        }
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        """已完成阶段的列表（按开始时间排序）"""
+        with self._lock:
+            return sorted(self._records, key=lambda record: record['start'])
+
+    def to_chrome_trace(self):
+        """Chrome 跟踪事件格式（'X' 完整事件，时间单位微秒）"""
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': '文件对比工具'}}]
+        for record in self.records():
+            args = dict(record['args'])
+            args['cpu_ms'] = round(record['cpu'] * 1000, 3)
+            if record['peak_bytes'] is not None:
+                args['peak_kb'] = round(record['peak_bytes'] / 1024, 1)
+            events.append({
+                'name': record['name'],
+                'cat': 'compare',
+                'ph': 'X',
+                'ts': round(record['start'] * 1e6, 1),
+                'dur': round(record['wall'] * 1e6, 1),
+                'pid': pid,
+                'tid': record['thread'],
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+        return path
+
+
+# 进程内唯一的跟踪记录器
+tracer = Tracer()
+
+
+def span(name, **args):
+    """模块级快捷方式：tracing.span("convert") 等同于 tracer.span("convert")"""
+    return tracer.span(name, **args)
+
+
+def traced(name, fn):
+    """把 fn 包装为在 name 阶段内执行的函数（保留 progress 等关键字参数）"""
+    def run(*args, **kwargs):
+        with tracer.span(name):
+            return fn(*args, **kwargs)
+    return run
+
+
+def enable_from_environment():
+    """按环境变量开启跟踪，并在进程退出时写出跟踪文件；返回跟踪文件路径（未开启时为 None）"""
+    value = os.environ.get(TRACE_ENV, "").strip()
+    if not value or value == "0":
+        return None
+    path = DEFAULT_TRACE_FILE if value == "1" else value
+    tracer.enable()
+    atexit.register(tracer.write, path)
+    return path
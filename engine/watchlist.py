@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""关键要素监控：提取条款中的金额、日期、比例、当事方与关注词，对比匹配条款间的要素变化并按重要程度排序
+
+审阅时最关心金额、日期、比例、当事方名称和特定条款用语的变化，这些变化在字符级标红中不够醒目。
+每个文本块只扫描两遍：关注词（及配置的当事方名称）用 Aho-Corasick 自动机一次匹配全部模式，
+金额/日期/比例/当事方标注合并为一个预编译正则。开销与文本长度线性相关，可在每次对比时执行。
+
+要素按归一化后的值比较（如 "¥1,000,000" 与 "人民币100万元" 相同，"2025年1月1日" 与 "2025-01-01" 相同），
+仅格式变化不会报告。
+"""
+import re
+from collections import Counter, deque
+from decimal import Decimal, InvalidOperation
+
+from engine.diff_ir import OP_DELETE, OP_INSERT
+
+# 要素类型（按重要程度排序，数值越小越优先）
+KIND_AMOUNT = 'amount'
+KIND_DATE = 'date'
+KIND_PERCENTAGE = 'percentage'
+KIND_PARTY = 'party'
+KIND_KEYWORD = 'keyword'
+
+PRIORITIES = {KIND_AMOUNT: 1, KIND_DATE: 2, KIND_PERCENTAGE: 3, KIND_PARTY: 4, KIND_KEYWORD: 5}
+KIND_LABELS = {KIND_AMOUNT: '金额', KIND_DATE: '日期', KIND_PERCENTAGE: '比例', KIND_PARTY: '当事方',
+               KIND_KEYWORD: '关注词'}
+
+# 变化类型
+CHANGE_MODIFIED = 'changed'
+CHANGE_ADDED = 'added'
+CHANGE_REMOVED = 'removed'
+CHANGE_LABELS = {CHANGE_MODIFIED: '变更', CHANGE_ADDED: '新增', CHANGE_REMOVED: '删除'}
+
+# 默认关注词（合同审阅中影响权利义务的常见用语）
+DEFAULT_KEYWORDS = (
+    '违约金', '违约责任', '赔偿', '损失', '滞纳金', '罚款', '利息', '定金', '保证金', '预付款', '质保金',
+    '解除', '终止', '自动续期', '不可抗力', '免责', '责任限额', '担保', '连带责任', '保密', '排他', '独家',
+    '知识产权', '验收', '争议解决', '仲裁', '管辖', '适用法律',
+)
+
+# 当事方称谓（"甲方：XX公司" 中的称谓）
+PARTY_ROLES = ('甲方', '乙方', '丙方', '丁方', '出卖人', '买受人', '出租人', '承租人', '委托人', '受托人',
+               '发包人', '承包人', '借款人', '贷款人', '保证人', '供方', '需方', '卖方', '买方')
+
+_NUMBER = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?'
+_CN_DIGITS = '零〇一二两三四五六七八九壹贰叁肆伍陆柒捌玖'
+_CN_UNITS = '十拾百佰千仟万亿'
+_CURRENCY_PREFIX = r'人民币|RMB|CNY|USD|US\$|美元|港币|HKD|欧元|EUR|[¥￥$€]'
+_CURRENCY_SUFFIX = r'万元|亿元|元|圆|美元|港元|港币|欧元'
+
+# 金额、日期、比例、当事方合并为一个正则，按命名分组区分类型（日期与比例在金额之前，避免被数字金额截断）
+_PATTERN = re.compile(
+    r'(?P<date>(?P<year>\d{4})\s*年\s*(?P<month>\d{1,2})\s*月(?:\s*(?P<day>\d{1,2})\s*日)?'
+    r'|(?P<iso_year>\d{4})[-/.](?P<iso_month>\d{1,2})[-/.](?P<iso_day>\d{1,2})(?!\d)'
+    r'|(?P<cn_year>[〇零一二三四五六七八九]{4})年(?P<cn_month>[一二三四五六七八九十]{1,2})月'
+    r'(?:(?P<cn_day>[一二三四五六七八九十]{1,3})日)?)'
+    rf'|(?P<percentage>(?P<percent_number>{_NUMBER})\s*[%％]|百分之(?P<percent_cn>[{_CN_DIGITS}{_CN_UNITS}点]+))'
+    rf'|(?P<amount>(?P<prefix>{_CURRENCY_PREFIX})\s*(?P<prefixed_number>{_NUMBER})(?:\s*(?P<prefixed_unit>万|亿))?'
+    rf'(?:\s*(?P<prefixed_suffix>{_CURRENCY_SUFFIX}))?'
+    rf'|(?P<number>{_NUMBER})\s*(?P<unit>万|亿)?\s*(?P<suffix>{_CURRENCY_SUFFIX})'
+    rf'|(?P<cn_prefix>人民币)?(?P<cn_amount>[{_CN_DIGITS}十拾][{_CN_DIGITS}{_CN_UNITS}]*)(?:元|圆)'
+    rf'(?P<cn_fraction>(?:[{_CN_DIGITS}]角)?(?:[{_CN_DIGITS}]分)?)整?)'
+    r'|(?P<party>(?P<role>' + '|'.join(PARTY_ROLES) + r')\s*(?:[（(][^）)]{0,20}[）)])?\s*[:：]\s*'
+    r'(?P<party_name>[^，,。；;：:\s（()）]{2,60}))'
+)
+
+_CURRENCIES = {
+    '人民币': 'CNY', 'RMB': 'CNY', 'CNY': 'CNY', '¥': 'CNY', '￥': 'CNY', '元': 'CNY', '圆': 'CNY', '万元': 'CNY',
+    '亿元': 'CNY', 'USD': 'USD', 'US$': 'USD', '$': 'USD', '美元': 'USD', '港币': 'HKD', 'HKD': 'HKD',
+    '港元': 'HKD', '欧元': 'EUR', 'EUR': 'EUR', '€': 'EUR',
+}
+_MULTIPLIERS = {'万': 10000, '亿': 100000000, '万元': 10000, '亿元': 100000000}
+_CN_DIGIT_VALUES = {ch: value for value, chars in enumerate(('零〇', '一壹', '二两贰', '三叁', '四肆', '五伍', '六陆',
+                                                             '七柒', '八捌', '九玖'))
+                    for ch in chars}
+_CN_UNIT_VALUES = {'十': 10, '拾': 10, '百': 100, '佰': 100, '千': 1000, '仟': 1000}
+
+
+def chinese_number(text):
+    """中文数字（含大写）转整数，如 "壹拾万" → 100000、"二十五" → 25；无法解析时返回 None"""
+    # total 累计亿级，section 累计万级，current 为万以下部分
+    total = section = current = digit = 0
+    for ch in text:
+        if ch in _CN_DIGIT_VALUES:
+            digit = _CN_DIGIT_VALUES[ch]
+        elif ch in _CN_UNIT_VALUES:
+            current += (digit or 1) * _CN_UNIT_VALUES[ch]
+            digit = 0
+        elif ch == '万':
+            section = (section + current + digit) * 10000
+            current = digit = 0
+        elif ch == '亿':
+            total = (total + section + current + digit) * 100000000
+            section = current = digit = 0
+        else:
+            return None
+    return total + section + current + digit
+
+
+def _chinese_digits(text):
+    """逐位读出的中文数字（如年份 "二〇二五"）"""
+    return int(''.join(str(_CN_DIGIT_VALUES[ch]) for ch in text))
+
+
+def _decimal(text):
+    try:
+        return Decimal(text.replace(',', ''))
+    except InvalidOperation:
+        return None
+
+
+def _format_decimal(value):
+    value = value.normalize()
+    return format(value, 'f') if value == value.to_integral() else str(value)
+
+
+def _amount_value(match):
+    if match.group('cn_amount') is not None:
+        value = chinese_number(match.group('cn_amount'))
+        if value is None or value == 0:
+            return None
+        amount = Decimal(value)
+        fraction = match.group('cn_fraction')
+        for unit, scale in (('角', Decimal('0.1')), ('分', Decimal('0.01'))):
+            position = fraction.find(unit)
+            if position > 0:
+                amount += _CN_DIGIT_VALUES[fraction[position - 1]] * scale
+        return f"CNY {_format_decimal(amount)}"
+    if match.group('number') is not None:
+        number, unit, currency = match.group('number'), match.group('unit'), match.group('suffix')
+    else:
+        number, unit = match.group('prefixed_number'), match.group('prefixed_unit')
+        currency = match.group('prefix')
+        suffix = match.group('prefixed_suffix')
+        if suffix in _MULTIPLIERS and unit is None:
+            unit = suffix
+    amount = _decimal(number)
+    if amount is None:
+        return None
+    if unit is None and currency in _MULTIPLIERS:
+        unit = currency
+    if unit is not None:
+        amount *= _MULTIPLIERS[unit]
+    return f"{_CURRENCIES.get(currency, currency)} {_format_decimal(amount)}"
+
+
+def _date_value(match):
+    if match.group('year') is not None:
+        parts = (match.group('year'), match.group('month'), match.group('day'))
+        numbers = [int(part) if part is not None else None for part in parts]
+    elif match.group('iso_year') is not None:
+        numbers = [int(match.group('iso_year')), int(match.group('iso_month')), int(match.group('iso_day'))]
+    else:
+        numbers = [_chinese_digits(match.group('cn_year')), chinese_number(match.group('cn_month')),
+                   chinese_number(match.group('cn_day')) if match.group('cn_day') else None]
+    year, month, day = numbers
+    if not 1 <= month <= 12 or day is not None and not 1 <= day <= 31:
+        return None
+    return f"{year:04d}-{month:02d}" + (f"-{day:02d}" if day is not None else '')
+
+
+def _percentage_value(match):
+    if match.group('percent_number') is not None:
+        value = _decimal(match.group('percent_number'))
+    else:
+        integer, _, fraction = match.group('percent_cn').partition('点')
+        whole = chinese_number(integer) if integer else 0
+        if whole is None:
+            return None
+        value = Decimal(whole)
+        if fraction:
+            digits = ''.join(str(_CN_DIGIT_VALUES.get(ch, '')) for ch in fraction)
+            value = _decimal(f"{whole}.{digits}") if digits else value
+    return f"{_format_decimal(value)}%" if value is not None else None
+
+
+class Entity:
+    """文本中的一个关键要素：value 为归一化后的值（用于比较），text 为原文"""
+    __slots__ = ('kind', 'value', 'text', 'start', 'end')
+
+    def __init__(self, kind, value, text, start, end):
+        self.kind = kind
+        self.value = value
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Entity({self.kind}, {self.value!r}, text={self.text!r})"
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机：一次扫描找出全部模式的所有出现位置（含重叠）"""
+    __slots__ = ('_goto', '_fail', '_output')
+
+    def __init__(self, patterns):
+        """patterns 为 (模式串, 附带数据) 的可迭代对象"""
+        goto = [{}]
+        output = [[]]
+        for pattern, payload in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                next_node = goto[node].get(ch)
+                if next_node is None:
+                    next_node = goto[node][ch] = len(goto)
+                    goto.append({})
+                    output.append([])
+                node = next_node
+            output[node].append((len(pattern), pattern, payload))
+
+        # 广度优先计算失败指针，并把失败指针所指结点的输出合并进来
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, next_node in goto[node].items():
+                queue.append(next_node)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[next_node] = goto[state].get(ch, 0)
+                output[next_node] = output[next_node] + output[fail[next_node]]
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def finditer(self, text):
+        """依次生成 (起始, 结束, 模式串, 附带数据)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for position, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, pattern, payload in output[node]:
+                yield position + 1 - length, position + 1, pattern, payload
+
+
+class Watchlist:
+    """关键要素扫描器：keywords 为关注词，parties 为需要识别的当事方名称（如 "某某有限公司"）"""
+
+    def __init__(self, keywords=DEFAULT_KEYWORDS, parties=()):
+        self.keywords = tuple(keywords)
+        self.parties = tuple(parties)
+        self.automaton = AhoCorasick([(keyword, KIND_KEYWORD) for keyword in self.keywords]
+                                     + [(party, KIND_PARTY) for party in self.parties])
+
+    def scan(self, text):
+        """按出现位置返回文本中的全部要素"""
+        entities = []
+        for match in _PATTERN.finditer(text):
+            kind = match.lastgroup  # 外层分组最后闭合，即要素类型
+            if kind == KIND_AMOUNT:
+                value = _amount_value(match)
+            elif kind == KIND_DATE:
+                value = _date_value(match)
+            elif kind == KIND_PERCENTAGE:
+                value = _percentage_value(match)
+            else:
+                value = f"{match.group('role')}：{match.group('party_name')}"
+            if value is not None:
+                entities.append(Entity(kind, value, match.group(), match.start(), match.end()))
+        for start, end, pattern, kind in self.automaton.finditer(text):
+            entities.append(Entity(kind, pattern, pattern, start, end))
+        entities.sort(key=lambda entity: entity.start)
+        return entities
+
+    def scan_blocks(self, text_blocks):
+        """逐块扫描，返回与文本块一一对应的要素列表"""
+        return [self.scan(block.text) for block in text_blocks]
+
+    def compare(self, original_blocks, compare_blocks, ops):
+        """按差异操作对比要素，返回按重要程度排序的变化列表（只扫描发生变化的条款）
+
+        每项为 {'priority', 'kind', 'change', 'original', 'compare', 'original_value', 'compare_value',
+               'orig_index', 'comp_index', 'identifier', 'anchor'}；original/compare 为要素原文（新增/删除时一侧为 None）。
+        """
+        findings = []
+        for op in ops:
+            if op.kind != OP_INSERT and op.kind != OP_DELETE and op.opcodes is None:
+                continue  # 仅层级变化
+            original = self.scan(original_blocks[op.orig_index].text) if op.kind != OP_INSERT else []
+            compare = self.scan(compare_blocks[op.comp_index].text) if op.kind != OP_DELETE else []
+            block = compare_blocks[op.comp_index] if op.kind != OP_DELETE else original_blocks[op.orig_index]
+            for change in diff_entities(original, compare):
+                change.update(orig_index=op.orig_index, comp_index=op.comp_index, identifier=block.identifier,
+                              anchor=op.anchor)
+                findings.append(change)
+        findings.sort(key=lambda finding: (finding['priority'], finding['anchor']))
+        return findings
+
+
+def diff_entities(original_entities, compare_entities):
+    """对比两组要素（按类型和归一化值计数），同类型的删除与新增按出现顺序配对为变更（关注词不配对）"""
+    changes = []
+    for kind in sorted({entity.kind for entity in original_entities + compare_entities}, key=PRIORITIES.get):
+        original = [entity for entity in original_entities if entity.kind == kind]
+        compare = [entity for entity in compare_entities if entity.kind == kind]
+        removed_counts = Counter(entity.value for entity in original) - Counter(entity.value for entity in compare)
+        added_counts = Counter(entity.value for entity in compare) - Counter(entity.value for entity in original)
+        removed = _take(original, removed_counts)
+        added = _take(compare, added_counts)
+        paired = 0 if kind == KIND_KEYWORD else min(len(removed), len(added))
+        for old, new in zip(removed[:paired], added[:paired]):
+            changes.append(_change(kind, CHANGE_MODIFIED, old, new))
+        changes.extend(_change(kind, CHANGE_REMOVED, old, None) for old in removed[paired:])
+        changes.extend(_change(kind, CHANGE_ADDED, None, new) for new in added[paired:])
+    return changes
+
+
+def _take(entities, counts):
+    """按出现顺序取出计数范围内的要素"""
+    counts = Counter(counts)
+    taken = []
+    for entity in entities:
+        if counts[entity.value] > 0:
+            counts[entity.value] -= 1
+            taken.append(entity)
+    return taken
+
+
+def _change(kind, change, old, new):
+    return {
+        'priority': PRIORITIES[kind],
+        'kind': kind,
+        'change': change,
+        'original': old.text if old is not None else None,
+        'compare': new.text if new is not None else None,
+        'original_value': old.value if old is not None else None,
+        'compare_value': new.value if new is not None else None,
+    }
+
+
+def format_finding(finding):
+    """单条变化的中文描述，如 "金额变更：100万元 → 120万元（第3条）" """
+    label = f"{KIND_LABELS[finding['kind']]}{CHANGE_LABELS[finding['change']]}"
+    if finding['change'] == CHANGE_MODIFIED:
+        detail = f"{finding['original']} → {finding['compare']}"
+    else:
+        detail = finding['compare'] if finding['change'] == CHANGE_ADDED else finding['original']
+    location = f"（{finding['identifier']}）" if finding['identifier'] else ''
+    return f"{label}：{detail}{location}"
+
+
+_DEFAULT_WATCHLIST = None
+
+
+def default_watchlist():
+    """默认关注词的扫描器（自动机只构建一次）"""
+    global _DEFAULT_WATCHLIST
+    if _DEFAULT_WATCHLIST is None:
+        _DEFAULT_WATCHLIST = Watchlist()
+    return _DEFAULT_WATCHLIST
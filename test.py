@@ -1,19 +1,48 @@
 # -*- coding: utf-8 -*-
+import time
+_PROCESS_START = time.perf_counter()  # 启动耗时从这里开始计算（见 ui/startup.py）
 import sys
 import os
-import re
-import shutil
-from datetime import datetime
-from PyQt6.QtWidgets import (QApplication, QWidget, QFileDialog, QMessageBox,
-                             QVBoxLayout, QHBoxLayout, QLabel, QPushButton)
-from PyQt6.QtWidgets import QApplication, QWidget, QFileDialog, QMessageBox
-import mammoth
-from difflib import SequenceMatcher
-from bs4 import BeautifulSoup
+from functools import partial
+from PyQt6.QtWidgets import (QApplication, QWidget, QFileDialog, QMessageBox, QVBoxLayout, QHBoxLayout,
+                             QLabel, QPushButton, QProgressDialog, QLineEdit, QTableView, QAbstractItemView,
+                             QHeaderView, QTableWidget, QTableWidgetItem)
+from PyQt6.QtGui import QKeySequence, QShortcut
 from ui.optimized_compare import Ui_Form
-from PyQt6.QtCore import Qt  # 注意：PyQt6 中是小写的 qt（区分大小写）
-from docx import Document
-from docx.shared import RGBColor
+from ui.compare_worker import CompareJob
+from ui.document_scheme import install_document_handler, register_document_scheme
+from ui.history_model import HistoryTableModel, PathRole
+from ui.perf_panel import PerformancePanel
+from ui.startup import report_when_interactive
+from engine.conversion_cache import ConversionCache
+from engine.diff_ir import DiffNavigator, anchor_id
+from engine.docx_patch import patch_docx
+from engine.history_index import HistoryIndex
+from engine.clause_search import ClauseSearchIndex, index_document, index_history
+from engine.docx_stream import load_blocks
+from engine.image_store import ImageStore
+from engine.table_diff import has_table_changes
+from engine.watchlist import format_finding
+from engine.tracing import enable_from_environment, traced, tracer
+from engine.compare_engine import (WORD_CSS, build_full_html, compare_document_details, compare_text_blocks,
+                                   extract_text_blocks, get_insert_position, highlight_differences, load_document,
+                                   match_blocks_by_structure)
+from PyQt6.QtCore import QCoreApplication, Qt, QThreadPool, QTimer  # 注意：PyQt6 中是小写的 qt（区分大小写）
+
+# 完成提示中列出的关键要素变化条数（按金额、日期、比例、当事方、关注词的顺序）
+WATCHLIST_MESSAGE_LIMIT = 8
+
+# 字符级差异的并行工作者数（见 engine.parallel_diff）：界面默认串行。
+# 3000 条款、60% 修订的文档上 4 个工作进程耗时 4.0 秒，串行 3.1 秒（进程启动与结果传回的开销大于收益）
+DIFF_WORKERS = None
+
+
+def compare_with_details(original_blocks, compare_blocks, compare_html, original_path, compare_path,
+                         progress=None):
+    """条款与表格对比（结果中的 'table_changes'），另外对比两份文件的图片（结果中的 'image_changes'）"""
+    result = compare_text_blocks(original_blocks, compare_blocks, compare_html, progress, diff_workers=DIFF_WORKERS)
+    result.update(compare_document_details(original_path, compare_path))
+    return result
 
 class CompareApp(QWidget, Ui_Form):
     def __init__(self):
@@ -25,6 +54,17 @@ class CompareApp(QWidget, Ui_Form):
         self.history_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history_files")
         if not os.path.exists(self.history_dir):
             os.makedirs(self.history_dir)
+        # 历史文件目录：SQLite 元数据 + 按内容哈希去重的文件对象（并入旧版带时间戳的副本）
+        self.history_index = HistoryIndex(self.history_dir)
+        self.history_index.migrate_legacy_files()
+        # 条款全文检索索引：导入时在后台增量更新，启动时为尚未索引的历史文件补建
+        self.clause_index_path = os.path.join(self.history_dir, "clause_index.sqlite3")
+        self.clause_index = ClauseSearchIndex(self.clause_index_path)
+        # 转换缓存与历史文件目录相邻：重复打开同一合同时跳过 mammoth 转换和条款提取
+        self.conversion_cache = ConversionCache(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversion_cache"))
+        # 文档中的图片按内容哈希外置到磁盘（HTML 只引用 contract://image/ 地址，相同印章只存一份）
+        self.image_store = ImageStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_cache"))
 
         # 绑定按钮事件
         self.importOriginalFileButton.clicked.connect(self.load_original_file)
@@ -40,138 +80,40 @@ class CompareApp(QWidget, Ui_Form):
         self.original_text_blocks = []
         self.compare_text_blocks = []
         self.highlighted_html = None  # 保存标红后的HTML结果
+        # 差异中间表示：(差异操作列表, 原文件文本块, 对比文件文本块)，供导航与导出直接使用
+        self.diff_result = None
+        self.diff_source_path = None  # 对比时使用的对比文件（补丁导出的底稿）
+        self.diff_navigator = DiffNavigator()
         # 历史页面实例（作为子窗口）
         self.history_page = None
+        # 当前后台任务及其进度对话框（同一时间只运行一个任务）
+        self.current_job = None
+        self.progress_dialog = None
+        # 不显示进度的后台任务（条款索引），由主窗口持有直至完成
+        self.background_jobs = set()
+        # 性能面板（Ctrl+Alt+Shift+P 打开并开始记录各阶段耗时）
+        self.perf_panel = None
 
         # 模拟 Word 样式
-        self.word_css = """
-        <style>
-            body {
-                font-family: 'SimSun', '宋体', serif;
-                font-size: 12pt;
-                line-height: 1.8;
-                color: #000000;
-                background-color: #ffffff;
-                max-width: 21cm;
-                margin: 0 auto;
-                padding: 2.5cm 2cm;
-            }
-            .contract-main-title {
-                text-align: center;
-                font-size: 16pt;
-                font-weight: bold;
-                margin: 0 0 40pt 0;
-                text-indent: 0;
-            }
-            .party-info {
-                text-align: left;
-                margin: 15pt 0;
-                text-indent: 0;
-            }
-            .contract-preface {
-                text-align: justify;
-                text-indent: 2em;
-                margin: 20pt 0;
-            }
-            .clause-level1 {
-                font-weight: bold;
-                font-size: 13pt;
-                margin: 25pt 0 10pt 0;
-                text-indent: 0;
-            }
-            .clause-level2 {
-                font-weight: bold;
-                text-indent: 2em;
-                margin: 15pt 0 5pt 0;
-            }
-            p {
-                text-align: justify;
-                text-indent: 2em;
-                margin: 8pt 0;
-            }
-            ul, ol {
-                margin: 5pt 0 5pt 4em;
-                padding-left: 0;
-            }
-            li {
-                text-align: justify;
-                margin: 6pt 0;
-                text-indent: 0;
-            }
-            .signature-area {
-                margin-top: 60pt;
-                text-indent: 0;
-            }
-            .signature-item {
-                margin: 20pt 0;
-                text-indent: 0;
-            }
-            .sign-date {
-                margin-top: 30pt;
-                text-indent: 0;
-            }
-            .diff-highlight {
-                background-color: #ffcccc;
-                color: #ff0000;
-                font-weight: bold;
-                padding: 0 2px;
-            }
-            .diff-delete {
-                color: #ff0000;
-                text-decoration: line-through;
-                font-weight: bold;
-                padding: 0 2px;
-            }
-            /* 在word_css中增加样式 */
-            .level-change-only { 
-                color: #ff9900; 
-                background-color: #fff8e1;  /* 浅黄背景区分纯层级变化 */
-            }
-        </style>
-        """
+        self.word_css = WORD_CSS
+        # 展示区通过 contract:// 协议分块加载文档（不受 setHtml 2MB 上限限制）；
+        # 网页视图与协议处理器在第一次显示文档时才创建，启动时不占用界面线程
+        self.document_server = None
+
+        # 差异导航：F3 下一处，Shift+F3 上一处
+        QShortcut(QKeySequence("F3"), self, activated=self.show_next_difference)
+        QShortcut(QKeySequence("Shift+F3"), self, activated=self.show_previous_difference)
+        QShortcut(QKeySequence("Ctrl+Alt+Shift+P"), self, activated=self.show_perf_panel)
+
+        # 未索引文件的查询与补建都在后台线程中进行，启动时不读取整个历史目录
+        self.start_background_job(index_history, self.clause_index_path, self.history_dir,
+                                  partial(load_blocks, cache=self.conversion_cache))
 
     # --------------------------------------------------------
     # 从 HTML 提取文本块
     # --------------------------------------------------------
     def extract_text_blocks(self, html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        text_blocks = []
-        # 扩展需要提取的标签类型（覆盖合同常见元素）
-        target_tags = ['p', 'li', 'h1', 'h2', 'h3', 'td', 'th']  # 新增标题、表格单元格标签
-
-        for tag in target_tags:
-            for element in soup.find_all(tag):
-                # 提取文本并过滤纯空白/无效内容
-                text = element.get_text(strip=True)
-                if not text:
-                    continue  # 跳过空文本块
-
-                # 提取合同层级信息（基于CSS类名，如 clause-level1 对应一级条款）
-                level = 0
-                classes = element.get('class', [])
-                for cls in classes:
-                    if cls.startswith('clause-level'):
-                        # 从类名中提取层级数字（如 'clause-level2' → 2）
-                        level = int(cls.split('-')[-1])
-                        break
-
-                # 提取合同特有标识（如条款号、角色名）
-                identifier = None
-                # 匹配条款号（如"第1条"、"1.1"、"一、"等）
-                clause_pattern = re.compile(r'^(第?\d+[条款项]|[\d.]+|[\u4e00-\u9fa5]+、)')
-                if clause_pattern.match(text):
-                    identifier = clause_pattern.match(text).group()
-
-                # 存储块信息（包含标签类型、层级、标识）
-                text_blocks.append({
-                    'text': text,
-                    'tag': tag,
-                    'level': level,  # 用于结构化匹配
-                    'identifier': identifier,  # 用于锚点定位（如"第3条"）
-                    'original_element': element  # 保留原始元素，便于后续还原格式
-                })
-
-        return text_blocks
+        return extract_text_blocks(html_content)
 
     def compare_files(self):
         if not self.original_file_path or not self.compare_file_path:
@@ -181,220 +123,173 @@ class CompareApp(QWidget, Ui_Form):
             QMessageBox.warning(self, "警告", "文件内容解析失败，请重新导入！")
             return
 
-        try:
-            # 1. 基于条款标识和层级的智能匹配（核心优化）
-            matched_pairs = self.match_blocks_by_structure()
-            if not matched_pairs:
-                QMessageBox.warning(self, "提示", "未找到可匹配的条款结构，将使用默认顺序对比")
-                # 退回到原始顺序对比逻辑
-                matched_pairs = [(i, i) for i in
-                                 range(min(len(self.original_text_blocks), len(self.compare_text_blocks)))]
-                extra_compare_indices = list(range(len(matched_pairs), len(self.compare_text_blocks)))
-            else:
-                # 提取未匹配的新增条款
-                extra_compare_indices = [j for j in range(len(self.compare_text_blocks))
-                                         if j not in [pair[1] for pair in matched_pairs]]
-
-            # 2. 初始化对比文档
-            soup = BeautifulSoup(self.compare_html, 'html.parser')
-            compare_nodes = soup.find_all(['p', 'li', 'h1', 'h2', 'h3', 'td', 'th'])  # 扩展支持的标签
-            diff_count = 0
-
-            # 3. 对比已匹配的条款块
-            for orig_idx, comp_idx in matched_pairs:
-                orig_block = self.original_text_blocks[orig_idx]
-                comp_block = self.compare_text_blocks[comp_idx]
-                node = compare_nodes[comp_idx]
-
-                # 跳过空文本块
-                if not orig_block['text'] or not comp_block['text']:
-                    continue
-
-                # 4. 针对合同关键信息的增强对比
-                highlighted_html = self.highlight_differences(orig_block['text'], comp_block['text'])
-
-                # 5. 标记条款层级变化（如一级条款变成二级条款）
-                # 优化层级变化判断：文本相同则仅标记不计数，文本不同则正常计数
-                if orig_block.get('level') != comp_block.get('level'):
-                    highlighted_html = f'<span class="level-change">[层级变化] {highlighted_html}</span>'
-                    # 只有当文本内容不同时，才计入差异计数
-                    if highlighted_html != comp_block['text']:
-                        diff_count += 1
-
-                if highlighted_html != comp_block['text']:
-                    diff_count += 1
-                    node.string = ''
-                    node.append(BeautifulSoup(highlighted_html, 'html.parser'))
-
-            # 6. 标记新增条款（合同中新增的条款单独标注来源）
-            for comp_idx in extra_compare_indices:
-                node = compare_nodes[comp_idx]
-                extra_text = node.get_text(strip=True)
-                if extra_text:
-                    diff_count += 1
-                    # 新增条款标记中加入原文件位置提示（如"新增于原文件第X条后"）
-                    insert_pos = self.get_insert_position(comp_idx)
-                    highlight_html = f'<span class="diff-highlight">[新增条款{insert_pos}] {extra_text}</span>'
-                    node.string = ''
-                    node.append(BeautifulSoup(highlight_html, 'html.parser'))
-
-            # 7. 标记原文件有但对比文件缺失的条款
-            missing_indices = [i for i in range(len(self.original_text_blocks))
-                               if i not in [pair[0] for pair in matched_pairs]]
-            if missing_indices:
-                # 在对比文档末尾添加缺失条款汇总
-                missing_section = soup.new_tag('div')
-                missing_section['class'] = 'missing-clauses'
-                missing_section.append(BeautifulSoup('<p><strong>原文件缺失条款：</strong></p>', 'html.parser'))
-
-                for orig_idx in missing_indices:
-                    orig_text = self.original_text_blocks[orig_idx]['text']
-                    missing_p = soup.new_tag('p')
-                    # 确保 BeautifulSoup 解析结果正确
-                    span_soup = BeautifulSoup(f'<span class="diff-delete">[缺失] {orig_text}</span>', 'html.parser')
-                    missing_p.append(span_soup)
-                    missing_section.append(missing_p)
-                    diff_count += 1
-
-                # 关键修复：检查并确保 body 标签存在
-                if soup.body is None:
-                    body = soup.new_tag('body')
-                    soup.append(body)
-                soup.body.append(missing_section)
-
-            # 8. 生成最终HTML
-            highlighted_full_html = f"""
-            <!DOCTYPE html><html><head>
-            <meta charset="UTF-8">{self.word_css}
-            <style>
-                .level-change {{ color: #ff9900; }}  /* 层级变化标记为橙色 */
-                .missing-clauses {{ margin-top: 20pt; padding: 10pt; border: 1px solid #ff0000; }}
-            </style>
-            </head><body>
-            {str(soup)}</body></html>
-            """
-
-            self.highlighted_html = highlighted_full_html
-            self.webEngineCompareView.setHtml(highlighted_full_html)
-            QMessageBox.information(self, "完成", f"文件对比完成！共发现 {diff_count} 处差异（含条款新增/缺失/层级变化）。")
+        # 匹配、标红与渲染均由对比引擎在后台线程完成
+        original_blocks, compare_blocks = self.original_text_blocks, self.compare_text_blocks
+        compare_path = self.compare_file_path
+        self.start_job("文件对比", "文件对比失败",
+                       lambda result: self.on_compare_finished(result, original_blocks, compare_blocks,
+                                                               compare_path),
+                       traced("compare_files", compare_with_details), original_blocks, compare_blocks,
+                       self.compare_html, self.original_file_path, compare_path)
+
+    def on_compare_finished(self, result, original_blocks, compare_blocks, compare_path):
+        """对比任务完成后在主线程刷新右侧展示区"""
+        if result['fallback']:
+            QMessageBox.warning(self, "提示", "未找到可匹配的条款结构，将使用默认顺序对比")
+
+        self.highlighted_html = result['html']
+        self.diff_result = (result['ops'], original_blocks, compare_blocks)
+        self.diff_source_path = compare_path
+        self.diff_navigator = DiffNavigator(result['ops'])
+        self.publish_document(self.webEngineCompareView, result['html'])
+        message = f"文件对比完成！共发现 {result['diff_count']} 处差异（含条款新增/缺失/层级变化）。"
+        table_changes = result['table_changes']
+        if has_table_changes(table_changes):
+            message += (f"\n表格：{table_changes['modified_rows']} 行修改（{table_changes['modified_cells']} 个单元格）、"
+                        f"{table_changes['inserted_rows']} 行新增、{table_changes['deleted_rows']} 行删除，"
+                        f"新增表格 {len(table_changes['inserted_tables'])} 个、"
+                        f"删除表格 {len(table_changes['deleted_tables'])} 个。")
+        if result['image_changes']:
+            message += f"\n另有 {len(result['image_changes'])} 处图片变化（印章、签名等图片被替换、新增或删除）。"
+        findings = result['watchlist']
+        if findings:
+            message += f"\n\n关键要素变化 {len(findings)} 处：\n" + "\n".join(
+                format_finding(finding) for finding in findings[:WATCHLIST_MESSAGE_LIMIT])
+            if len(findings) > WATCHLIST_MESSAGE_LIMIT:
+                message += f"\n……其余 {len(findings) - WATCHLIST_MESSAGE_LIMIT} 处见导出结果"
+        QMessageBox.information(self, "完成", message)
 
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"文件对比失败：\n{e}")
+    # --------------------------------------------------------
+    # 差异导航：按锚点编号直接定位，无需在页面中搜索
+    # --------------------------------------------------------
+    def show_next_difference(self):
+        self.reveal_difference(self.diff_navigator.next())
+
+    def show_previous_difference(self):
+        self.reveal_difference(self.diff_navigator.previous())
 
-    # 新增：基于条款结构的匹配方法（需配合优化后的extract_text_blocks使用）
+    # --------------------------------------------------------
+    # 展示区加载：开启性能记录时统计从发布到页面加载完成的耗时
+    # --------------------------------------------------------
+    def ensure_document_server(self):
+        if self.document_server is None:
+            self.document_server = install_document_handler(self, image_store=self.image_store)
+        return self.document_server
+
+    def create_web_views(self):
+        """初始化浏览器上下文与两个网页视图（正常使用时由 publish_document 按需创建，启动测量时用于统计其耗时）"""
+        self.ensure_document_server()
+        for holder in (self.webEngineOriginView, self.webEngineCompareView):
+            holder.view()
+
+    def publish_document(self, holder, full_html):
+        document_server = self.ensure_document_server()
+        view = holder.view()
+        if tracer.enabled:
+            load_span = tracer.start("page_load", view=view.objectName(), html_chars=len(full_html))
+
+            def on_loaded(ok):
+                view.loadFinished.disconnect(on_loaded)
+                load_span.finish(ok=ok)
+
+            view.loadFinished.connect(on_loaded)
+        document_server.publish(view, full_html)
+
+    def show_perf_panel(self):
+        """隐藏功能：打开性能面板，尚未记录时开始记录"""
+        if not tracer.enabled:
+            tracer.enable()
+        if self.perf_panel is None:
+            self.perf_panel = PerformancePanel(self)
+        self.perf_panel.update_status()
+        self.perf_panel.show()
+        self.perf_panel.raise_()
+
+    def reveal_difference(self, op):
+        if op is None:
+            return
+        self.ensure_document_server().reveal(self.webEngineCompareView.view(), anchor_id(op.anchor))
+        self.setWindowTitle(f"文件对比工具 - 差异 {self.diff_navigator.position + 1}/{len(self.diff_navigator)}")
+
+    # --------------------------------------------------------
+    # 后台任务：转换/解析/对比在线程池中执行，界面保持响应
+    # --------------------------------------------------------
+    def start_job(self, title, error_title, on_finished, fn, *args):
+        """启动后台任务并显示可取消的进度对话框，完成后回调 on_finished(result)"""
+        if self.current_job is not None:
+            QMessageBox.warning(self, "提示", "已有任务正在进行，请等待完成或取消后再试")
+            return
+
+        job = CompareJob(fn, *args)
+        dialog = QProgressDialog(f"{title}：准备中...", "取消", 0, 100, self)
+        dialog.setWindowTitle(title)
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(300)  # 短任务不弹出对话框
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.canceled.connect(job.cancel)
+
+        def on_progress(stage, percent):
+            dialog.setLabelText(f"{title}：{stage}...")
+            dialog.setValue(percent)
+
+        def on_done(result):
+            self.finish_job()
+            on_finished(result)
+
+        def on_failed(message):
+            self.finish_job()
+            QMessageBox.critical(self, "错误", f"{error_title}：\n{message}")
+
+        job.signals.progress.connect(on_progress)
+        job.signals.finished.connect(on_done)
+        job.signals.failed.connect(on_failed)
+        job.signals.cancelled.connect(self.finish_job)
+
+        self.current_job = job
+        self.progress_dialog = dialog
+        job.start()
+
+    def finish_job(self):
+        """关闭进度对话框并释放当前任务"""
+        if self.progress_dialog is not None:
+            self.progress_dialog.close()
+            self.progress_dialog.deleteLater()
+        self.progress_dialog = None
+        self.current_job = None
+
+    def start_background_job(self, fn, *args):
+        """在线程池中运行不显示进度的任务（失败不打扰用户）"""
+        job = CompareJob(fn, *args)
+        self.background_jobs.add(job)
+        job.signals.finished.connect(lambda result: self.background_jobs.discard(job))
+        job.signals.failed.connect(lambda message: self.background_jobs.discard(job))
+        job.signals.cancelled.connect(lambda: self.background_jobs.discard(job))
+        job.start()
+
+    def closeEvent(self, event):
+        # 关闭窗口时取消正在运行的任务，等待线程池退出
+        if self.current_job is not None or self.background_jobs:
+            if self.current_job is not None:
+                self.current_job.cancel()
+            for job in self.background_jobs:
+                job.cancel()
+            QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
+
+    # 基于条款结构的匹配方法
     def match_blocks_by_structure(self):
         """通过条款标识（如第1条）和层级匹配对应文本块，解决顺序变动问题"""
-        matched = []
-        comp_matched = set()  # 记录已匹配的对比文件索引
+        return match_blocks_by_structure(self.original_text_blocks, self.compare_text_blocks)
 
-        # 优先通过条款标识匹配（如"第1条"必须匹配）
-        for orig_idx, orig_block in enumerate(self.original_text_blocks):
-            orig_id = orig_block.get('identifier')
-            if not orig_id:
-                continue
-            # 在对比文件中找相同标识的条款
-            for comp_idx, comp_block in enumerate(self.compare_text_blocks):
-                if comp_idx in comp_matched:
-                    continue
-                # 优先通过条款标识匹配时，增加层级相似性判断
-                if comp_block.get('identifier') == orig_id:
-                    # 若层级差异过大（如相差>1级），降低匹配优先级
-                    level_diff = abs(comp_block.get('level', 0) - orig_block.get('level', 0))
-                    if level_diff <= 1:  # 允许相邻层级的微小差异
-                        matched.append((orig_idx, comp_idx))
-                        comp_matched.add(comp_idx)
-                        break
-
-        # 剩余未匹配项按层级+文本相似度匹配
-        for orig_idx, orig_block in enumerate(self.original_text_blocks):
-            if orig_idx in [p[0] for p in matched]:
-                continue  # 跳过已匹配项
-            orig_level = orig_block.get('level', 0)
-            orig_text = orig_block['text']
-            # 找同层级且文本相似度>0.7的条款
-            for comp_idx, comp_block in enumerate(self.compare_text_blocks):
-                if comp_idx in comp_matched:
-                    continue
-                if comp_block.get('level', 0) != orig_level:
-                    continue
-                # 计算文本相似度
-                similarity = SequenceMatcher(None, orig_text, comp_block['text']).ratio()
-                if similarity > 0.7:
-                    matched.append((orig_idx, comp_idx))
-                    comp_matched.add(comp_idx)
-                    break
-
-        return matched
-
-    # 新增：计算新增条款在原文件中的插入位置提示
+    # 计算新增条款在原文件中的插入位置提示
     def get_insert_position(self, comp_idx):
         """判断新增条款在原文件中的相对位置（如"第3条后"）"""
-        comp_block = self.compare_text_blocks[comp_idx]
-        comp_level = comp_block.get('level', 0)
-        # 找到原文件中同层级的最后一个条款
-        last_orig_idx = -1
-        for i, block in enumerate(self.original_text_blocks):
-            if block.get('level', 0) == comp_level:
-                last_orig_idx = i
-        if last_orig_idx == -1:
-            return ""
-        orig_id = self.original_text_blocks[last_orig_idx].get('identifier', f"第{last_orig_idx + 1}项")
-        return f"（位于原文件{orig_id}后）"
+        return get_insert_position(self.original_text_blocks, self.compare_text_blocks, comp_idx)
 
     def highlight_differences(self, original_text, compare_text):
         """增强版差异标红：优化中文分词、忽略无关空格、支持标点符号精确对比"""
-        if original_text == compare_text:
-            return compare_text
-
-        # 1. 预处理：统一空格和换行符（合同中常因格式产生无关空格差异）
-        def preprocess(text):
-            # 合并连续空格为单个（保留一个空格避免语义变化）
-            text = re.sub(r'\s+', ' ', text)
-            # 去除首尾空格（合同条款首尾空格通常无意义）
-            return text.strip()
-
-        orig_processed = preprocess(original_text)
-        comp_processed = preprocess(compare_text)
-
-        # 预处理后仍相同则直接返回
-        if orig_processed == comp_processed:
-            return compare_text
-
-        # 2. 针对中文优化的序列匹配（使用字符级比对，避免英文分词逻辑干扰）
-        matcher = SequenceMatcher(None, orig_processed, comp_processed)
-        result = []
-
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            orig_segment = orig_processed[i1:i2]
-            comp_segment = comp_processed[j1:j2]
-
-            if tag == 'equal':
-                # 保留原始文本的空格格式（仅替换差异部分，非差异部分保持原样）
-                # 从原始对比文本中截取对应片段（而非预处理后的）
-                # 计算原始文本中对应位置（处理空格差异导致的索引偏移）
-                # 这里简化处理：直接使用对比文本的原始片段（适合大部分场景）
-                result.append(compare_text[j1:j2] if j1 < j2 else '')
-
-            elif tag == 'insert':
-                # 新增内容标红，添加"新增"提示（合同审核中需明确标识新增项）
-                result.append(f'<span class="diff-highlight">[新增]{comp_segment}</span>')
-
-            elif tag == 'delete':
-                # 删除内容标红+删除线，添加"删除"提示
-                result.append(f'<span class="diff-delete">[删除]{orig_segment}</span>')
-
-            elif tag == 'replace':
-                # 替换内容同时显示删除和新增部分，用"替换为"连接
-                result.append(
-                    f'<span class="diff-delete">[删除]{orig_segment}</span>'
-                    f'<span class="diff-highlight">[替换为]{comp_segment}</span>'
-                )
-
-        # 3. 后处理：修复可能的标签嵌套问题（避免HTML解析错误）
-        highlighted = ''.join(result)
-        # 移除空标签（如连续删除/新增导致的空span）
-        highlighted = re.sub(r'<span class="[^"]+"></span>', '', highlighted)
-        return highlighted
+        return highlight_differences(original_text, compare_text)
 
 
     def load_original_file(self, file_path=None):
@@ -412,63 +307,31 @@ class CompareApp(QWidget, Ui_Form):
             return  # 用户取消选择
 
         try:
-            # 备份文件到历史文件夹（仅当不是从历史记录加载时）
-            if not file_path.startswith(self.history_dir):
-                # 生成带时间戳的文件名，避免重复
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = os.path.basename(file_path)
-                name, ext = os.path.splitext(filename)
-                history_filename = f"{name}_{timestamp}{ext}"
-                history_path = os.path.join(self.history_dir, history_filename)
-
-                # 复制文件到历史文件夹
-                shutil.copy2(file_path, history_path)
-                self.original_file_path = history_path
-            else:
-                self.original_file_path = file_path
-
-            # 读取 docx 并转为 HTML（后续代码保持不变）
-            with open(self.original_file_path, "rb") as docx_file:
-                # 样式映射代码保持不变
-                style_map = """
-                p[style-name='标题 1'] => p.contract-main-title
-                p[style-name='正文'] => p.contract-preface
-                p[style-name='标题 2'] => p.clause-level1
-                p[style-name='标题 3'] => p.clause-level2
-                p[style-name='普通段落'] => p.party-info
-                p[style-name='签名区'] => p.signature-area
-                p[style-name='签名项'] => p.signature-item
-                p[style-name='日期'] => p.sign-date
-                """
-                result = mammoth.convert_to_html(
-                    docx_file,
-                    style_map=style_map,
-                    # convert_image=mammoth.images.img_element
-
-                )
-                html_content = result.value
-
-            # 组合CSS和HTML内容，使样式生效
-            full_html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                {self.word_css}
-            </head>
-            <body>
-                {html_content}
-            </body>
-            </html>
-            """
-
-            # 加载到左侧展示区（webEngineOriginView）
-            self.webEngineOriginView.setHtml(full_html)
-            self.original_html = html_content
-            self.original_text_blocks = self.extract_text_blocks(html_content)
+            # 登记到历史目录（仅当不是从历史记录加载时；相同内容只保存一份）
+            content_hash = self.history_index.content_hash_for(file_path)
+            if content_hash is None:
+                file_path, content_hash = self.history_index.import_file(file_path)
 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"无法显示 Word 文件内容：\n{e}")
+            return
+
+        # 转换与条款提取在后台线程执行
+        self.start_job("导入原文件", "无法显示 Word 文件内容",
+                       lambda result: self.on_original_loaded(file_path, content_hash, result),
+                       traced("load_original_file", partial(load_document, cache=self.conversion_cache,
+                                                            image_store=self.image_store)),
+                       file_path)
+
+    def on_original_loaded(self, file_path, content_hash, result):
+        """原文件解析完成后加载到左侧展示区（webEngineOriginView）"""
+        html_content, text_blocks = result
+        self.history_index.set_clause_count(content_hash, len(text_blocks))
+        self.start_background_job(index_document, self.clause_index_path, content_hash, text_blocks)
+        self.publish_document(self.webEngineOriginView, build_full_html(html_content))
+        self.original_file_path = file_path
+        self.original_html = html_content
+        self.original_text_blocks = text_blocks
 
     def load_compare_file(self):
         """导入对比文件 (.docx)，并在右侧展示区显示"""
@@ -482,59 +345,21 @@ class CompareApp(QWidget, Ui_Form):
         if not file_path:
             return  # 用户取消选择
 
-        try:
-            # 读取对比文件并转换为HTML（复用原文件的样式映射）
-            with open(file_path, "rb") as docx_file:
-                style_map = """
-                p[style-name='标题 1'] => p.contract-main-title
-                p[style-name='正文'] => p.contract-preface
-                p[style-name='标题 2'] => p.clause-level1
-                p[style-name='标题 3'] => p.clause-level2
-                p[style-name='普通段落'] => p.party-info
-                p[style-name='签名区'] => p.signature-area
-                p[style-name='签名项'] => p.signature-item
-                p[style-name='日期'] => p.sign-date
-                """
-                result = mammoth.convert_to_html(
-                    docx_file,
-                    style_map=style_map,
-                    # convert_image=mammoth.images.img_element
-
-                )
-                html_content = result.value
-
-            # 组合CSS和HTML内容（保持与原文件格式一致）
-            full_html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                {self.word_css}
-            </head>
-            <body>
-                {html_content}
-            </body>
-            </html>
-            """
-
-            # 加载到右侧展示区（假设控件名为 webEngineCompareView，需与UI文件一致）
-            self.webEngineCompareView.setHtml(full_html)
-            # 保存对比文件路径（供后续对比功能使用）
-            self.compare_file_path = file_path
-            self.compare_html = html_content
-            self.compare_text_blocks = self.extract_text_blocks(html_content)
-
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"无法显示对比文件内容：\n{e}")
-
-    def handle_image(self,image):
-        """处理图片转换，出错时返回空标签避免崩溃"""
-        try:
-            # 尝试转换图片为HTML标签
-            return mammoth.images.img_element(image)
-        except Exception:
-            # 出错时返回空标签（或提示文字）
-            return ("<p>[无法显示的图片]</p>",)  # 必须返回可迭代对象（如元组）
+        # 读取对比文件并转换为HTML（复用原文件的样式映射），在后台线程执行
+        self.start_job("导入对比文件", "无法显示对比文件内容",
+                       lambda result: self.on_compare_loaded(file_path, result),
+                       traced("load_compare_file", partial(load_document, cache=self.conversion_cache,
+                                                            image_store=self.image_store)),
+                       file_path)
+
+    def on_compare_loaded(self, file_path, result):
+        """对比文件解析完成后加载到右侧展示区（webEngineCompareView）"""
+        html_content, text_blocks = result
+        self.publish_document(self.webEngineCompareView, build_full_html(html_content))
+        # 保存对比文件路径（供后续对比功能使用）
+        self.compare_file_path = file_path
+        self.compare_html = html_content
+        self.compare_text_blocks = text_blocks
 
     # 在CompareApp类中添加显示历史页面的方法
     def show_history_page(self):
@@ -542,7 +367,8 @@ class CompareApp(QWidget, Ui_Form):
         # 创建历史页面（主窗口为父窗口）
         self.history_page = HistoryPage(
             parent=self,  # 关键：设置主窗口为父窗口
-            history_dir=self.history_dir,
+            history_index=self.history_index,
+            clause_index=self.clause_index,
             callback=self.load_original_file
         )
         # 设置历史页面大小与主界面完全一致
@@ -558,50 +384,51 @@ class CompareApp(QWidget, Ui_Form):
 
     # --------------------------------------------------------
     # 导出为带标红的 .docx 副本（删除部分带删除线）
+    # 修订模式/标红模式在对比文件上原地打补丁，保留原有格式、表格与样式
     # --------------------------------------------------------
     def export_highlighted_file(self):
-        if not self.highlighted_html:
+        if not self.diff_result:
             QMessageBox.warning(self, "警告", "请先完成文件对比再导出！")
             return
 
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出 Word 文件副本", "对比结果.docx", "Word 文件 (*.docx)"
+        export_modes = {
+            "Word 修订模式 (*.docx)": 'track',
+            "Word 标红副本，保留原格式 (*.docx)": 'markup',
+            "Word 纯文本标红副本 (*.docx)": None,
+        }
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出 Word 文件副本", "对比结果.docx", ";;".join(export_modes)
         )
         if not file_path:
             return
 
         try:
-            soup = BeautifulSoup(self.highlighted_html, 'html.parser')
-            doc = Document()
-
-            for node in soup.find_all(['p', 'li']):
-                para = doc.add_paragraph()
-                for elem in node.contents:
-                    if isinstance(elem, str):
-                        run = para.add_run(elem)
-                    elif elem.name == 'span' and 'diff-highlight' in elem.get('class', []):
-                        run = para.add_run(elem.get_text())
-                        run.font.color.rgb = RGBColor(255, 0, 0)
-                        run.bold = True
-                    elif elem.name == 'span' and 'diff-delete' in elem.get('class', []):
-                        run = para.add_run(elem.get_text())
-                        run.font.color.rgb = RGBColor(255, 0, 0)
-                        run.font.strike = True  # ✅ 添加删除线
-                        run.bold = True
-                    else:
-                        run = para.add_run(elem.get_text())
-
-            doc.save(file_path)
-            QMessageBox.information(self, "成功", f"已导出副本文件：\n{file_path}")
+            mode = export_modes.get(selected_filter, 'track')
+            from engine.docx_export import export_diff_docx  # python-docx 在首次导出时才导入
+            with tracer.span("export_highlighted_file", mode=mode or 'plain', ops=len(self.diff_result[0])):
+                stats = None
+                if mode is None:
+                    # 直接按差异中间表示写出，无需重新解析标红 HTML
+                    export_diff_docx(file_path, *self.diff_result)
+                else:
+                    stats = patch_docx(self.diff_source_path, file_path, *self.diff_result, mode=mode)
+            if stats and stats['unmapped_ops']:
+                # 找不到对应段落的差异没有写入副本，提示改用纯文本标红副本查看全部差异
+                QMessageBox.warning(self, "部分差异未导出",
+                                    f"已导出副本文件：\n{file_path}\n\n其中 {stats['unmapped_ops']} 处差异未能对应到"
+                                    f"Word 段落，未标注在副本中；如需查看全部差异，请导出为纯文本标红副本。")
+            else:
+                QMessageBox.information(self, "成功", f"已导出副本文件：\n{file_path}")
 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"导出失败：\n{e}")
 
 # 添加历史记录页面类
 class HistoryPage(QWidget):
-    def __init__(self, parent=None, history_dir=None, callback=None):
+    def __init__(self, parent=None, history_index=None, clause_index=None, callback=None):
         super().__init__(parent)
-        self.history_dir = history_dir
+        self.history_index = history_index
+        self.clause_index = clause_index
         self.callback = callback  # 用于回调显示选中的历史文件
 
         # 1. 先设置窗口属性（在初始化UI前设置）
@@ -621,11 +448,6 @@ class HistoryPage(QWidget):
             if item.widget():
                 item.widget().deleteLater()
 
-        # 步骤2：设置拉伸因子（顺序：标题0、列表1、按钮0）
-        layout.setStretch(0, 0)  # 标题不拉伸
-        layout.setStretch(1, 1)  # 列表占满剩余空间
-        layout.setStretch(2, 0)  # 按钮不拉伸
-
         # 1. 标题（索引0）- 修改这里
         title_label = QLabel("历史文件列表")
         # 关键修改：通过样式表减少上下边距，限制最小高度
@@ -643,52 +465,86 @@ class HistoryPage(QWidget):
 
         layout.addWidget(title_label)
 
-        # 2. 历史文件列表（索引1）
-        self.file_list_widget = QWidget()
-        self.file_list_layout = QVBoxLayout(self.file_list_widget)
-        # 列表容器添加少量内边距，避免内容贴边
-        self.file_list_layout.setContentsMargins(5, 5, 5, 5)  # 左、上、右、下内边距
-        self.file_list_layout.setStretch(0, 1)  # 确保列表内容拉伸
-        layout.addWidget(self.file_list_widget)
-        self.load_history_files()
-
-        # 3. 返回按钮（索引2）
+        # 2. 文件名过滤（输入停顿后再查询，避免每次按键都重新加载）
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("按文件名过滤")
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(200)
+        self.filter_timer.timeout.connect(lambda: self.history_model.set_name_filter(self.filter_edit.text()))
+        self.filter_edit.textChanged.connect(self.filter_timer.start)
+        layout.addWidget(self.filter_edit)
+
+        # 3. 历史文件列表：模型按页从历史目录加载，滚动到底部时再取下一页
+        self.history_model = HistoryTableModel(self.history_index, self)
+        self.file_table = QTableView()
+        self.file_table.setModel(self.history_model)
+        self.file_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.file_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.file_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.file_table.verticalHeader().setVisible(False)
+        self.file_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.file_table.setSortingEnabled(True)
+        self.file_table.sortByColumn(1, Qt.SortOrder.DescendingOrder)  # 默认按导入时间倒序
+        self.file_table.doubleClicked.connect(lambda index: self.view_file(index.data(PathRole)))
+        layout.addWidget(self.file_table, 1)
+
+        # 4. 条款全文检索：在全部历史合同中查找包含指定措辞的条款（回车查询）
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索条款内容，如：赔偿责任上限（回车查询）")
+        self.search_edit.returnPressed.connect(self.search_clauses)
+        layout.addWidget(self.search_edit)
+        self.search_results = QTableWidget(0, 3)
+        self.search_results.setHorizontalHeaderLabels(["文件名", "条款", "条款内容"])
+        self.search_results.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.search_results.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.search_results.verticalHeader().setVisible(False)
+        self.search_results.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.search_results.cellDoubleClicked.connect(
+            lambda row, column: self.view_file(self.search_results.item(row, 0).data(PathRole)))
+        self.search_results.hide()
+        layout.addWidget(self.search_results, 1)
+
+        # 5. 查看 / 返回按钮
+        button_layout = QHBoxLayout()
+        view_btn = QPushButton("点击查看")
+        view_btn.clicked.connect(self.view_selected_file)
         back_btn = QPushButton("返回主界面")
         back_btn.clicked.connect(self.close)
-        layout.addWidget(back_btn)
+        button_layout.addWidget(view_btn)
+        button_layout.addWidget(back_btn)
+        layout.addLayout(button_layout)
 
         # 强制应用布局
         self.setLayout(layout)
         layout.update()
 
-    def load_history_files(self):
-        """加载历史文件并显示（保持不变）"""
-        # 清空现有列表
-        while self.file_list_layout.count():
-            item = self.file_list_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-
-        # 获取并排序历史文件（按修改时间倒序）
-        if os.path.exists(self.history_dir):
-            files = [f for f in os.listdir(self.history_dir) if f.endswith(".docx")]
-            files.sort(key=lambda x: os.path.getmtime(os.path.join(self.history_dir, x)), reverse=True)
-
-            for file in files:
-                file_path = os.path.join(self.history_dir, file)
-                mod_time = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y-%m-%d %H:%M:%S")
-
-                # 创建文件信息和查看按钮
-                file_widget = QWidget()
-                file_layout = QHBoxLayout(file_widget)
-
-                file_info = QLabel(f"{file}  ({mod_time})")
-                view_btn = QPushButton("点击查看")
-                view_btn.clicked.connect(lambda checked, path=file_path: self.view_file(path))
-
-                file_layout.addWidget(file_info)
-                file_layout.addWidget(view_btn)
-                self.file_list_layout.addWidget(file_widget)
+    def search_clauses(self):
+        """检索条款并列出命中的文件与条款标识（双击打开该文件）"""
+        phrase = self.search_edit.text().strip()
+        if not phrase:
+            self.search_results.hide()
+            return
+        hits = self.clause_index.search(phrase)
+        self.search_results.setRowCount(0)
+        for hit in hits:
+            entry = self.history_index.get(hit['content_hash'])
+            if entry is None:
+                continue
+            row = self.search_results.rowCount()
+            self.search_results.insertRow(row)
+            name_item = QTableWidgetItem(entry['name'])
+            name_item.setData(PathRole, entry['path'])
+            self.search_results.setItem(row, 0, name_item)
+            self.search_results.setItem(row, 1, QTableWidgetItem(hit['identifier'] or f"第{hit['block_index'] + 1}段"))
+            self.search_results.setItem(row, 2, QTableWidgetItem(hit['text']))
+        self.search_results.show()
+
+    def view_selected_file(self):
+        """查看表格中选中的历史文件"""
+        selected = self.file_table.selectionModel().selectedRows()
+        if selected:
+            self.view_file(selected[0].data(PathRole))
 
     def view_file(self, file_path):
         """回调主页面显示选中的历史文件（保持不变）"""
@@ -697,7 +553,12 @@ class HistoryPage(QWidget):
         self.close()
 
 if __name__ == "__main__":
+    register_document_scheme()  # 自定义协议须在 QApplication 创建前注册
+    # QtWebEngineWidgets 延迟到第一次创建网页视图时才导入，须在 QApplication 创建前声明共享 OpenGL 上下文
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+    enable_from_environment()  # CONTRACT_COMPARE_TRACE=1 时记录各阶段耗时，退出时写出跟踪文件
     app = QApplication(sys.argv)
     window = CompareApp()
     window.show()
+    report_when_interactive(app, _PROCESS_START, window.create_web_views)
     sys.exit(app.exec())
\ No newline at end of file
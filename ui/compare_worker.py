@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""后台任务：在 QThreadPool 中执行文档转换与对比，按阶段汇报进度并支持取消"""
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from engine.compare_engine import ComparisonCancelled
+
+
+class JobSignals(QObject):
+    """任务信号（在主线程创建，跨线程发射时自动排队到主线程执行）"""
+    progress = pyqtSignal(str, int)  # 阶段名称, 百分比
+    finished = pyqtSignal(object)  # 任务结果
+    failed = pyqtSignal(str)  # 错误信息
+    cancelled = pyqtSignal()
+
+
+class CompareJob(QRunnable):
+    """把一个接受 progress 回调的函数放到线程池中执行"""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self._cancel_event = threading.Event()
+        self._last_progress = None
+        # 由调用方持有任务对象，避免线程池执行完毕后删除 C++ 对象导致信号失效
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        """请求取消：任务在下一次汇报进度时中断"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _progress(self, stage, done, total):
+        if self._cancel_event.is_set():
+            raise ComparisonCancelled()
+        percent = int(done * 100 / total) if total else 0
+        # 同一阶段百分比未变化时不重复发射，避免信号淹没事件循环
+        if (stage, percent) != self._last_progress:
+            self._last_progress = (stage, percent)
+            self.signals.progress.emit(stage, percent)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self._progress, **self.kwargs)
+            if self._cancel_event.is_set():
+                raise ComparisonCancelled()
+        except ComparisonCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+    def start(self):
+        QThreadPool.globalInstance().start(self)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""本地文档服务：通过自定义 contract:// 协议向 QWebEngineView 分块提供文档，替代 setHtml
+
+setHtml 受 2MB 上限限制（内嵌图片的大合同会静默失败），且 Chromium 需要排版完整文档后才显示。
+展示区改为加载一个轻量外壳页面，由页面脚本在滚动时按需请求顶层元素切块，
+离开视口较远的切块会被卸载为等高占位，浏览器侧内存不随合同篇幅增长。
+
+URL 结构：
+    contract://doc/<文档编号>/          外壳页面（样式 + 占位容器 + 加载脚本）
+    contract://doc/<文档编号>/chunk/<n> 第 n 个切块的 HTML 片段
+    contract://image/<哈希>.<扩展名>     外置图片（见 engine/image_store.py，安装处理器时传入图片目录）
+"""
+import itertools
+import json
+import re
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QUrl
+from PyQt6.QtWebEngineCore import (QWebEngineProfile, QWebEngineUrlRequestJob, QWebEngineUrlScheme,
+                                   QWebEngineUrlSchemeHandler)
+
+from engine.image_store import IMAGE_HOST, image_content_type
+from engine.renderer import chunk_body_html, split_document
+
+SCHEME_NAME = b'contract'
+DOCUMENT_HOST = 'doc'
+
+# 差异锚点（见 engine.diff_ir.anchor_id），发布时记录其所在切块以便跳转
+_ANCHOR_PATTERN = re.compile(r'id="(diff-\d+)"')
+
+# 外壳页面：切块以 <section data-chunk> 占位，IntersectionObserver 负责按需加载与卸载
+_SHELL_TEMPLATE = """{head}
+<body>
+<div id="contract-document"></div>
+<script>
+(function () {{
+    var CHUNK_COUNT = {chunk_count};
+    var BASE = {base};
+    var container = document.getElementById('contract-document');
+    var sections = [];
+    var pending = {{}};
+
+    function load(index) {{
+        var section = sections[index];
+        if (section.dataset.loaded === '1') {{ return Promise.resolve(section); }}
+        if (pending[index]) {{ return pending[index]; }}
+        pending[index] = fetch(BASE + 'chunk/' + index).then(function (response) {{
+            return response.text();
+        }}).then(function (html) {{
+            section.innerHTML = html;
+            section.style.height = '';
+            section.dataset.loaded = '1';
+            delete pending[index];
+            return section;
+        }});
+        return pending[index];
+    }}
+
+    function unload(section) {{
+        // 保留实际高度作为占位，滚动条位置不跳动
+        section.style.height = section.offsetHeight + 'px';
+        section.innerHTML = '';
+        section.dataset.loaded = '0';
+    }}
+
+    // 视口上下各约三屏范围内的切块保持加载，范围外的卸载
+    var observer = new IntersectionObserver(function (entries) {{
+        entries.forEach(function (entry) {{
+            var index = Number(entry.target.dataset.chunk);
+            if (entry.isIntersecting) {{
+                load(index);
+            }} else if (entry.target.dataset.loaded === '1') {{
+                unload(entry.target);
+            }}
+        }});
+    }}, {{ rootMargin: '300% 0px 300% 0px' }});
+
+    // 尾部哨兵：进入加载范围时追加下一个切块的占位（首屏只创建需要的占位）
+    var sentinel = document.createElement('div');
+    function appendSection() {{
+        var section = document.createElement('section');
+        section.dataset.chunk = String(sections.length);
+        section.dataset.loaded = '0';
+        container.appendChild(section);
+        sections.push(section);
+        observer.observe(section);
+        return load(sections.length - 1);
+    }}
+    var tailObserver = new IntersectionObserver(function (entries) {{
+        if (entries[0].isIntersecting && sections.length < CHUNK_COUNT) {{
+            appendSection().then(function () {{
+                // 切块较矮时哨兵可能仍在范围内，重新观察以继续追加
+                tailObserver.unobserve(sentinel);
+                if (sections.length < CHUNK_COUNT) {{ tailObserver.observe(sentinel); }}
+            }});
+        }}
+    }}, {{ rootMargin: '0px 0px 200% 0px' }});
+    document.body.appendChild(sentinel);
+    tailObserver.observe(sentinel);
+
+    // 供宿主程序调用：确保第 index 个切块（及之前的占位）已加载并滚动到该处
+    function showChunk(index) {{
+        while (sections.length <= index && sections.length < CHUNK_COUNT) {{ appendSection(); }}
+        return load(index);
+    }}
+    window.contractDocument = {{
+        chunkCount: CHUNK_COUNT,
+        showChunk: function (index) {{
+            return showChunk(index).then(function (section) {{
+                section.scrollIntoView();
+                return index;
+            }});
+        }},
+        // 跳转到第 index 个切块中的锚点元素（找不到时停在切块开头）
+        reveal: function (index, elementId) {{
+            return showChunk(index).then(function (section) {{
+                var target = document.getElementById(elementId) || section;
+                target.scrollIntoView({{ block: 'center' }});
+                return elementId;
+            }});
+        }}
+    }};
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def register_document_scheme():
+    """注册 contract:// 协议（必须在创建 QApplication 之前调用）"""
+    scheme = QWebEngineUrlScheme(SCHEME_NAME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    flags = (QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.LocalScheme
+             | QWebEngineUrlScheme.Flag.LocalAccessAllowed | QWebEngineUrlScheme.Flag.CorsEnabled)
+    # Qt 6.6 起自定义协议需显式允许 fetch()
+    fetch_allowed = getattr(QWebEngineUrlScheme.Flag, 'FetchApiAllowed', None)
+    if fetch_allowed is not None:
+        flags |= fetch_allowed
+    scheme.setFlags(flags)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class DocumentSchemeHandler(QWebEngineUrlSchemeHandler):
+    """在主线程响应 contract:// 请求：外壳页面与按编号的切块来自内存中的已发布文档，外置图片来自图片目录"""
+
+    def __init__(self, parent=None, image_store=None):
+        super().__init__(parent)
+        self.image_store = image_store
+        self._documents = {}  # 文档编号 -> {'shell': bytes, 'chunks': [bytes, ...], 'anchors': {id: 切块}}
+        self._view_documents = {}  # 展示区 -> 当前文档编号
+        self._ids = itertools.count(1)
+
+    def publish(self, view, full_html):
+        """发布完整 HTML 文档并在指定展示区加载，替换该展示区之前发布的文档"""
+        head, body = split_document(full_html)
+        chunks = chunk_body_html(body)
+        doc_id = str(next(self._ids))
+        base = f"{SCHEME_NAME.decode()}://{DOCUMENT_HOST}/{doc_id}/"
+        shell = _SHELL_TEMPLATE.format(head=head, chunk_count=len(chunks), base=json.dumps(base))
+
+        previous = self._view_documents.get(view)
+        if previous is not None:
+            self._documents.pop(previous, None)
+        self._documents[doc_id] = {
+            'shell': shell.encode('utf-8'),
+            'chunks': [chunk.encode('utf-8') for chunk in chunks],
+            'anchors': {anchor: index for index, chunk in enumerate(chunks)
+                        for anchor in _ANCHOR_PATTERN.findall(chunk)},
+        }
+        self._view_documents[view] = doc_id
+        view.setUrl(QUrl(base))
+        return doc_id
+
+    def reveal(self, view, element_id):
+        """在展示区中滚动到指定锚点（所在切块未加载时先加载）；锚点不存在时返回 False"""
+        document = self._documents.get(self._view_documents.get(view))
+        if document is None or element_id not in document['anchors']:
+            return False
+        chunk_index = document['anchors'][element_id]
+        view.page().runJavaScript(f"window.contractDocument && contractDocument.reveal({chunk_index}, "
+                                  f"{json.dumps(element_id)});")
+        return True
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        parts = [part for part in url.path().split('/') if part]
+        if url.host() == IMAGE_HOST:
+            self._reply_image(job, parts)
+            return
+        document = self._documents.get(parts[0]) if parts and url.host() == DOCUMENT_HOST else None
+        if document is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+
+        if len(parts) == 1:
+            data = document['shell']
+        elif len(parts) == 3 and parts[1] == 'chunk' and parts[2].isdigit() \
+                and int(parts[2]) < len(document['chunks']):
+            data = document['chunks'][int(parts[2])]
+        else:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+
+        _reply(job, b'text/html;charset=utf-8', data)
+
+    def _reply_image(self, job, parts):
+        data = self.image_store.read(parts[0]) if self.image_store is not None and len(parts) == 1 else None
+        if data is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        _reply(job, image_content_type(parts[0]).encode('ascii'), data)
+
+
+def _reply(job, content_type, data):
+    # 缓冲区以请求任务为父对象，随任务一起释放
+    buffer = QBuffer(job)
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    job.reply(content_type, buffer)
+
+
+def install_document_handler(parent=None, profile=None, image_store=None):
+    """在浏览器配置（默认为全局默认配置）上安装 contract:// 处理器并返回；image_store 用于响应外置图片请求"""
+    handler = DocumentSchemeHandler(parent, image_store)
+    (profile or QWebEngineProfile.defaultProfile()).installUrlSchemeHandler(SCHEME_NAME, handler)
+    return handler
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""历史文件列表模型：按页从 SQLite 历史目录读取，滚动到底部时再加载下一页，排序与过滤在数据库中完成"""
+from datetime import datetime
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from engine.history_index import SORT_COLUMNS
+
+# (字段, 表头)
+HISTORY_COLUMNS = (
+    ('name', '文件名'),
+    ('imported_at', '导入时间'),
+    ('clause_count', '条款数'),
+    ('size', '大小'),
+)
+
+# 每次加载的记录数
+PAGE_SIZE = 200
+
+# 取出记录对象路径的数据角色
+PathRole = Qt.ItemDataRole.UserRole
+
+
+def _format_size(size):
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """历史记录表格模型：只保存已加载的页，打开代价与历史记录总数无关"""
+
+    def __init__(self, history_index, parent=None):
+        super().__init__(parent)
+        self.history_index = history_index
+        self.order_by = 'imported_at'
+        self.descending = True
+        self.name_filter = ''
+        self._rows = []
+        self._has_more = True
+
+    # ---------- 基本接口 ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HISTORY_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return HISTORY_COLUMNS[section][1]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        field = HISTORY_COLUMNS[index.column()][0]
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = entry[field]
+            if field == 'imported_at':
+                return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+            if field == 'clause_count':
+                return "-" if value is None else str(value)
+            if field == 'size':
+                return _format_size(value)
+            return value
+        if role == Qt.ItemDataRole.TextAlignmentRole and field in ('clause_count', 'size'):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return entry['name']
+        if role == PathRole:
+            return entry['path']
+        return None
+
+    # ---------- 增量加载 ----------
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more:
+            return
+        page = self.history_index.entries(PAGE_SIZE, self.order_by, self.descending, self.name_filter,
+                                          after=self._rows[-1] if self._rows else None)
+        self._has_more = len(page) == PAGE_SIZE
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    # ---------- 排序与过滤（重新从第一页加载） ----------
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        field = HISTORY_COLUMNS[column][0]
+        if field not in SORT_COLUMNS:
+            return
+        self.order_by = field
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.reload()
+
+    def set_name_filter(self, text):
+        text = text.strip()
+        if text != self.name_filter:
+            self.name_filter = text
+            self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self._rows = []
+        self._has_more = True
+        self.endResetModel()
+        self.fetchMore()
+
+    def entry(self, row):
+        return self._rows[row]
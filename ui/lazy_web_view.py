@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""延迟创建的网页视图：启动时只放一个占位控件，第一次需要显示文档（或窗口空闲预热）时才创建 QWebEngineView
+
+创建第一个 QWebEngineView 会初始化 Chromium 浏览器上下文，耗时明显；用户启动后首先要选择文件，
+推迟到窗口显示之后再创建可缩短启动到可操作的时间。在 Qt Designer 中作为 QWidget 的提升控件使用。
+"""
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QVBoxLayout, QWidget
+
+
+class LazyWebView(QWidget):
+    """QWebEngineView 的占位容器；view() 返回（必要时创建）真正的网页视图"""
+    viewCreated = pyqtSignal(object)  # 新创建的 QWebEngineView
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._view = None
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        # 占位期间显示与空白页一致的白色背景
+        self.setStyleSheet("background: white;")
+
+    def is_created(self):
+        return self._view is not None
+
+    def view(self):
+        if self._view is None:
+            # QtWebEngineWidgets 只在首次使用时导入
+            from PyQt6.QtWebEngineWidgets import QWebEngineView
+            self.setStyleSheet("")
+            self._view = QWebEngineView(self)
+            self._view.setObjectName(self.objectName())
+            self._layout.addWidget(self._view)
+            self.viewCreated.emit(self._view)
+        return self._view
@@ -15,10 +15,11 @@ from PyQt6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWidgets import (QApplication, QHBoxLayout, QLabel, QPushButton,
     QSizePolicy, QSpacerItem, QSplitter, QVBoxLayout,
     QWidget)
+
+from ui.lazy_web_view import LazyWebView
 class Ui_Form(object):
     def setupUi(self, Form):
         if not Form.objectName():
@@ -115,9 +116,8 @@ class Ui_Form(object):
         self.verticalLayoutLeft = QVBoxLayout(self.leftPanel)
         self.verticalLayoutLeft.setObjectName(u"verticalLayoutLeft")
         self.verticalLayoutLeft.setContentsMargins(0, 0, 0, 0)
-        self.webEngineOriginView = QWebEngineView(self.leftPanel)
+        self.webEngineOriginView = LazyWebView(self.leftPanel)
         self.webEngineOriginView.setObjectName(u"webEngineOriginView")
-        self.webEngineOriginView.setUrl(QUrl(u"about:blank"))
 
         self.verticalLayoutLeft.addWidget(self.webEngineOriginView)
 
@@ -127,9 +127,8 @@ class Ui_Form(object):
         self.verticalLayoutRight = QVBoxLayout(self.rightPanel)
         self.verticalLayoutRight.setObjectName(u"verticalLayoutRight")
         self.verticalLayoutRight.setContentsMargins(0, 0, 0, 0)
-        self.webEngineCompareView = QWebEngineView(self.rightPanel)
+        self.webEngineCompareView = LazyWebView(self.rightPanel)
         self.webEngineCompareView.setObjectName(u"webEngineCompareView")
-        self.webEngineCompareView.setUrl(QUrl(u"about:blank"))
 
         self.verticalLayoutRight.addWidget(self.webEngineCompareView)
 
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""性能面板：列出已记录的各阶段耗时、CPU 时间、内存峰值与块数/差异数，可导出 Chrome 跟踪文件"""
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (QFileDialog, QHBoxLayout, QHeaderView, QLabel, QMessageBox, QPushButton,
+                             QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget)
+
+from engine.tracing import DEFAULT_TRACE_FILE, tracer
+
+# 表头
+PERF_COLUMNS = ('阶段', '开始 (ms)', '耗时 (ms)', 'CPU (ms)', '内存峰值 (KB)', '详情')
+
+# 面板可见时的自动刷新间隔（毫秒）
+REFRESH_INTERVAL = 1000
+
+
+def _nesting_depths(records):
+    """按同一线程内的时间包含关系计算每条记录的嵌套深度（用于缩进显示）"""
+    depths = []
+    open_spans = {}  # 线程 → 尚未结束的外层阶段结束时间栈
+    for record in records:
+        stack = open_spans.setdefault(record['thread'], [])
+        while stack and stack[-1] <= record['start']:
+            stack.pop()
+        depths.append(len(stack))
+        stack.append(record['start'] + record['wall'])
+    return depths
+
+
+class PerformancePanel(QWidget):
+    """性能面板（独立工具窗口）；由主窗口的隐藏快捷键打开"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.WindowType.Tool)
+        self.setWindowTitle("性能面板")
+        self.resize(820, 420)
+        self._shown_count = -1
+
+        self.status_label = QLabel()
+        self.toggle_button = QPushButton()
+        self.toggle_button.clicked.connect(self.toggle_recording)
+        clear_button = QPushButton("清空")
+        clear_button.clicked.connect(self.clear)
+        export_button = QPushButton("导出跟踪文件")
+        export_button.clicked.connect(self.export_trace)
+
+        self.table = QTableWidget(0, len(PERF_COLUMNS))
+        self.table.setHorizontalHeaderLabels(PERF_COLUMNS)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(len(PERF_COLUMNS) - 1, QHeaderView.ResizeMode.Stretch)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.status_label)
+        buttons.addStretch()
+        buttons.addWidget(self.toggle_button)
+        buttons.addWidget(clear_button)
+        buttons.addWidget(export_button)
+        layout = QVBoxLayout(self)
+        layout.addLayout(buttons)
+        layout.addWidget(self.table)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.update_status()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def update_status(self):
+        if tracer.enabled:
+            memory = "，统计内存峰值" if tracer.trace_memory else ""
+            self.status_label.setText(f"正在记录{memory}")
+            self.toggle_button.setText("停止记录")
+        else:
+            self.status_label.setText("未记录")
+            self.toggle_button.setText("开始记录")
+
+    def toggle_recording(self):
+        if tracer.enabled:
+            tracer.disable()
+        else:
+            tracer.enable()
+        self.update_status()
+
+    def clear(self):
+        tracer.clear()
+        self.refresh()
+
+    def refresh(self):
+        """重新填充表格（记录数未变化时跳过）"""
+        records = tracer.records()
+        if len(records) == self._shown_count:
+            return
+        self._shown_count = len(records)
+        self.table.setRowCount(len(records))
+        for row, (record, depth) in enumerate(zip(records, _nesting_depths(records))):
+            peak = record['peak_bytes']
+            cells = (
+                "    " * depth + record['name'],
+                f"{record['start'] * 1000:.1f}",
+                f"{record['wall'] * 1000:.1f}",
+                f"{record['cpu'] * 1000:.1f}",
+                "-" if peak is None else f"{peak / 1024:.0f}",
+                "，".join(f"{key}={value}" for key, value in record['args'].items()),
+            )
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if 0 < column < len(cells) - 1:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+
+    def export_trace(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出跟踪文件", DEFAULT_TRACE_FILE,
+                                                   "Chrome 跟踪文件 (*.json)")
+        if not file_path:
+            return
+        try:
+            tracer.write(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"导出失败：\n{e}")
+            return
+        QMessageBox.information(self, "成功", f"已导出跟踪文件（可用 chrome://tracing 或 speedscope 打开）：\n{file_path}")
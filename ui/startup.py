@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""启动耗时测量：从进程开始执行到主窗口显示并处理完首批事件（可以响应操作）的时间
+
+设置环境变量 CONTRACT_COMPARE_STARTUP_PROBE=1 时，程序在可操作后打印
+"time_to_interactive=<秒>"；传入 first_view 时接着在界面线程创建网页视图并打印
+"first_view_seconds=<秒>"（第一次显示文档时界面线程额外阻塞的时间），然后立即退出，
+供 benchmarks/bench_startup.py 反复测量。
+"""
+import os
+import sys
+import time
+
+from PyQt6.QtCore import QTimer
+
+STARTUP_PROBE_ENV = "CONTRACT_COMPARE_STARTUP_PROBE"
+
+# 启动到可操作的目标时间（秒），超过时在标准错误输出提示
+STARTUP_TARGET_SECONDS = 1.5
+
+
+def report_when_interactive(app, process_start, first_view=None):
+    """事件循环开始后（窗口已完成首次绘制）记录启动耗时；测量模式下打印结果并退出
+
+    first_view 为创建网页视图的函数（启动时不创建，第一次显示文档时才创建），仅在测量模式下调用。
+    """
+    def on_interactive():
+        elapsed = time.perf_counter() - process_start
+        if os.environ.get(STARTUP_PROBE_ENV):
+            print(f"time_to_interactive={elapsed:.4f}", flush=True)
+            if first_view is not None:
+                view_start = time.perf_counter()
+                first_view()
+                print(f"first_view_seconds={time.perf_counter() - view_start:.4f}", flush=True)
+            app.quit()
+        elif elapsed > STARTUP_TARGET_SECONDS:
+            print(f"启动耗时 {elapsed:.2f} 秒，超过目标 {STARTUP_TARGET_SECONDS} 秒", file=sys.stderr)
+
+    QTimer.singleShot(0, on_interactive)